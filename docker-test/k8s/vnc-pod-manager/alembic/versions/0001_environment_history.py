@@ -0,0 +1,68 @@
+"""environment history, lifecycle events and sessions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "environments",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("pod_uid", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.String(length=128), nullable=False),
+        sa.Column("pod_name", sa.String(length=253), nullable=False),
+        sa.Column("pvc_name", sa.String(length=253), nullable=True),
+        sa.Column("node_name", sa.String(length=253), nullable=True),
+        sa.Column("phase", sa.String(length=32), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ready_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("cold_start_seconds", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("pod_uid")
+    )
+    op.create_index("ix_environments_user_id_created_at", "environments", ["user_id", "created_at"])
+    op.create_index("ix_environments_created_at", "environments", ["created_at"])
+    op.create_index("ix_environments_phase", "environments", ["phase"])
+
+    op.create_table(
+        "lifecycle_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(length=128), nullable=False),
+        sa.Column("pod_uid", sa.String(length=64), nullable=True),
+        sa.Column("event_type", sa.String(length=64), nullable=False),
+        sa.Column("phase", sa.String(length=32), nullable=True),
+        sa.Column("occurred_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("details", postgresql.JSONB(), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_lifecycle_events_user_id_occurred_at", "lifecycle_events", ["user_id", "occurred_at"])
+    op.create_index("ix_lifecycle_events_event_type_occurred_at", "lifecycle_events", ["event_type", "occurred_at"])
+
+    op.create_table(
+        "sessions",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.String(length=128), nullable=False),
+        sa.Column("pod_uid", sa.String(length=64), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_sessions_user_id_started_at", "sessions", ["user_id", "started_at"])
+    op.create_index("ix_sessions_pod_uid", "sessions", ["pod_uid"], unique=True)
+
+def downgrade():
+    op.drop_table("sessions")
+    op.drop_table("lifecycle_events")
+    op.drop_table("environments")
@@ -124,8 +124,46 @@ async def get_pod_metrics(user_id: str, k8s_manager=None):
         logger.error(f"Failed to get pod metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def collect_cluster_metrics(k8s_manager) -> ClusterMetrics:
+    """
+    Count VNC pods by phase and users with one paginated list (blocking)
+    
+    Returns:
+        Cluster metrics including pod counts and user statistics
+    """
+    total_pods = 0
+    active_pods = 0
+    pending_pods = 0
+    failed_pods = 0
+    users = set()
+    
+    # Stream all VNC pods page by page
+    for pod in k8s_manager.iter_pod_records(label_selector="managed-by=vnc-manager"):
+        total_pods += 1
+        
+        # Count pod states
+        if pod.phase == "Running":
+            active_pods += 1
+        elif pod.phase == "Pending":
+            pending_pods += 1
+        elif pod.phase in ["Failed", "Unknown"]:
+            failed_pods += 1
+        
+        # Count unique users
+        if pod.user_id:
+            users.add(pod.user_id)
+    
+    return ClusterMetrics(
+        total_pods=total_pods,
+        active_pods=active_pods,
+        pending_pods=pending_pods,
+        failed_pods=failed_pods,
+        total_users=len(users),
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
 @router.get("/cluster", response_model=ClusterMetrics)
-async def get_cluster_metrics(k8s_manager=None):
+def get_cluster_metrics(k8s_manager=None):
     """
     Get cluster-wide metrics
     
@@ -136,43 +174,7 @@ async def get_cluster_metrics(k8s_manager=None):
         raise HTTPException(status_code=503, detail="K8s manager not available")
     
     try:
-        from app.config import settings
-        
-        # Get all VNC pods
-        pods = k8s_manager.v1.list_namespaced_pod(
-            namespace=settings.k8s_namespace_pods,
-            label_selector="managed-by=vnc-manager"
-        )
-        
-        total_pods = len(pods.items)
-        active_pods = 0
-        pending_pods = 0
-        failed_pods = 0
-        users = set()
-        
-        for pod in pods.items:
-            # Count pod states
-            if pod.status.phase == "Running":
-                active_pods += 1
-            elif pod.status.phase == "Pending":
-                pending_pods += 1
-            elif pod.status.phase in ["Failed", "Unknown"]:
-                failed_pods += 1
-            
-            # Count unique users
-            user_label = pod.metadata.labels.get("user")
-            if user_label:
-                users.add(user_label)
-        
-        return ClusterMetrics(
-            total_pods=total_pods,
-            active_pods=active_pods,
-            pending_pods=pending_pods,
-            failed_pods=failed_pods,
-            total_users=len(users),
-            timestamp=datetime.now(timezone.utc).isoformat()
-        )
-        
+        return collect_cluster_metrics(k8s_manager)
     except Exception as e:
         logger.error(f"Failed to get cluster metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     api_prefix: str = "/api/v1"
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    server_workers: int = 4  # Worker processes in pre-fork mode (gunicorn)
     
     # Kubernetes Settings
     k8s_in_cluster: bool = True
@@ -19,6 +20,17 @@ class Settings(BaseSettings):
     k8s_namespace_pods: str = "vnc-pods"
     k8s_image_registry: str = "192.168.10.252:31832"
     k8s_vnc_image: str = "vnc/void-desktop:latest"
+    k8s_list_page_size: int = 200  # limit per page for paginated list calls
+    k8s_connection_pool_maxsize: int = 8  # apiserver connections per worker
+    
+    # Image Pre-pull (DaemonSet caching the VNC image per node, pods pinned to its digest)
+    image_prepull_enabled: bool = False
+    image_prepull_interval_seconds: int = 300
+    image_prepull_max_unavailable: str = "25%"  # nodes pulling a new digest at once
+    image_prepull_pin_fraction: float = 0.5  # share of nodes caching a digest before pods use it
+    image_registry_scheme: str = "http"
+    image_registry_username: Optional[str] = None
+    image_registry_password: Optional[str] = None
     
     # Redis Settings
     redis_host: str = "redis-service"
@@ -26,6 +38,7 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_password: Optional[str] = None
     redis_lock_timeout: int = 10
+    redis_max_connections: int = 50  # Redis connections per worker
     
     # MySQL Settings (for user authentication)
     mysql_host: str = "192.168.10.254"
@@ -34,12 +47,17 @@ class Settings(BaseSettings):
     mysql_user: str = "root"
     mysql_password: str = "zddixczHMBbJPneN.32$#"
     
-    # PostgreSQL Settings (for future use)
+    # PostgreSQL Settings (environment history, lifecycle events, sessions)
+    db_enabled: bool = False
     db_host: str = "postgres-service"
     db_port: int = 5432
     db_name: str = "vnc_manager"
     db_user: str = "vnc_admin"
     db_password: str = "vnc_password"
+    db_pool_size: int = 5  # connections per worker
+    db_queue_size: int = 10000  # queued writes before new ones are dropped
+    db_batch_size: int = 500  # rows per flush
+    db_flush_interval: float = 1.0  # max seconds a write waits in the queue
     
     # Security Settings
     secret_key: str = "your-secret-key-change-in-production"
@@ -53,12 +71,104 @@ class Settings(BaseSettings):
     default_memory_limit: str = "4Gi"
     default_storage_size: str = "10Gi"
     
+    # Quota Plans (vnc_quota_plan / vnc_user_quota in MySQL, cached per worker)
+    quota_default_plan: str = "default"  # plan of users without an assignment
+    quota_refresh_interval_seconds: int = 10  # version-stamp check; tables reloaded only on change
+    
     # Network Settings
     vnc_port_range_start: int = 30000
     vnc_port_range_end: int = 31000
     ssh_port_range_start: int = 31001
     ssh_port_range_end: int = 32000
     vnc_domain: str = "vnc.service.thinkgs.cn"  # Domain for Ingress access
+    ssh_index_refresh_seconds: int = 30  # Resync of the in-memory user -> SSH port index
+    
+    # Read Caches (per worker, single-flight, stale-while-revalidate)
+    read_cache_ttl_seconds: float = 2.0  # pod status / pod list
+    read_cache_stale_seconds: float = 10.0  # served stale while one refresh runs
+    cluster_cache_ttl_seconds: float = 10.0
+    token_cache_ttl_seconds: float = 60.0  # validated tokens; revocation is checked on every request
+    token_cache_stale_seconds: float = 60.0
+    
+    # Idempotency (Idempotency-Key header, single-flight lifecycle mutations)
+    idempotency_key_ttl_seconds: int = 86400  # responses replayed for a repeated key
+    idempotency_coalesce_ttl_seconds: int = 5  # results kept for coalesced duplicates without a key
+    
+    # Provisioning Saga (per-step state in Redis, resumed on retry)
+    provision_max_attempts: int = 3  # failed attempts before compensating deletes run
+    provision_state_ttl_seconds: int = 86400
+    
+    # Capacity Admission (reject creates no schedulable node can fit)
+    capacity_admission_enabled: bool = False
+    capacity_reservation_seconds: float = 60.0  # an admitted create counts until its pod appears
+    capacity_release_window_seconds: float = 900.0  # released capacity used to estimate the ETA
+    
+    # Right-Sizing (usage percentiles from metrics-server -> lower requests/limits, leader samples)
+    rightsizing_enabled: bool = False
+    rightsizing_auto_apply: bool = False  # use the recommendation on the next create
+    rightsizing_sample_interval_seconds: int = 60
+    rightsizing_window_samples: int = 1440  # samples kept per user and resource (a day at 60s)
+    rightsizing_min_samples: int = 360  # samples needed before recommending
+    rightsizing_headroom: float = 0.2  # added on top of the observed percentiles
+    rightsizing_recompute_interval_seconds: int = 600
+    rightsizing_oom_cooldown_hours: float = 168  # no recommendation after an OOM kill
+    
+    # Placement Policies (per quota plan: strategy pack/spread/default, qos, node_selector; JSON)
+    placement_policies: str = ""  # e.g. {"*": {"strategy": "pack"}}; empty disables
+    
+    # PVC Pool (pre-provisioned PVCs claimed by first-time users)
+    pvc_pool_enabled: bool = False
+    pvc_pool_sizes: str = "10Gi=5"  # size=count per size class, comma-separated
+    pvc_pool_refill_interval_seconds: int = 15
+    
+    # Pod Restart (soft: restart the session in place through the exec API)
+    vnc_session_command: str = "/usr/local/bin/vnc-session"  # session control script in the VNC image
+    soft_restart_timeout_seconds: int = 60
+    pod_termination_timeout_seconds: int = 60  # wait for the old pod to go before recreating
+    
+    # Credentials (vnc-cred-{user} Secret, mounted and re-read by the image on rotation)
+    vnc_credentials_mount_path: str = "/etc/vnc-credentials"
+    
+    # Leader Election (background controllers run in exactly one worker)
+    leader_lease_seconds: float = 15.0
+    leader_renew_seconds: float = 5.0
+    
+    # Idle Detection / Hibernation (pod deleted, PVC/Service/Ingress/SSH port kept)
+    idle_hibernation_enabled: bool = False
+    idle_timeout_seconds: int = 7200  # no connections and low CPU for this long
+    idle_cpu_threshold_millicores: float = 50.0  # CPU at or above this counts as activity
+    idle_check_interval_seconds: int = 300
+    idle_check_concurrency: int = 4  # exec probes in flight
+    
+    # Stale Environment Cleanup (age-based; prefer idle hibernation)
+    cleanup_enabled: bool = False
+    cleanup_interval_seconds: int = 3600
+    cleanup_max_age_hours: int = 24
+    cleanup_concurrency: int = 4  # deletions in flight
+    cleanup_rate_per_second: float = 2.0  # deletions started per second
+    
+    # Orphaned Resource Garbage Collection
+    gc_enabled: bool = False
+    gc_interval_seconds: int = 1800
+    gc_min_age_seconds: int = 600  # younger objects may belong to an in-flight create
+    gc_reclaim_pvcs: bool = False  # orphaned PVCs hold user data; opt in explicitly
+    gc_concurrency: int = 4  # deletions in flight
+    gc_rate_per_second: float = 5.0  # deletions started per second
+    
+    # Lifecycle Events
+    events_queue_size: int = 10000  # queued events before new ones are dropped
+    events_batch_size: int = 200  # events per flush
+    events_flush_interval: float = 0.5  # max seconds an event waits in the queue
+    events_stream_key: str = "vnc:events"  # Redis Stream receiving lifecycle events
+    events_stream_maxlen: int = 100000  # approximate cap on stream length
+    
+    # Cold-Start Phase Tracking (pod conditions + kubelet/provisioner events)
+    cold_start_tracking_enabled: bool = True
+    cold_start_event_grace_seconds: float = 30.0  # wait after Ready for a late Pulled event
+    
+    # Log Streaming
+    log_stream_chunk_size: int = 8192  # Bytes read from the apiserver per chunk
+    log_follow_idle_timeout_seconds: float = 15.0  # follow streams reopen after this long without output
     
     # Monitoring
     enable_metrics: bool = True
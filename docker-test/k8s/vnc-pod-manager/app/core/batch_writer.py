@@ -0,0 +1,130 @@
+"""Bounded-queue batch writer running in a background thread"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class BatchWriter:
+    """
+    Collect items from request handlers and flush them in batches
+
+    submit() never blocks: when the queue is full the item is dropped and
+    counted, so a slow or unavailable sink cannot stall the API. A single
+    background thread flushes whenever batch_size items are waiting or
+    flush_interval seconds have passed since the first unflushed item.
+    """
+
+    def __init__(self, name: str, flush_fn: Callable[[List[Any]], None], max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0):
+        """
+        Initialize batch writer
+
+        Args:
+            name: Name used in log messages and the thread name
+            flush_fn: Callable receiving a list of items; raising drops the batch
+            max_queue: Maximum number of queued items
+            batch_size: Maximum items per flush
+            flush_interval: Maximum seconds an item waits before being flushed
+        """
+        self.name = name
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.submitted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def submit(self, item: Any) -> bool:
+        """
+        Queue an item without blocking
+
+        Returns:
+            False if the queue was full and the item was dropped
+        """
+        try:
+            self._queue.put_nowait(item)
+            self.submitted += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Batch writer {self.name} queue full, {self.dropped} items dropped so far")
+            return False
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"batch-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flush thread after draining what is already queued"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring"""
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+    def _collect(self) -> List[Any]:
+        """Wait for the first item, then gather until the batch is full or the interval expires"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[Any]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Any]):
+        try:
+            self.flush_fn(batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Batch writer {self.name} failed to flush {len(batch)} items: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+        # Drain on shutdown
+        batch = self._drain()
+        while batch:
+            self._flush(batch)
+            batch = self._drain()
@@ -0,0 +1,512 @@
+"""
+Capacity-aware admission for new VNC pods
+
+A create used to be accepted even when no node could fit the pod, which
+then sat Pending while holding its SSH port, Ingress and create lock.
+This module keeps an in-memory model of the cluster, fed incrementally by
+two informers (no list per request) that cache only the projections below
+(project_node, project_pod) rather than whole objects:
+
+- nodes: allocatable CPU, memory and pod count of every schedulable node
+  (Ready, not cordoned, no NoSchedule/NoExecute taints)
+- pods in all namespaces (not Succeeded/Failed): every event applies the
+  difference between the old and new object's requests to its node; an
+  unscheduled pod in the VNC namespace counts as pending demand (pending
+  pods elsewhere often target nodes of their own and are not counted)
+
+Admission places the pending demand and the recent admissions of every
+worker (reservations, dropped once the informer sees the pod) first-fit
+onto the free capacity, then checks that the new pod still fits on a node
+its required node affinity allows (policy node selector, pinned image
+digest label). When it does not, the create is rejected immediately with an ETA estimated from
+the rate at which requested capacity has been released recently.
+
+Reservations live in one Redis hash (user -> [cpu, memory, expiry]) that
+admission reads and writes in a WATCH/MULTI transaction, so concurrent
+creates on different workers and replicas cannot oversubscribe a node.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.utils.helpers import parse_resource_string
+
+logger = logging.getLogger(__name__)
+
+admission_counter = Counter(
+    'vnc_admission_decisions_total', 'Capacity admission decisions for new pods', ['decision']
+)
+capacity_slots_gauge = Gauge(
+    'vnc_capacity_free_slots', 'Default-size VNC pods that still fit on schedulable nodes',
+    multiprocess_mode='livemostrecent'
+)
+capacity_fragmentation_gauge = Gauge(
+    'vnc_capacity_fragmentation_ratio', 'Share of free capacity too small for a default-size VNC pod', ['resource'],
+    multiprocess_mode='livemostrecent'
+)
+
+# (cpu cores, memory bytes, pods)
+Resources = Tuple[float, float, int]
+
+RESERVATIONS_KEY = "capacity:reservations"
+
+_NO_SCHEDULE_EFFECTS = {"NoSchedule", "NoExecute"}
+
+def _quantity(value: Optional[str]) -> float:
+    return parse_resource_string(value) or 0.0
+
+def pod_requests(pod: Dict[str, Any]) -> Resources:
+    """
+    Effective scheduling requests of a raw pod
+
+    As the scheduler computes them: the larger of the summed app container
+    requests and the largest init container request, plus pod overhead.
+    """
+    spec = pod.get("spec") or {}
+
+    def requests(container):
+        values = (container.get("resources") or {}).get("requests") or {}
+        return _quantity(values.get("cpu")), _quantity(values.get("memory"))
+
+    containers = [requests(c) for c in spec.get("containers") or []]
+    init = [requests(c) for c in spec.get("initContainers") or []]
+    cpu = max(sum(c for c, _ in containers), max((c for c, _ in init), default=0.0))
+    memory = max(sum(m for _, m in containers), max((m for _, m in init), default=0.0))
+    overhead = spec.get("overhead") or {}
+    return cpu + _quantity(overhead.get("cpu")), memory + _quantity(overhead.get("memory")), 1
+
+def project_pod(pod: Dict[str, Any]) -> Dict[str, Any]:
+    """Informer projection of a raw pod: identity, node, phase and effective requests"""
+    metadata = pod.get("metadata") or {}
+    user_id = (metadata.get("labels") or {}).get("user")
+    return {
+        "metadata": {
+            "name": metadata.get("name"),
+            "namespace": metadata.get("namespace"),
+            "resourceVersion": metadata.get("resourceVersion"),
+            "labels": {"user": user_id} if user_id else {}
+        },
+        "spec": {"nodeName": (pod.get("spec") or {}).get("nodeName")},
+        "status": {"phase": (pod.get("status") or {}).get("phase")},
+        "requests": pod_requests(pod)
+    }
+
+def project_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Informer projection of a raw node: identity, labels and allocatable if schedulable"""
+    metadata = node.get("metadata") or {}
+    return {
+        "metadata": {
+            "name": metadata.get("name"),
+            "resourceVersion": metadata.get("resourceVersion"),
+            "labels": dict(metadata.get("labels") or {})
+        },
+        "allocatable": _node_allocatable(node)
+    }
+
+def node_matches(labels: Dict[str, str], terms: Optional[List[Dict[str, Any]]]) -> bool:
+    """
+    Whether a node's labels satisfy required node selector terms
+
+    Terms are ORed and the match expressions of a term ANDed, as by the
+    scheduler; None or no terms matches every node.
+    """
+    if not terms:
+        return True
+    for term in terms:
+        matched = True
+        for expression in term.get("matchExpressions") or []:
+            key = expression.get("key")
+            operator = expression.get("operator")
+            values = expression.get("values") or []
+            value = labels.get(key)
+            if operator == "In":
+                matched = value in values
+            elif operator == "NotIn":
+                matched = value not in values
+            elif operator == "Exists":
+                matched = key in labels
+            elif operator == "DoesNotExist":
+                matched = key not in labels
+            elif operator in ("Gt", "Lt"):
+                try:
+                    difference = int(value) - int(values[0])
+                except (TypeError, ValueError, IndexError):
+                    matched = False
+                else:
+                    matched = difference > 0 if operator == "Gt" else difference < 0
+            else:
+                matched = False
+            if not matched:
+                break
+        if matched:
+            return True
+    return False
+
+def _node_allocatable(node: Dict[str, Any]) -> Optional[Resources]:
+    """Allocatable resources of a schedulable raw node, or None"""
+    spec = node.get("spec") or {}
+    status = node.get("status") or {}
+    if spec.get("unschedulable"):
+        return None
+    if any(taint.get("effect") in _NO_SCHEDULE_EFFECTS for taint in spec.get("taints") or []):
+        return None
+    if not any(c.get("type") == "Ready" and c.get("status") == "True" for c in status.get("conditions") or []):
+        return None
+    allocatable = status.get("allocatable") or {}
+    return (
+        _quantity(allocatable.get("cpu")),
+        _quantity(allocatable.get("memory")),
+        int(_quantity(allocatable.get("pods")) or 110)
+    )
+
+def _counted(pod: Optional[Dict[str, Any]]) -> bool:
+    if not pod:
+        return False
+    return (pod.get("status") or {}).get("phase") not in ("Succeeded", "Failed")
+
+class AdmissionRejected(Exception):
+    """No schedulable node can fit the requested pod"""
+
+    def __init__(self, eta_seconds: Optional[float], message: str):
+        self.eta_seconds = eta_seconds
+        super().__init__(message)
+
+class CapacityModel:
+    """Node allocatable minus pod requests, maintained from informer events"""
+
+    def __init__(self, namespace: str, redis_client, reservation_ttl: float = 60.0, release_window: float = 900.0):
+        """
+        Initialize model
+
+        Args:
+            namespace: Namespace of the VNC pods (source of pending demand)
+            redis_client: Redis client holding the reservations shared by all workers
+            reservation_ttl: Seconds an admission is counted before its pod shows up
+            release_window: Seconds of released capacity the ETA rate is estimated from
+        """
+        self.namespace = namespace
+        self.redis = redis_client
+        self.reservation_ttl = reservation_ttl
+        self.release_window = release_window
+        self._allocatable: Dict[str, Resources] = {}
+        self._labels: Dict[str, Dict[str, str]] = {}  # schedulable node -> labels
+        self._requested: Dict[str, List[float]] = {}  # node -> [cpu, memory, pods]
+        self._vnc_pods: Dict[str, int] = {}  # node -> scheduled pods in the VNC namespace
+        self._pending: Dict[str, Resources] = {}  # unscheduled pod key -> requests
+        self._releases: deque = deque()  # (monotonic time, cpu, memory) of freed requests
+        self._lock = threading.Lock()
+
+    # Informer handlers
+
+    def on_node(self, event_type: str, node: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        """Node informer handler (projected nodes, see project_node)"""
+        name = (node.get("metadata") or {}).get("name")
+        with self._lock:
+            allocatable = None if event_type == "DELETED" else node.get("allocatable")
+            if allocatable is None:
+                self._allocatable.pop(name, None)
+                self._labels.pop(name, None)
+            else:
+                self._allocatable[name] = allocatable
+                self._labels[name] = (node.get("metadata") or {}).get("labels") or {}
+
+    def on_pod(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        """Cluster-wide pod informer handler (projected pods, see project_pod): apply the change in requests"""
+        metadata = pod.get("metadata") or {}
+        key = f"{metadata.get('namespace')}/{metadata.get('name')}"
+        new = None if event_type == "DELETED" else pod
+
+        seen_user = None
+        with self._lock:
+            old_node = new_node = None
+            if _counted(old):
+                self._apply(old, key, -1)
+                old_node = (old.get("spec") or {}).get("nodeName")
+            if _counted(new):
+                self._apply(new, key, +1)
+                new_node = (new.get("spec") or {}).get("nodeName")
+            if old_node and old_node != new_node:
+                requests = old["requests"]
+                self._releases.append((time.monotonic(), requests[0], requests[1]))
+            user_id = (metadata.get("labels") or {}).get("user")
+            if (old is None and new is not None and user_id and metadata.get("name") == f"vnc-{user_id}"
+                    and (new.get("status") or {}).get("phase") == "Pending"):
+                seen_user = user_id
+
+        # A new pod counts itself from now on (only new pods can still hold a reservation)
+        if seen_user:
+            try:
+                self.redis.hdel(RESERVATIONS_KEY, seen_user)
+            except Exception as e:
+                logger.warning(f"Failed to drop the capacity reservation of user {seen_user}: {e}")
+
+    def _apply(self, pod: Dict[str, Any], key: str, sign: int):
+        """Add (sign=1) or remove (sign=-1) a pod's requests; called with the lock held"""
+        requests = pod["requests"]
+        node = (pod.get("spec") or {}).get("nodeName")
+        if not node:
+            if (pod.get("metadata") or {}).get("namespace") != self.namespace:
+                return
+            if sign > 0:
+                self._pending[key] = requests
+            else:
+                self._pending.pop(key, None)
+            return
+        used = self._requested.setdefault(node, [0.0, 0.0, 0])
+        for i, value in enumerate(requests):
+            used[i] += sign * value
+        if (pod.get("metadata") or {}).get("namespace") == self.namespace:
+            self._vnc_pods[node] = self._vnc_pods.get(node, 0) + sign
+
+    # Admission
+
+    def _free(self) -> Dict[str, List[float]]:
+        free = {}
+        for node, (cpu, memory, pods) in self._allocatable.items():
+            used = self._requested.get(node, (0.0, 0.0, 0))
+            free[node] = [cpu - used[0], memory - used[1], pods - used[2]]
+        return free
+
+    def _eligible(self, node_terms: Optional[List[Dict[str, Any]]]) -> Optional[set]:
+        """Nodes matching required node selector terms, or None for any node; called with the lock held"""
+        if not node_terms:
+            return None
+        return {node for node, labels in self._labels.items() if node_matches(labels, node_terms)}
+
+    @staticmethod
+    def _place(free: Dict[str, List[float]], requests: Resources, nodes: Optional[set] = None) -> bool:
+        """First-fit one pod onto the free capacity (of the given nodes); True if it fit"""
+        for node, remaining in free.items():
+            if nodes is not None and node not in nodes:
+                continue
+            if all(remaining[i] >= requests[i] for i in range(3)):
+                for i in range(3):
+                    remaining[i] -= requests[i]
+                return True
+        return False
+
+    def _reservations(self, client, now: float) -> Tuple[Dict[str, Resources], List[str]]:
+        """Live reservations of all workers and the users whose reservation expired"""
+        live: Dict[str, Resources] = {}
+        expired = []
+        for user_id, value in client.hgetall(RESERVATIONS_KEY).items():
+            cpu, memory, expiry = json.loads(value)
+            if expiry <= now:
+                expired.append(user_id)
+            else:
+                live[user_id] = (cpu, memory, 1)
+        return live, expired
+
+    def _release_rate(self, requests: Resources, now: float) -> float:
+        """Pods of this size released per second over the release window"""
+        while self._releases and self._releases[0][0] < now - self.release_window:
+            self._releases.popleft()
+        if not self._releases:
+            return 0.0
+        cpu = sum(r[1] for r in self._releases)
+        memory = sum(r[2] for r in self._releases)
+        slots = min(cpu / requests[0] if requests[0] else math.inf,
+                    memory / requests[1] if requests[1] else math.inf)
+        if math.isinf(slots):
+            slots = len(self._releases)
+        return slots / self.release_window
+
+    def admit(self, user_id: str, cpu: str, memory: str, node_terms: Optional[List[Dict[str, Any]]] = None,
+              replaces: Optional[Dict[str, Any]] = None):
+        """
+        Reserve room for a new pod or reject it
+
+        Args:
+            user_id: User identifier (one reservation per user)
+            cpu: CPU request quantity
+            memory: Memory request quantity
+            node_terms: Required node selector terms of the pod (None: any node)
+            replaces: Projected pod (project_pod) the new pod replaces; its requests
+                are credited back as if it were already gone
+
+        Raises:
+            AdmissionRejected: No schedulable node can fit the pod; carries an ETA
+        """
+        requests = (_quantity(cpu), _quantity(memory), 1)
+        replaced_key = replaced_node = None
+        if _counted(replaces):
+            metadata = replaces.get("metadata") or {}
+            replaced_key = f"{metadata.get('namespace')}/{metadata.get('name')}"
+            replaced_node = (replaces.get("spec") or {}).get("nodeName")
+
+        def decide(pipe):
+            # Runs again if another worker changed the reservations before MULTI/EXEC
+            now = time.time()
+            reservations, expired = self._reservations(pipe, now)
+            reservations.pop(user_id, None)
+            with self._lock:
+                free = self._free()
+                eligible = self._eligible(node_terms)
+                pending = [demand for key, demand in self._pending.items() if key != replaced_key]
+            if replaced_node in free:
+                free[replaced_node] = [free[replaced_node][i] + replaces["requests"][i] for i in range(3)]
+            # Demand ahead of this request, largest first
+            ahead = sorted(pending + list(reservations.values()), key=lambda r: (r[1], r[0]), reverse=True)
+            unplaced = sum(1 for demand in ahead if not self._place(free, demand))
+            fits = self._place(free, requests, eligible)
+            pipe.multi()
+            if expired:
+                pipe.hdel(RESERVATIONS_KEY, *expired)
+            if fits:
+                pipe.hset(RESERVATIONS_KEY, user_id, json.dumps([requests[0], requests[1], now + self.reservation_ttl]))
+            else:
+                pipe.hdel(RESERVATIONS_KEY, user_id)
+            return fits, unplaced, len(ahead)
+
+        fits, unplaced, ahead = self.redis.transaction(decide, RESERVATIONS_KEY, value_from_callable=True)
+        if fits:
+            admission_counter.labels(decision="admitted").inc()
+            return
+        with self._lock:
+            rate = self._release_rate(requests, time.monotonic())
+        eta = round((unplaced + 1) / rate) if rate > 0 else None
+
+        admission_counter.labels(decision="rejected").inc()
+        logger.warning(
+            f"Rejected create for user {user_id}: no node fits {cpu} CPU / {memory} "
+            f"({ahead} pods pending, ETA {eta}s)"
+        )
+        raise AdmissionRejected(eta, f"Cluster is at capacity: no node can fit {cpu} CPU / {memory} memory")
+
+    def release(self, user_id: str):
+        """Drop a user's reservation (the create failed before its pod was created)"""
+        try:
+            self.redis.hdel(RESERVATIONS_KEY, user_id)
+        except Exception as e:
+            logger.warning(f"Failed to release the capacity reservation of user {user_id}: {e}")
+
+    @staticmethod
+    def _utilization(allocatable: Resources, used) -> float:
+        """Larger of the CPU and memory fraction requested on a node"""
+        return max(used[i] / allocatable[i] if allocatable[i] else 0.0 for i in range(2))
+
+    def most_allocated(self, cpu: str, memory: str, limit: int = 3,
+                       node_terms: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """
+        Nodes that still fit a pod of this size, most allocated first
+
+        Args:
+            cpu: CPU request quantity
+            memory: Memory request quantity
+            limit: Maximum number of nodes returned
+            node_terms: Required node selector terms of the pod (None: any node)
+        """
+        requests = (_quantity(cpu), _quantity(memory), 1)
+        with self._lock:
+            free = self._free()
+            eligible = self._eligible(node_terms)
+            fitting = [
+                (self._utilization(self._allocatable[node], self._requested.get(node, (0.0, 0.0, 0))), node)
+                for node, remaining in free.items()
+                if (eligible is None or node in eligible) and all(remaining[i] >= requests[i] for i in range(3))
+            ]
+        return [node for _, node in sorted(fitting, reverse=True)[:limit]]
+
+    def utilization(self, cpu: str, memory: str) -> Dict[str, Any]:
+        """
+        Per-node utilization and how fragmented the free capacity is
+
+        Fragmentation of a resource is the share of its free capacity that
+        sits in pieces too small for one pod of the given size. A node is
+        drainable when its VNC pods fit into the free slots of the others.
+
+        Args:
+            cpu: CPU request quantity of one pod
+            memory: Memory request quantity of one pod
+        """
+        requests = (_quantity(cpu), _quantity(memory), 1)
+        with self._lock:
+            allocatable = dict(self._allocatable)
+            requested = {node: tuple(used) for node, used in self._requested.items()}
+            vnc_pods = dict(self._vnc_pods)
+
+        nodes = {}
+        free_total = [0.0, 0.0]
+        for node, alloc in allocatable.items():
+            used = requested.get(node, (0.0, 0.0, 0))
+            remaining = [alloc[i] - used[i] for i in range(3)]
+            slots = max(0, int(min(
+                remaining[0] / requests[0] if requests[0] else math.inf,
+                remaining[1] / requests[1] if requests[1] else math.inf,
+                remaining[2]
+            )))
+            for i in range(2):
+                free_total[i] += max(0.0, remaining[i])
+            nodes[node] = {
+                "cpu": {"allocatable": round(alloc[0], 3), "requested": round(used[0], 3),
+                        "utilization": round(used[0] / alloc[0], 3) if alloc[0] else None},
+                "memory": {"allocatable": int(alloc[1]), "requested": int(used[1]),
+                           "utilization": round(used[1] / alloc[1], 3) if alloc[1] else None},
+                "pods": int(used[2]),
+                "vnc_pods": vnc_pods.get(node, 0),
+                "free_slots": slots
+            }
+
+        total_slots = sum(n["free_slots"] for n in nodes.values())
+        for info in nodes.values():
+            info["drainable"] = info["vnc_pods"] <= total_slots - info["free_slots"]
+        fragmentation = {
+            resource: round(1 - min(1.0, total_slots * requests[i] / free_total[i]), 3) if free_total[i] else 0.0
+            for i, resource in enumerate(("cpu", "memory"))
+        }
+        for resource, ratio in fragmentation.items():
+            capacity_fragmentation_gauge.labels(resource=resource).set(ratio)
+        return {
+            "pod_size": {"cpu": cpu, "memory": memory},
+            "free_slots": total_slots,
+            "fragmentation": fragmentation,
+            "drainable_nodes": sorted(
+                (node for node, info in nodes.items() if info["vnc_pods"] and info["drainable"]),
+                key=lambda node: nodes[node]["vnc_pods"]
+            ),
+            "nodes": nodes
+        }
+
+    def status(self, cpu: str, memory: str) -> Dict[str, Any]:
+        """
+        Per-node free capacity and how many pods of the given size still fit
+
+        Args:
+            cpu: CPU request quantity of one pod
+            memory: Memory request quantity of one pod
+        """
+        requests = (_quantity(cpu), _quantity(memory), 1)
+        reservations, _ = self._reservations(self.redis, time.time())
+        with self._lock:
+            free = self._free()
+            nodes = {
+                node: {"cpu": round(remaining[0], 3), "memory": int(remaining[1]), "pods": int(remaining[2])}
+                for node, remaining in free.items()
+            }
+            demand = list(self._pending.values())
+        for requested in demand + list(reservations.values()):
+            self._place(free, requested)
+        slots = sum(
+            max(0, int(min(
+                remaining[0] / requests[0] if requests[0] else math.inf,
+                remaining[1] / requests[1] if requests[1] else math.inf,
+                remaining[2]
+            )))
+            for remaining in free.values()
+        )
+        capacity_slots_gauge.set(slots)
+        return {
+            "schedulable_nodes": len(nodes),
+            "pending_pods": len(demand),
+            "reservations": len(reservations),
+            "free_slots": slots,
+            "pod_size": {"cpu": cpu, "memory": memory},
+            "nodes": nodes
+        }
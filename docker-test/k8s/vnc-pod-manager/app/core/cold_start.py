@@ -0,0 +1,361 @@
+"""
+Cold-start phase breakdown of VNC pods
+
+A pod's start is reconstructed from timestamps the cluster already
+records, so nothing is polled:
+
+- pod conditions from the pod informer: creation, PodScheduled,
+  ContainersReady and Ready
+- events from an events informer in the pods namespace: the provisioner's
+  ProvisioningSucceeded on the user's PVC, and the kubelet's Pulling,
+  Pulled and Started on the pod
+
+Once a pod first turns Ready (and its Pulled event has arrived, or
+grace_seconds have passed), the consecutive phases between these
+milestones are observed in the vnc_cold_start_phase_seconds histogram and
+stored in the environment record as cold_start. Condition and most event
+timestamps have one-second resolution.
+
+Only the worker holding the leader lease tracks: it starts the events
+informer when it acquires the lease and stops it (dropping the cached
+events) when it loses it, so the events are watched, cached and recorded
+once per cluster rather than once per worker. The informer caches each
+event as project_event's projection rather than the whole object.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from prometheus_client import Histogram
+
+from app.core.k8s_projection import parse_time
+
+logger = logging.getLogger(__name__)
+
+# Consecutive phases: (name, milestones whose latest starts the phase, end milestone)
+PHASES = (
+    ("pvc_bind", ("created",), "pvc_bound"),  # provisioning on the storage class
+    ("schedule", ("pvc_bound", "created"), "scheduled"),
+    ("kubelet_setup", ("scheduled",), "pulling"),  # volume mounts, sandbox
+    ("image_pull", ("pulling",), "pulled"),
+    ("container_start", ("pulled",), "started"),
+    ("readiness", ("started",), "ready"),  # readiness probe delay and first success
+    ("total", ("created",), "ready")
+)
+
+cold_start_phase_histogram = Histogram(
+    'vnc_cold_start_phase_seconds', 'VNC pod cold-start time per phase', ['phase'],
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120, 180, 300, 600)
+)
+
+# Kubelet event reasons recorded per pod
+_POD_EVENT_MILESTONES = {"Pulling": "pulling", "Pulled": "pulled", "Started": "started"}
+# Pod conditions recorded when they turn True
+_CONDITION_MILESTONES = {"PodScheduled": "scheduled", "ContainersReady": "containers_ready", "Ready": "ready"}
+
+def project_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Informer projection of a raw event: what the tracker reads from it"""
+    metadata = event.get("metadata") or {}
+    involved = event.get("involvedObject") or {}
+    return {
+        "metadata": {
+            "name": metadata.get("name"),
+            "namespace": metadata.get("namespace"),
+            "resourceVersion": metadata.get("resourceVersion"),
+            "creationTimestamp": metadata.get("creationTimestamp")
+        },
+        "involvedObject": {"kind": involved.get("kind"), "name": involved.get("name"), "uid": involved.get("uid")},
+        "reason": event.get("reason"),
+        "message": event.get("message") if event.get("reason") == "Pulled" else None,
+        "eventTime": event.get("eventTime"),
+        "firstTimestamp": event.get("firstTimestamp"),
+        "lastTimestamp": event.get("lastTimestamp")
+    }
+
+def event_time(event: Dict[str, Any]) -> Optional[datetime]:
+    """When a raw core/v1 Event first occurred"""
+    return parse_time(
+        event.get("eventTime") or event.get("firstTimestamp") or event.get("lastTimestamp")
+        or (event.get("metadata") or {}).get("creationTimestamp")
+    )
+
+def phase_durations(milestones: Dict[str, datetime]) -> Dict[str, float]:
+    """
+    Seconds spent in each phase whose end milestone was observed
+
+    A missing Pulling event (image already present) makes image_pull 0 and
+    kubelet_setup end at Pulled; a PVC bound before the pod was created
+    gives pvc_bind 0.
+
+    Args:
+        milestones: Milestone name -> time
+
+    Returns:
+        Phase name -> seconds (never negative)
+    """
+    milestones = dict(milestones)
+    if "pulled" in milestones:
+        milestones.setdefault("pulling", milestones["pulled"])
+
+    durations = {}
+    for phase, starts, end in PHASES:
+        start = max((milestones[name] for name in starts if name in milestones), default=None)
+        if start is not None and end in milestones:
+            durations[phase] = max(0.0, (milestones[end] - start).total_seconds())
+    return durations
+
+def phase_percentiles(records: Iterable[Dict[str, Any]],
+                      quantiles=(0.5, 0.95, 0.99)) -> Dict[str, Dict[str, Any]]:
+    """
+    Nearest-rank percentiles of each phase over environment records
+
+    Args:
+        records: Registry records; those without cold_start are skipped
+        quantiles: Quantiles to report
+
+    Returns:
+        Phase name -> {"count", "p50", "p95", "p99"} in seconds
+    """
+    samples: Dict[str, List[float]] = {}
+    for record in records:
+        for phase, seconds in ((record.get("cold_start") or {}).get("phases") or {}).items():
+            samples.setdefault(phase, []).append(seconds)
+
+    result = {}
+    for phase, _, _ in PHASES:
+        values = sorted(samples.get(phase, ()))
+        if not values:
+            continue
+        summary: Dict[str, Any] = {"count": len(values)}
+        for q in quantiles:
+            summary[f"p{round(q * 100):g}"] = values[max(0, math.ceil(q * len(values)) - 1)]
+        result[phase] = summary
+    return result
+
+class _PodStart:
+    __slots__ = ("user_id", "pod_name", "pvc_name", "milestones", "image_cached", "ready_seen_at")
+
+    def __init__(self):
+        self.user_id: Optional[str] = None
+        self.pod_name: Optional[str] = None
+        self.pvc_name: Optional[str] = None
+        self.milestones: Dict[str, datetime] = {}
+        self.image_cached: Optional[bool] = None
+        self.ready_seen_at: Optional[float] = None
+
+class ColdStartTracker:
+    """Informer handlers assembling per-pod cold-start milestones"""
+
+    def __init__(self, registry, elector, informer_factory: Callable, grace_seconds: float = 30.0,
+                 max_age_seconds: float = 3600.0, max_finished: int = 10000, check_interval: float = 5.0):
+        """
+        Initialize tracker
+
+        Args:
+            registry: EnvironmentRegistry receiving the cold_start field
+            elector: LeaderElector; only the leader tracks
+            informer_factory: Returns a new (not started) events informer
+            grace_seconds: How long after Ready a late Pulled event is waited for
+            max_age_seconds: Pods (and PVC events) not Ready after this are forgotten
+            max_finished: Recently finished pod UIDs remembered to ignore their later events
+            check_interval: Seconds between leadership checks
+        """
+        self.registry = registry
+        self.elector = elector
+        self.informer_factory = informer_factory
+        self.check_interval = check_interval
+        self.informer = None
+        self.grace_seconds = grace_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_finished = max_finished
+        self._starts: Dict[str, _PodStart] = {}
+        self._pvc_bound: Dict[str, datetime] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self.recorded = 0
+
+    async def run(self):
+        """Watch events while this worker is the leader, until cancelled"""
+        try:
+            while True:
+                leading = self.elector.is_leader
+                if leading and self.informer is None:
+                    self._reset()
+                    self.informer = self.informer_factory()
+                    self.informer.add_handler(self.on_event)
+                    self.informer.start()
+                    logger.info("Cold-start tracking started (leader)")
+                elif not leading and self.informer is not None:
+                    self._stop_informer()
+                    logger.info("Cold-start tracking stopped (no longer leader)")
+                await asyncio.sleep(self.check_interval)
+        finally:
+            self._stop_informer()
+
+    def _stop_informer(self):
+        informer, self.informer = self.informer, None
+        if informer is not None:
+            informer.stop()
+            self._reset()
+
+    def _reset(self):
+        """Forget pods in progress (their milestones may be incomplete)"""
+        with self._lock:
+            self._starts.clear()
+            self._pvc_bound.clear()
+
+    def on_pod(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        """Pod informer handler (ignored unless this worker is tracking)"""
+        if self.informer is None:
+            return
+        metadata = pod.get("metadata") or {}
+        uid = metadata.get("uid")
+        user_id = (metadata.get("labels") or {}).get("user")
+        if not uid or not user_id:
+            return
+
+        milestones = {}
+        for condition in (pod.get("status") or {}).get("conditions") or []:
+            name = _CONDITION_MILESTONES.get(condition.get("type"))
+            if name and condition.get("status") == "True":
+                milestones[name] = parse_time(condition.get("lastTransitionTime"))
+
+        finish = False
+        with self._lock:
+            self._prune()
+            if event_type == "DELETED":
+                self._starts.pop(uid, None)
+                return
+            if uid in self._finished:
+                return
+            start = self._starts.get(uid)
+            if start is None:
+                if "ready" in milestones:
+                    return  # became Ready before this process was watching
+                start = self._starts[uid] = _PodStart()
+
+            start.user_id = user_id
+            start.pod_name = metadata.get("name")
+            start.pvc_name = next((
+                (volume.get("persistentVolumeClaim") or {}).get("claimName")
+                for volume in (pod.get("spec") or {}).get("volumes") or []
+                if volume.get("persistentVolumeClaim")
+            ), None)
+            created = parse_time(metadata.get("creationTimestamp"))
+            if created:
+                start.milestones["created"] = created
+            for name, at in milestones.items():
+                if at:
+                    start.milestones.setdefault(name, at)
+            if "ready" in start.milestones and start.ready_seen_at is None:
+                start.ready_seen_at = time.monotonic()
+                finish = "pulled" in start.milestones
+                if not finish:
+                    # The kubelet's events are written asynchronously and may trail the condition
+                    timer = threading.Timer(self.grace_seconds, self._finish_late, args=(uid,))
+                    timer.daemon = True
+                    timer.start()
+        if finish:
+            self._finish(uid)
+
+    def on_event(self, event_type: str, event: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        """Events informer handler"""
+        if event_type == "DELETED":
+            return
+        involved = event.get("involvedObject") or {}
+        reason = event.get("reason")
+        kind = involved.get("kind")
+
+        if kind == "PersistentVolumeClaim" and reason == "ProvisioningSucceeded":
+            at = event_time(event)
+            with self._lock:
+                previous = self._pvc_bound.get(involved.get("name"))
+                if at and (previous is None or at > previous):
+                    # A recreated PVC reuses its name; keep the latest provisioning
+                    self._pvc_bound[involved.get("name")] = at
+            return
+
+        name = _POD_EVENT_MILESTONES.get(reason)
+        uid = involved.get("uid")
+        if kind != "Pod" or not name or not uid:
+            return
+        at = event_time(event)
+        if not at:
+            return
+
+        with self._lock:
+            if uid in self._finished:
+                return
+            start = self._starts.get(uid)
+            if start is None:
+                # Events can arrive before the informer delivers the pod
+                start = self._starts[uid] = _PodStart()
+            if name not in start.milestones or at < start.milestones[name]:
+                start.milestones[name] = at
+            if name == "pulled":
+                start.image_cached = "already present" in (event.get("message") or "")
+            finish = name == "pulled" and start.ready_seen_at is not None
+        if finish:
+            self._finish(uid)
+
+    def _finish_late(self, uid: str):
+        try:
+            self._finish(uid)
+        except Exception as e:
+            logger.error(f"Failed to record cold start of pod {uid}: {e}")
+
+    def _finish(self, uid: str):
+        """Observe and store the phases of a pod once"""
+        with self._lock:
+            start = self._starts.pop(uid, None)
+            if start is None or start.user_id is None:
+                return
+            self._finished[uid] = None
+            while len(self._finished) > self.max_finished:
+                self._finished.popitem(last=False)
+            milestones = dict(start.milestones)
+            bound = self._pvc_bound.get(start.pvc_name)
+            if bound:
+                milestones["pvc_bound"] = bound
+
+        durations = phase_durations(milestones)
+        for phase, seconds in durations.items():
+            cold_start_phase_histogram.labels(phase=phase).observe(seconds)
+        self.recorded += 1
+
+        record = {
+            "pod_uid": uid,
+            "pod_name": start.pod_name,
+            "milestones": {name: at.isoformat() for name, at in sorted(milestones.items(), key=lambda m: m[1])},
+            "phases": {phase: round(seconds, 3) for phase, seconds in durations.items()},
+            "image_cached": start.image_cached
+        }
+        self.registry.update(start.user_id, cold_start=record)
+        logger.info(
+            f"Cold start of {start.pod_name}: "
+            + ", ".join(f"{phase}={seconds:.0f}s" for phase, seconds in durations.items())
+        )
+
+    def _prune(self):
+        """Forget pods that never became Ready and old PVC events (called with the lock held)"""
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        cutoff = time.time() - self.max_age_seconds
+        for uid in [uid for uid, start in self._starts.items()
+                    if start.milestones and min(start.milestones.values()).timestamp() < cutoff]:
+            del self._starts[uid]
+        for name in [name for name, at in self._pvc_bound.items() if at.timestamp() < cutoff]:
+            del self._pvc_bound[name]
+
+    def status(self) -> Dict[str, Any]:
+        """Pods being tracked and cold starts recorded by this worker"""
+        return {"leader": self.informer is not None, "tracking": len(self._starts), "recorded": self.recorded}
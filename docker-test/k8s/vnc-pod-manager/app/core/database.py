@@ -2,7 +2,7 @@
 
 import pymysql
 from pymysql.cursors import DictCursor
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import logging
 from contextlib import contextmanager
 from app.config import settings
@@ -115,62 +115,62 @@ class DatabaseManager:
             logger.error(f"Failed to update user last access: {e}")
             return False
     
-    def get_user_resource_quota(self, user_id: int) -> Dict[str, str]:
+    def get_quota_version(self) -> Optional[int]:
         """
-        Get user's resource quota from database
+        Get the version stamp of the quota tables
         
-        Args:
-            user_id: User ID
+        Bumped by triggers on every change to vnc_quota_plan or vnc_user_quota.
         
         Returns:
-            Resource quota dict
+            Version number, or None if the quota tables are not installed
         """
         try:
             with self.get_cursor() as cursor:
-                # Check if there's a user_quota table or use default
-                # For now, return default quota
-                # You can extend this to query from a quota table
-                
-                return {
-                    "cpu_request": settings.default_cpu_request,
-                    "cpu_limit": settings.default_cpu_limit,
-                    "memory_request": settings.default_memory_request,
-                    "memory_limit": settings.default_memory_limit,
-                    "storage": settings.default_storage_size
-                }
-                
-        except pymysql.Error as e:
-            logger.error(f"Failed to get user quota: {e}")
-            return {
-                "cpu_request": "500m",
-                "cpu_limit": "2",
-                "memory_request": "1Gi",
-                "memory_limit": "4Gi",
-                "storage": "10Gi"
-            }
+                cursor.execute("SELECT version FROM vnc_quota_meta WHERE id = 1")
+                result = cursor.fetchone()
+                return int(result["version"]) if result else None
+        except pymysql.err.ProgrammingError as e:
+            if e.args and e.args[0] == 1146:  # ER_NO_SUCH_TABLE
+                return None
+            raise
+    
+    def load_quotas(self) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """
+        Bulk-load all quota plans and user assignments in one connection
+        
+        Returns:
+            (plan name -> quota dict, user ID -> plan name)
+        """
+        with self.get_cursor() as cursor:
+            cursor.execute("""
+                SELECT name, cpu_request, cpu_limit, memory_request, memory_limit, storage
+                FROM vnc_quota_plan
+            """)
+            plans = {row.pop("name"): row for row in cursor.fetchall()}
+            
+            cursor.execute("SELECT user_id, plan FROM vnc_user_quota")
+            assignments = {str(row["user_id"]): row["plan"] for row in cursor.fetchall()}
+            
+        return plans, assignments
     
     def log_pod_creation(self, user_id: int, pod_name: str, access_info: Dict[str, Any]) -> bool:
         """
         Log pod creation event
         
+        Recorded through the lifecycle event pipeline (app.core.events);
+        no MySQL connection is opened.
+        
         Args:
             user_id: User ID
             pod_name: Created pod name
             access_info: Access information
         
         Returns:
-            True if logged successfully
+            True if the event was queued
         """
-        try:
-            with self.get_cursor() as cursor:
-                # You can create a pod_logs table to track pod creation
-                # For now, just log
-                logger.info(f"Pod {pod_name} created for user {user_id}")
-                return True
-                
-        except pymysql.Error as e:
-            logger.error(f"Failed to log pod creation: {e}")
-            return False
+        from app.core.events import emit_event
+        
+        return emit_event(str(user_id), "pod_created", pod_name=pod_name)
     
     def test_connection(self) -> bool:
         """
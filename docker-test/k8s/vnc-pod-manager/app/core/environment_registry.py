@@ -0,0 +1,314 @@
+"""
+Per-user environment registry stored in Redis hashes
+
+Single source of truth for a user's environment: pod, service, ingress,
+PVC, SSH port, phase and timestamps live in one hash (env:{user_id}) that
+is updated field by field. Secondary index sets by phase and by node
+allow listing without scanning. The pod informer keeps the pod fields in
+sync, so status and listing reads never touch the apiserver.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.k8s_projection import _isoformat
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "env:"
+INDEX_PREFIX = "env:index:"
+
+# Fields stored as JSON strings / integers inside the hash
+JSON_FIELDS = {"conditions", "container_statuses", "cold_start", "quota_override"}
+INT_FIELDS = {"ssh_port"}
+
+# Pod-derived fields cleared when the pod goes away (PVC/SSH port are kept)
+POD_FIELDS = ("pod_ip", "host_ip", "node_name", "start_time", "conditions", "container_statuses")
+
+# HSET fields and move the user between phase/node index sets atomically.
+# KEYS[1] = hash key; ARGV[1] = user_id; ARGV[2] = index prefix; ARGV[3..] = field/value pairs.
+# An empty value deletes the field.
+_UPDATE_SCRIPT = """
+local key = KEYS[1]
+local user = ARGV[1]
+local prefix = ARGV[2]
+for i = 3, #ARGV, 2 do
+    local field = ARGV[i]
+    local value = ARGV[i + 1]
+    if field == 'phase' or field == 'node_name' then
+        local index = (field == 'phase') and 'phase:' or 'node:'
+        local old = redis.call('HGET', key, field)
+        if old and old ~= value then
+            redis.call('SREM', prefix .. index .. old, user)
+        end
+        if value ~= '' then
+            redis.call('SADD', prefix .. index .. value, user)
+        end
+    end
+    if value == '' then
+        redis.call('HDEL', key, field)
+    else
+        redis.call('HSET', key, field, value)
+    end
+end
+redis.call('SADD', prefix .. 'all', user)
+return 1
+"""
+
+# Remove the hash and every index membership.
+_DELETE_SCRIPT = """
+local key = KEYS[1]
+local user = ARGV[1]
+local prefix = ARGV[2]
+local phase = redis.call('HGET', key, 'phase')
+local node = redis.call('HGET', key, 'node_name')
+if phase then redis.call('SREM', prefix .. 'phase:' .. phase, user) end
+if node then redis.call('SREM', prefix .. 'node:' .. node, user) end
+redis.call('SREM', prefix .. 'all', user)
+return redis.call('DEL', key)
+"""
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _encode(field: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if field in JSON_FIELDS:
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+def _decode(record: Dict[str, str]) -> Dict[str, Any]:
+    decoded: Dict[str, Any] = {}
+    for field, value in record.items():
+        if field in JSON_FIELDS:
+            decoded[field] = json.loads(value)
+        elif field in INT_FIELDS:
+            decoded[field] = int(value)
+        else:
+            decoded[field] = value
+    return decoded
+
+class EnvironmentRegistry:
+    """Redis-hash registry of user environments with phase/node indexes"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._update = redis_client.register_script(_UPDATE_SCRIPT)
+        self._delete = redis_client.register_script(_DELETE_SCRIPT)
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"{KEY_PREFIX}{user_id}"
+
+    def update(self, user_id: str, **fields) -> None:
+        """
+        Set individual fields of a user's environment (HSET semantics)
+
+        Passing None for a field removes it. user_id and updated_at are always
+        written; phase and node_name changes also move the user between index sets.
+
+        Args:
+            user_id: User identifier
+            **fields: Field values (pod_name, phase, ssh_port, ...)
+        """
+        fields.setdefault("updated_at", _now())
+        args: List[str] = [user_id, INDEX_PREFIX, "user_id", user_id]
+        for field, value in fields.items():
+            args.extend((field, _encode(field, value)))
+        self._update(keys=[self.key(user_id)], args=args)
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a user's environment record
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Decoded record or None
+        """
+        record = self.redis.hgetall(self.key(user_id))
+        return _decode(record) if record else None
+
+    def get_field(self, user_id: str, field: str) -> Optional[Any]:
+        """Read a single field without fetching the whole record"""
+        value = self.redis.hget(self.key(user_id), field)
+        if value is None:
+            return None
+        return _decode({field: value})[field]
+
+    def mark_pod_deleted(self, user_id: str, phase: str = "Deleted", **fields) -> None:
+        """
+        Record that the pod is gone, keeping the PVC and any fields not cleared
+
+        Args:
+            user_id: User identifier
+            phase: Phase to record (e.g. "Deleted")
+            **fields: Additional fields to set or clear (None)
+        """
+        for field in POD_FIELDS:
+            fields.setdefault(field, None)
+        self.update(user_id, phase=phase, **fields)
+
+    def delete(self, user_id: str) -> None:
+        """Remove the record and its index memberships"""
+        self._delete(keys=[self.key(user_id)], args=[user_id, INDEX_PREFIX])
+
+    def user_ids(self, phase: Optional[str] = None, node: Optional[str] = None) -> List[str]:
+        """
+        List user IDs from the secondary indexes
+
+        Args:
+            phase: Only users whose pod is in this phase
+            node: Only users whose pod runs on this node
+
+        Returns:
+            List of user IDs
+        """
+        keys = []
+        if phase:
+            keys.append(f"{INDEX_PREFIX}phase:{phase}")
+        if node:
+            keys.append(f"{INDEX_PREFIX}node:{node}")
+        if not keys:
+            return list(self.redis.smembers(f"{INDEX_PREFIX}all"))
+        if len(keys) == 1:
+            return list(self.redis.smembers(keys[0]))
+        return list(self.redis.sinter(keys))
+
+    def iter_records(self, phase: Optional[str] = None, node: Optional[str] = None,
+                     batch_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """
+        Stream environment records, fetched in pipelined batches
+
+        Args:
+            phase: Optional phase filter
+            node: Optional node filter
+            batch_size: Records fetched per pipeline round trip
+
+        Returns:
+            Generator of decoded records
+        """
+        user_ids = self.user_ids(phase=phase, node=node)
+        for start in range(0, len(user_ids), batch_size):
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id in user_ids[start:start + batch_size]:
+                pipe.hgetall(self.key(user_id))
+            for record in pipe.execute():
+                if record:
+                    yield _decode(record)
+
+    def count_by_phase(self) -> Dict[str, int]:
+        """
+        Count environments per phase from the index sets
+
+        Returns:
+            Mapping of phase -> number of users
+        """
+        prefix = f"{INDEX_PREFIX}phase:"
+        keys = list(self.redis.scan_iter(match=f"{prefix}*"))
+        if not keys:
+            return {}
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.scard(key)
+        return {key[len(prefix):]: count for key, count in zip(keys, pipe.execute()) if count}
+
+def project_pod_fields(pod: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the registry fields from a raw pod object
+
+    Args:
+        pod: Raw pod dict (from the informer)
+
+    Returns:
+        Field mapping for EnvironmentRegistry.update
+    """
+    metadata = pod.get("metadata") or {}
+    spec = pod.get("spec") or {}
+    status = pod.get("status") or {}
+    phase = status.get("phase")
+    if metadata.get("deletionTimestamp"):
+        phase = "Terminating"
+
+    return {
+        "pod_name": metadata.get("name"),
+        "namespace": metadata.get("namespace"),
+        "phase": phase,
+        "node_name": spec.get("nodeName"),
+        "pod_ip": status.get("podIP"),
+        "host_ip": status.get("hostIP"),
+        "created_at": _isoformat(metadata.get("creationTimestamp")),
+        "start_time": _isoformat(status.get("startTime")),
+        "conditions": [
+            {
+                "type": c.get("type"),
+                "status": c.get("status"),
+                "reason": c.get("reason"),
+                "message": c.get("message")
+            }
+            for c in (status.get("conditions") or [])
+        ],
+        "container_statuses": [
+            {
+                "name": cs.get("name"),
+                "ready": cs.get("ready"),
+                "restart_count": cs.get("restartCount"),
+                "state": {
+                    "running": _isoformat(((cs.get("state") or {}).get("running") or {}).get("startedAt")),
+                    "waiting": ((cs.get("state") or {}).get("waiting") or {}).get("reason"),
+                    "terminated": ((cs.get("state") or {}).get("terminated") or {}).get("reason")
+                }
+            }
+            for cs in (status.get("containerStatuses") or [])
+        ]
+    }
+
+class RegistrySync:
+    """Informer handler that mirrors VNC pod state into the registry"""
+
+    def __init__(self, registry: EnvironmentRegistry):
+        self.registry = registry
+
+    def __call__(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        user_id = ((pod.get("metadata") or {}).get("labels") or {}).get("user")
+        if not user_id:
+            return
+
+        if event_type == "DELETED":
+            # Hibernation deletes only the pod; keep the environment resumable
+            hibernated = self.registry.get_field(user_id, "hibernated_at")
+            self.registry.mark_pod_deleted(user_id, phase="Hibernated" if hibernated else "Deleted")
+            return
+
+        fields = project_pod_fields(pod)
+        # Skip the Redis round trip when nothing the registry stores changed
+        if old is not None and project_pod_fields(old) == fields:
+            return
+        self.registry.update(user_id, **fields)
+
+def status_from_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Build the pod status response from a registry record
+
+    Args:
+        record: Decoded registry record
+
+    Returns:
+        Status dict (same shape as K8sManager.get_pod_status) or None if no pod
+    """
+    if not record or not record.get("pod_name") or record.get("phase") in (None, "Deleted"):
+        return None
+    return {
+        "name": record["pod_name"],
+        "namespace": record.get("namespace"),
+        "phase": record.get("phase"),
+        "conditions": record.get("conditions", []),
+        "container_statuses": record.get("container_statuses", []),
+        "pod_ip": record.get("pod_ip"),
+        "host_ip": record.get("host_ip"),
+        "start_time": record.get("start_time")
+    }
@@ -0,0 +1,206 @@
+"""
+Structured lifecycle event pipeline
+
+Lifecycle steps (PVC/pod/service/ingress/SSH creation, deletion, restarts,
+Ready transitions observed by the informer) emit events into a bounded
+in-memory queue. A background thread flushes them in bulk to every
+configured sink - a Redis Stream (pipelined XADD) and, when the history
+store is enabled, PostgreSQL (one multi-row INSERT) - on size or time
+triggers. Emitting never blocks: when the queue is full the event is
+dropped and counted.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter
+
+from app.core.batch_writer import BatchWriter
+from app.core.k8s_projection import pod_ready_time
+
+logger = logging.getLogger(__name__)
+
+lifecycle_events_counter = Counter(
+    'vnc_lifecycle_events_total', 'Lifecycle events emitted', ['event_type']
+)
+lifecycle_events_dropped_counter = Counter(
+    'vnc_lifecycle_events_dropped_total', 'Lifecycle events dropped because the queue was full'
+)
+lifecycle_sink_failures_counter = Counter(
+    'vnc_lifecycle_event_sink_failures_total', 'Lifecycle events a sink failed to write', ['sink']
+)
+
+class RedisStreamSink:
+    """Append events to a capped Redis Stream with one pipelined round trip per batch"""
+
+    name = "redis_stream"
+
+    def __init__(self, redis_client, stream: str, maxlen: int):
+        self.redis = redis_client
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def write(self, events: List[Dict[str, Any]]):
+        pipe = self.redis.pipeline(transaction=False)
+        for event in events:
+            fields = {
+                "user_id": event["user_id"],
+                "event_type": event["event_type"],
+                "occurred_at": event["occurred_at"].isoformat()
+            }
+            if event.get("pod_uid"):
+                fields["pod_uid"] = event["pod_uid"]
+            if event.get("phase"):
+                fields["phase"] = event["phase"]
+            if event.get("details"):
+                fields["details"] = json.dumps(event["details"], separators=(",", ":"), default=str)
+            pipe.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+
+class PostgresSink:
+    """Insert events into the lifecycle_events table of the history store"""
+
+    name = "postgres"
+
+    def __init__(self, store):
+        self.store = store
+
+    def write(self, events: List[Dict[str, Any]]):
+        self.store.insert_events(events)
+
+class EventPipeline:
+    """Bounded, batched fan-out of lifecycle events to sinks"""
+
+    def __init__(self, sinks: List[Any], max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.5):
+        """
+        Initialize pipeline
+
+        Args:
+            sinks: Objects with a name attribute and write(events) method
+            max_queue: Maximum queued events before new ones are dropped
+            batch_size: Maximum events per flush
+            flush_interval: Maximum seconds an event waits before being flushed
+        """
+        self.sinks = sinks
+        self.sink_failures = {sink.name: 0 for sink in sinks}
+        self.writer = BatchWriter(
+            "events",
+            self._flush,
+            max_queue=max_queue,
+            batch_size=batch_size,
+            flush_interval=flush_interval
+        )
+
+    def start(self):
+        """Start the background flush thread"""
+        self.writer.start()
+
+    def stop(self):
+        """Flush queued events and stop"""
+        self.writer.stop()
+
+    def emit(self, user_id: str, event_type: str, pod_uid: Optional[str] = None,
+             phase: Optional[str] = None, occurred_at: Optional[datetime] = None,
+             **details) -> bool:
+        """
+        Queue a lifecycle event without blocking
+
+        Args:
+            user_id: User identifier
+            event_type: Event name (e.g. "pod_created", "ready", "deleted")
+            pod_uid: UID of the pod the event belongs to
+            phase: Pod phase at the time of the event
+            occurred_at: Event time (defaults to now)
+            **details: Extra JSON-serializable details
+
+        Returns:
+            False if the event was dropped under backpressure
+        """
+        event = {
+            "user_id": user_id,
+            "pod_uid": pod_uid,
+            "event_type": event_type,
+            "phase": phase,
+            "occurred_at": occurred_at or datetime.now(timezone.utc),
+            "details": details or None
+        }
+        if self.writer.submit(event):
+            lifecycle_events_counter.labels(event_type=event_type).inc()
+            return True
+        lifecycle_events_dropped_counter.inc()
+        return False
+
+    def _flush(self, events: List[Dict[str, Any]]):
+        # One sink failing must not prevent delivery to the others
+        for sink in self.sinks:
+            try:
+                sink.write(events)
+            except Exception as e:
+                self.sink_failures[sink.name] += len(events)
+                lifecycle_sink_failures_counter.labels(sink=sink.name).inc(len(events))
+                logger.error(f"Event sink {sink.name} failed to write {len(events)} events: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and delivery counters, including events dropped under backpressure"""
+        stats = self.writer.stats()
+        stats["sink_failures"] = dict(self.sink_failures)
+        return stats
+
+class PodEventSync:
+    """
+    Informer handler emitting lifecycle events for observed pod transitions
+
+    Every worker of every replica runs the pod informer, so only the leader
+    emits; otherwise each transition would be written once per worker.
+    """
+
+    def __init__(self, pipeline: EventPipeline, elector):
+        self.pipeline = pipeline
+        self.elector = elector
+
+    def __call__(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        if not self.elector.is_leader:
+            return
+        metadata = pod.get("metadata") or {}
+        user_id = (metadata.get("labels") or {}).get("user")
+        # old is None on the initial sync: those transitions predate this process
+        if not user_id or (old is None and event_type != "DELETED"):
+            return
+
+        pod_uid = metadata.get("uid")
+        phase = (pod.get("status") or {}).get("phase")
+
+        if event_type == "DELETED":
+            self.pipeline.emit(user_id, "pod_deleted", pod_uid=pod_uid, phase=phase)
+            return
+
+        old_phase = (old.get("status") or {}).get("phase")
+        if phase != old_phase:
+            self.pipeline.emit(user_id, "phase_changed", pod_uid=pod_uid, phase=phase, previous=old_phase)
+
+        ready_at = pod_ready_time(pod)
+        if ready_at and not pod_ready_time(old):
+            self.pipeline.emit(user_id, "pod_ready", pod_uid=pod_uid, phase=phase, occurred_at=ready_at)
+
+# Process-wide pipeline used by code without access to the app globals
+_pipeline: Optional[EventPipeline] = None
+
+def set_event_pipeline(pipeline: Optional[EventPipeline]):
+    """Install the process-wide pipeline (called from the app lifespan)"""
+    global _pipeline
+    _pipeline = pipeline
+
+def emit_event(user_id: str, event_type: str, **kwargs) -> bool:
+    """
+    Emit through the process-wide pipeline; a no-op before it is installed
+
+    Returns:
+        True if the event was queued
+    """
+    if _pipeline is None:
+        logger.debug(f"Event pipeline not configured, dropping {event_type} for user {user_id}")
+        return False
+    return _pipeline.emit(user_id, event_type, **kwargs)
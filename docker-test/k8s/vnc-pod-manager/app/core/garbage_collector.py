@@ -0,0 +1,299 @@
+"""
+Garbage collection of orphaned per-user resources
+
+Partial failures in create_pod and failed deletes leave Services,
+Ingresses, credentials Secrets, PVCs and tcp-services SSH mappings behind
+with no environment, pinning ports of the 400-port SSH range. Each pass
+lists every kind once by the managed-by=vnc-manager label (plus one read of
+the tcp-services ConfigMap and the Ingress Controller Service) and diffs the
+owners against live environments: a pod in the informer cache or a registry
+record that is not Deleted. Hibernated environments are live, so their
+Service, Ingress, Secret and SSH mapping survive. PVCs are only orphaned
+when the registry has no record at all (keep_data deletes keep theirs) and
+are only reclaimed when enabled.
+
+Objects younger than min_age and users holding a create lock are skipped,
+so in-flight creates are never collected. SSH mappings are removed with one
+ConfigMap patch and one Service patch per pass.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Set
+
+from kubernetes.client.rest import ApiException
+from prometheus_client import Counter
+
+from app.config import settings
+from app.core.events import emit_event
+from app.core.k8s_projection import iter_list_items, parse_time
+from app.core.leader_election import LeaderElector
+from app.utils.rate_limiter import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
+MANAGED_SELECTOR = "managed-by=vnc-manager"
+
+# Redis locks held for the whole of an in-flight create
+_CREATE_LOCKS = ("lock:create_pod_{}", "lock:create_env_{}")
+
+gc_reclaimed_counter = Counter(
+    'vnc_gc_reclaimed_total', 'Orphaned resources reclaimed by the garbage collector', ['kind']
+)
+
+class OrphanCollector:
+    """Find and remove per-user resources whose environment no longer exists"""
+
+    def __init__(self, k8s_manager, tcp_proxy, registry, pod_informer, elector: LeaderElector,
+                 interval: float = 1800, min_age_seconds: float = 600, reclaim_pvcs: bool = False,
+                 concurrency: int = 4, rate_per_second: float = 5.0):
+        """
+        Initialize collector
+
+        Args:
+            k8s_manager: K8sManager
+            tcp_proxy: K8sTCPProxyManager owning the tcp-services mappings
+            registry: EnvironmentRegistry
+            pod_informer: Informer over VNC pods (used once synced)
+            elector: Leader elector gating all deletions
+            interval: Seconds between passes
+            min_age_seconds: Objects younger than this are never collected
+            reclaim_pvcs: Also delete orphaned PVCs (user data)
+            concurrency: Maximum deletions in flight
+            rate_per_second: Maximum deletions started per second
+        """
+        self.k8s = k8s_manager
+        self.tcp_proxy = tcp_proxy
+        self.registry = registry
+        self.redis = registry.redis
+        self.pod_informer = pod_informer
+        self.elector = elector
+        self.interval = interval
+        self.min_age = timedelta(seconds=min_age_seconds)
+        self.reclaim_pvcs = reclaim_pvcs
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.namespace = settings.k8s_namespace_pods
+        self.last_result: Dict[str, Any] = {}
+
+    def _live_users(self) -> Dict[str, Set[str]]:
+        """Users with a pod or a registry record, split by what they may keep"""
+        if self.pod_informer.has_synced:
+            pods = self.pod_informer.list()
+        else:
+            pods = list(iter_list_items(
+                self.k8s.v1.list_namespaced_pod,
+                page_size=settings.k8s_list_page_size,
+                namespace=self.namespace,
+                label_selector=MANAGED_SELECTOR
+            ))
+        with_pod = {((p.get("metadata") or {}).get("labels") or {}).get("user") for p in pods}
+
+        live, known = set(with_pod), set(with_pod)
+        for record in self.registry.iter_records():
+            known.add(record["user_id"])
+            if record.get("phase") not in (None, "Deleted"):
+                live.add(record["user_id"])
+        live.discard(None)
+        known.discard(None)
+        return {"live": live, "known": known}
+
+    def _is_alive(self, user_id: str, keep_data: bool = False) -> bool:
+        """Re-check one user right before deleting (blocking)"""
+        if self.pod_informer.get(f"{self.namespace}/vnc-{user_id}"):
+            return True
+        if keep_data and self.redis.exists(self.registry.key(user_id)):
+            return True
+        if self.registry.get_field(user_id, "phase") not in (None, "Deleted"):
+            return True
+        return any(self.redis.exists(lock.format(user_id)) for lock in _CREATE_LOCKS)
+
+    def _orphaned_objects(self, list_fn: Callable, keep: Set[str], cutoff: datetime,
+                          skipped: Dict[str, int]) -> List[Dict[str, Any]]:
+        """One label-selected list of a kind, filtered down to orphans"""
+        orphans = []
+        for item in iter_list_items(
+            list_fn,
+            page_size=settings.k8s_list_page_size,
+            namespace=self.namespace,
+            label_selector=MANAGED_SELECTOR
+        ):
+            metadata = item.get("metadata") or {}
+            user_id = (metadata.get("labels") or {}).get("user")
+            if not user_id or user_id in keep:
+                continue
+            created = parse_time(metadata.get("creationTimestamp"))
+            if created and created > cutoff:
+                skipped["too_young"] += 1
+                continue
+            orphan = {"name": metadata["name"], "user_id": user_id}
+            node_ports = [p["nodePort"] for p in (item.get("spec") or {}).get("ports") or [] if p.get("nodePort")]
+            if node_ports:
+                orphan["node_ports"] = node_ports
+            orphans.append(orphan)
+        return orphans
+
+    def scan(self) -> Dict[str, Any]:
+        """
+        Diff managed resources against live environments without changing anything
+
+        Returns:
+            Dry-run report: orphans per kind and objects skipped
+        """
+        users = self._live_users()
+        cutoff = datetime.now(timezone.utc) - self.min_age
+        skipped = {"too_young": 0}
+
+        orphans = {
+            "service": self._orphaned_objects(self.k8s.v1.list_namespaced_service, users["live"], cutoff, skipped),
+            "ingress": self._orphaned_objects(
+                self.k8s.networking_v1.list_namespaced_ingress, users["live"], cutoff, skipped
+            ),
+            "secret": self._orphaned_objects(self.k8s.v1.list_namespaced_secret, users["live"], cutoff, skipped),
+            "pvc": self._orphaned_objects(
+                self.k8s.v1.list_namespaced_persistent_volume_claim, users["known"], cutoff, skipped
+            )
+        }
+
+        prefix, suffix = f"{self.namespace}/vnc-service-", ":22"
+        mappings = self.tcp_proxy.get_all_ssh_proxies()
+        orphans["tcp_mapping"] = []
+        for port, target in sorted(mappings.items()):
+            if not (target.startswith(prefix) and target.endswith(suffix)):
+                continue  # not ours
+            user_id = target[len(prefix):-len(suffix)]
+            if user_id not in users["live"]:
+                orphans["tcp_mapping"].append({"port": port, "user_id": user_id})
+
+        # Controller ports left behind after their mapping was removed
+        orphans["controller_port"] = [
+            {"port": port, "node_port": node_port}
+            for port, node_port in sorted(self.tcp_proxy.get_exposed_ssh_ports().items())
+            if port not in mappings
+        ]
+
+        return {
+            "scanned_at": datetime.now(timezone.utc).isoformat(),
+            "live_environments": len(users["live"]),
+            "pvc_reclaim_enabled": self.reclaim_pvcs,
+            "orphans": orphans,
+            "counts": {kind: len(items) for kind, items in orphans.items()},
+            "skipped": skipped
+        }
+
+    def _delete_object(self, kind: str, orphan: Dict[str, Any]) -> str:
+        """Re-check and delete one orphaned object (blocking); returns the outcome"""
+        if not self.elector.ensure_leader():
+            return "not_leader"
+        if self._is_alive(orphan["user_id"], keep_data=(kind == "pvc")):
+            return "skipped"
+
+        delete_fn = {
+            "service": self.k8s.v1.delete_namespaced_service,
+            "ingress": self.k8s.networking_v1.delete_namespaced_ingress,
+            "secret": self.k8s.v1.delete_namespaced_secret,
+            "pvc": self.k8s.v1.delete_namespaced_persistent_volume_claim
+        }[kind]
+        try:
+            delete_fn(name=orphan["name"], namespace=self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        if orphan.get("node_ports"):
+            self.k8s.release_node_ports(orphan["node_ports"])
+
+        gc_reclaimed_counter.labels(kind=kind).inc()
+        emit_event(orphan["user_id"], "orphan_reclaimed", kind=kind, name=orphan["name"])
+        return "deleted"
+
+    def _remove_ssh_mappings(self, report: Dict[str, Any]) -> Dict[str, int]:
+        """Drop orphaned tcp-services keys and controller ports in one patch each (blocking)"""
+        if not self.elector.ensure_leader():
+            return {"not_leader": 1}
+
+        mappings = [m for m in report["orphans"]["tcp_mapping"] if not self._is_alive(m["user_id"])]
+        mapping_ports = {m["port"] for m in mappings}
+        # Re-read both objects: a create may have mapped and exposed a port since the scan
+        still_mapped = set(self.tcp_proxy.get_all_ssh_proxies()) - mapping_ports
+        controller_ports = [
+            {"port": port, "node_port": node_port}
+            for port, node_port in sorted(self.tcp_proxy.get_exposed_ssh_ports().items())
+            if port not in still_mapped
+        ]
+
+        self.tcp_proxy.remove_port_mappings(sorted(mapping_ports), [p["port"] for p in controller_ports])
+        self.k8s.release_node_ports([p["node_port"] for p in controller_ports if p["node_port"]])
+
+        gc_reclaimed_counter.labels(kind="tcp_mapping").inc(len(mappings))
+        gc_reclaimed_counter.labels(kind="controller_port").inc(len(controller_ports))
+        for mapping in mappings:
+            emit_event(mapping["user_id"], "orphan_reclaimed", kind="tcp_mapping", port=mapping["port"])
+        return {"tcp_mapping": len(mappings), "controller_port": len(controller_ports)}
+
+    async def collect_once(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Run one pass if this worker is the leader (or report only)
+
+        Args:
+            dry_run: Only scan and return the report; nothing is deleted
+
+        Returns:
+            Report, with per-kind outcomes unless dry_run
+        """
+        if not dry_run and not self.elector.is_leader:
+            return {}
+        report = await asyncio.to_thread(self.scan)
+        if dry_run:
+            return report
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AsyncRateLimiter(self.rate_per_second, burst=self.concurrency)
+        outcomes: Dict[str, Dict[str, int]] = {}
+
+        async def handle(kind: str, orphan: Dict[str, Any]):
+            async with semaphore:
+                await limiter.acquire()
+                try:
+                    outcome = await asyncio.to_thread(self._delete_object, kind, orphan)
+                except Exception as e:
+                    logger.warning(f"Failed to reclaim {kind} {orphan['name']}: {e}")
+                    outcome = "failed"
+                counts = outcomes.setdefault(kind, {})
+                counts[outcome] = counts.get(outcome, 0) + 1
+
+        kinds = ["service", "ingress", "secret"] + (["pvc"] if self.reclaim_pvcs else [])
+        await asyncio.gather(*(handle(kind, o) for kind in kinds for o in report["orphans"][kind]))
+
+        if report["orphans"]["tcp_mapping"] or report["orphans"]["controller_port"]:
+            try:
+                outcomes["ssh"] = await asyncio.to_thread(self._remove_ssh_mappings, report)
+            except Exception as e:
+                logger.warning(f"Failed to remove orphaned SSH mappings: {e}")
+                outcomes["ssh"] = {"failed": 1}
+
+        report["outcomes"] = outcomes
+        if any(report["counts"].values()):
+            logger.info(f"Garbage collection pass: found {report['counts']}, outcomes {outcomes}")
+        self.last_result = {k: report[k] for k in ("scanned_at", "counts", "skipped", "outcomes")}
+        return report
+
+    async def run(self):
+        """Collect on schedule until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.collect_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Garbage collection pass failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Configuration and last pass for monitoring"""
+        return {
+            "interval_seconds": self.interval,
+            "min_age_seconds": self.min_age.total_seconds(),
+            "pvc_reclaim_enabled": self.reclaim_pvcs,
+            "last_result": self.last_result
+        }
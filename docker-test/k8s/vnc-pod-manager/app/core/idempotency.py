@@ -0,0 +1,224 @@
+"""
+Idempotency keys and single-flight coalescing for lifecycle mutations
+
+Identical mutations (same operation and user, plus the Idempotency-Key
+header when one is sent, otherwise the same request body) are executed
+once:
+
+- In the same worker, duplicates await the future of the running call.
+- Across workers and replicas, the executing request holds the Redis key
+  idem:{user}:{operation}:{key or body hash}:inflight while it runs.
+  Duplicates do not take the per-user RedisLock or call the apiserver;
+  they poll for the stored result and return it.
+
+With an Idempotency-Key the response is kept for key_ttl and replayed for
+every retry carrying the same key; reusing a key with a different request
+body is rejected. Without one, the result is only kept for coalesce_ttl
+seconds, long enough for duplicates that were waiting on it, and a
+waiting duplicate only accepts the result of the execution it waited for
+(the owner recorded in the in-flight marker), so a create after a delete
+is never answered with an earlier create's result. 5xx results are never kept beyond
+coalesce_ttl, so retries after a server error run again (and resume the
+provisioning saga).
+
+Credentials (SECRET_FIELDS) are removed from a result before it is written
+to Redis; a result shared through Redis lists them in redacted, and the
+caller fills them in again from their source of truth.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "idem:"
+
+# Top-level body fields never written to Redis
+SECRET_FIELDS = ("vnc_password",)
+
+# Delete the in-flight marker only if this request still owns it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+idempotency_counter = Counter(
+    'vnc_idempotent_requests_total', 'Lifecycle mutations by coalescing outcome', ['operation', 'outcome']
+)
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key was already used for a different request"""
+
+class IdempotentResult(NamedTuple):
+    status: int
+    body: Any
+    replayed: bool
+    redacted: Tuple[str, ...] = ()  # SECRET_FIELDS removed from body before it was stored
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request body, stored with the result of an Idempotency-Key"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+class IdempotencyCoalescer:
+    """Execute each distinct lifecycle mutation once and share its result"""
+
+    def __init__(self, redis_client, key_ttl: int = 86400, coalesce_ttl: int = 5,
+                 inflight_ttl: int = 180, poll_interval: float = 0.05, max_poll_interval: float = 0.5):
+        """
+        Initialize coalescer
+
+        Args:
+            redis_client: Redis client holding in-flight markers and results
+            key_ttl: Seconds a result is replayed for its Idempotency-Key
+            coalesce_ttl: Seconds a result without a key is kept for waiting duplicates
+            inflight_ttl: Upper bound on an operation; a crashed owner's marker expires after this
+            poll_interval: First delay between result polls of a waiting duplicate
+            max_poll_interval: Poll delay cap (delays double up to it)
+        """
+        self.redis = redis_client
+        self.key_ttl = key_ttl
+        self.coalesce_ttl = coalesce_ttl
+        self.inflight_ttl = inflight_ttl
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._local: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _keys(operation: str, user_id: str, idempotency_key: Optional[str],
+              fingerprint: Optional[str]) -> Tuple[str, str]:
+        """In-flight marker and result key"""
+        if idempotency_key:
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]
+            base = f"{KEY_PREFIX}{user_id}:{operation}:{digest}"
+        else:
+            base = f"{KEY_PREFIX}{user_id}:{operation}:body:{(fingerprint or '')[:32]}"
+        return f"{base}:inflight", f"{base}:result"
+
+    def _load(self, result_key: str, operation: str, fingerprint: Optional[str],
+              owner: Optional[str] = None) -> Optional[IdempotentResult]:
+        raw = self.redis.get(result_key)
+        if not raw:
+            return None
+        record = json.loads(raw)
+        if record["operation"] != operation:
+            return None
+        if owner is not None and record.get("owner") != owner:
+            return None  # an earlier execution's result, not the one being waited for
+        if fingerprint and record.get("fingerprint") and record["fingerprint"] != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+        return IdempotentResult(record["status"], record["body"], True, tuple(record.get("redacted") or ()))
+
+    def _store(self, result_key: str, operation: str, fingerprint: Optional[str], owner: str,
+               status: int, body: Any, keyed: bool):
+        ttl = self.key_ttl if keyed and status < 500 else self.coalesce_ttl
+        redacted = [field for field in SECRET_FIELDS if isinstance(body, dict) and field in body]
+        if redacted:
+            body = {key: value for key, value in body.items() if key not in redacted}
+        record = {"operation": operation, "fingerprint": fingerprint, "owner": owner, "status": status,
+                  "body": body, "redacted": redacted}
+        self.redis.set(result_key, json.dumps(record, default=str), ex=ttl)
+
+    async def _wait(self, inflight_key: str, result_key: str, operation: str,
+                    fingerprint: Optional[str], keyed: bool) -> Optional[IdempotentResult]:
+        """Poll until the owner stores its result; None if its marker vanished without one"""
+        # Without a key only the running execution's result answers this request
+        owner = None if keyed else self.redis.get(inflight_key)
+        if not keyed and owner is None:
+            return None  # finished before it could be identified; try to execute again
+        delay = self.poll_interval
+        while True:
+            await asyncio.sleep(delay)
+            result = self._load(result_key, operation, fingerprint, owner)
+            if result:
+                return result
+            current = self.redis.get(inflight_key)
+            if current is None or (owner is not None and current != owner):
+                # Owner finished between the two reads, or crashed
+                return self._load(result_key, operation, fingerprint, owner)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def _execute(self, operation: str, user_id: str, run: Callable[[], Awaitable[Tuple[int, Any]]],
+                       idempotency_key: Optional[str], fingerprint: Optional[str]) -> IdempotentResult:
+        inflight_key, result_key = self._keys(operation, user_id, idempotency_key, fingerprint)
+        if idempotency_key:
+            replay = self._load(result_key, operation, fingerprint)
+            if replay:
+                idempotency_counter.labels(operation=operation, outcome="replayed").inc()
+                return replay
+
+        owner = uuid.uuid4().hex
+        while not self.redis.set(inflight_key, owner, nx=True, ex=self.inflight_ttl):
+            result = await self._wait(inflight_key, result_key, operation, fingerprint, keyed=bool(idempotency_key))
+            if result:
+                idempotency_counter.labels(operation=operation, outcome="coalesced_remote").inc()
+                return result
+
+        try:
+            status, body = await run()
+            try:
+                self._store(result_key, operation, fingerprint, owner, status, body, keyed=bool(idempotency_key))
+            except Exception as e:
+                # The mutation itself succeeded; only sharing its result failed
+                logger.warning(f"Failed to store result of {operation} for user {user_id}: {e}")
+        finally:
+            self._release(keys=[inflight_key], args=[owner])
+        idempotency_counter.labels(operation=operation, outcome="executed").inc()
+        return IdempotentResult(status, body, False)
+
+    async def execute(self, operation: str, user_id: str, run: Callable[[], Awaitable[Tuple[int, Any]]],
+                      idempotency_key: Optional[str] = None,
+                      fingerprint: Optional[str] = None) -> IdempotentResult:
+        """
+        Run a mutation once per (operation, user, Idempotency-Key or request body)
+
+        Args:
+            operation: Operation name (e.g. "create")
+            user_id: User identifier
+            run: Coroutine factory returning (status code, JSON body)
+            idempotency_key: Client-supplied Idempotency-Key header
+            fingerprint: request_fingerprint() of the request body; scopes requests without a key
+
+        Returns:
+            Result of this or the coalesced execution; replayed is True for shared results
+
+        Raises:
+            IdempotencyConflict: The key was used with a different request body
+        """
+        scope = f"{operation}:{user_id}:{idempotency_key or ''}:{fingerprint or ''}"
+        while scope in self._local:
+            future = self._local[scope]
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue  # the executing request was cancelled; try again ourselves
+                raise
+            idempotency_counter.labels(operation=operation, outcome="coalesced_local").inc()
+            return result._replace(replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._local[scope] = future
+        try:
+            result = await self._execute(operation, user_id, run, idempotency_key, fingerprint)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve it here so a future without waiters does not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._local.pop(scope, None)
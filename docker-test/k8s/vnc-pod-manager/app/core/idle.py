@@ -0,0 +1,248 @@
+"""
+Activity-based idle detection and hibernation
+
+An environment is active while it has established VNC/websocket/SSH
+connections or uses CPU above a threshold. Each pass the leader records
+last_active_at in the registry for active environments and hibernates
+those idle for longer than the timeout: the pod is deleted while the PVC,
+Service, Ingress and SSH port mapping are kept, so the next create request
+only has to start a new pod (PodManager.resume_environment).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from kubernetes import client
+from kubernetes.stream import stream
+from prometheus_client import Counter
+
+from app.config import settings
+from app.core.events import emit_event
+from app.core.leader_election import LeaderElector
+from app.core.pod_manager import PodManager
+from app.utils.rate_limiter import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Local ports of the services inside the VNC container
+ACTIVITY_PORTS = {6080: "websocket", 5901: "vnc", 22: "ssh"}
+
+# TCP state ESTABLISHED in /proc/net/tcp
+_TCP_ESTABLISHED = "01"
+
+hibernated_counter = Counter('vnc_environments_hibernated_total', 'Environments hibernated after being idle')
+
+def _cpu_millicores(quantity: str) -> float:
+    """Convert a metrics-server CPU quantity (n/u/m suffix or cores) to millicores"""
+    if quantity.endswith("n"):
+        return float(quantity[:-1]) / 1_000_000
+    if quantity.endswith("u"):
+        return float(quantity[:-1]) / 1_000
+    if quantity.endswith("m"):
+        return float(quantity[:-1])
+    return float(quantity) * 1000
+
+def _is_loopback(hex_address: str) -> bool:
+    """Loopback check for an address as printed in /proc/net/tcp[6]"""
+    if len(hex_address) == 8:
+        # IPv4, little-endian: 127.x.x.x ends in 7F
+        return hex_address.endswith("7F")
+    if hex_address == "00000000000000000000000001000000":
+        return True  # ::1
+    # IPv4-mapped ::ffff:127.x.x.x
+    return hex_address.startswith("0000000000000000FFFF0000") and hex_address.endswith("7F")
+
+def parse_established_connections(proc_net_tcp: str) -> Dict[str, int]:
+    """
+    Count established inbound connections per service from /proc/net/tcp[6]
+
+    Loopback peers are ignored, which excludes websockify's own
+    connection to the VNC server.
+
+    Args:
+        proc_net_tcp: Concatenated contents of /proc/net/tcp and /proc/net/tcp6
+
+    Returns:
+        Mapping of service name (websocket/vnc/ssh) -> connection count
+    """
+    counts = {name: 0 for name in ACTIVITY_PORTS.values()}
+    for line in proc_net_tcp.splitlines():
+        parts = line.split()
+        if len(parts) < 4 or parts[3] != _TCP_ESTABLISHED or ":" not in parts[1]:
+            continue
+        local_port = int(parts[1].rsplit(":", 1)[1], 16)
+        service = ACTIVITY_PORTS.get(local_port)
+        if service and not _is_loopback(parts[2].rsplit(":", 1)[0]):
+            counts[service] += 1
+    return counts
+
+class ActivityProbe:
+    """Collect activity signals from metrics-server and inside the pods"""
+
+    def __init__(self, k8s_manager):
+        self.k8s = k8s_manager
+        self.custom = client.CustomObjectsApi(k8s_manager.v1.api_client)
+
+    def cpu_usage(self, namespace: Optional[str] = None) -> Dict[str, float]:
+        """
+        CPU usage of all VNC pods from metrics-server in one list call
+
+        Returns:
+            Mapping of pod name -> millicores
+        """
+        metrics = self.custom.list_namespaced_custom_object(
+            "metrics.k8s.io", "v1beta1", namespace or settings.k8s_namespace_pods, "pods",
+            label_selector="managed-by=vnc-manager"
+        )
+        usage = {}
+        for item in metrics.get("items", []):
+            usage[item["metadata"]["name"]] = sum(
+                _cpu_millicores(c.get("usage", {}).get("cpu", "0")) for c in item.get("containers", [])
+            )
+        return usage
+
+    def connection_counts(self, pod_name: str, namespace: Optional[str] = None) -> Dict[str, int]:
+        """
+        Established VNC/websocket/SSH connections inside a pod
+
+        Reads /proc/net/tcp through the exec API, which works without
+        ss/netstat in the image.
+
+        Returns:
+            Mapping of service name -> connection count
+        """
+        output = stream(
+            self.k8s.v1.connect_get_namespaced_pod_exec,
+            pod_name,
+            namespace or settings.k8s_namespace_pods,
+            command=["cat", "/proc/net/tcp", "/proc/net/tcp6"],
+            stderr=False, stdin=False, stdout=True, tty=False,
+            _request_timeout=10
+        )
+        return parse_established_connections(output)
+
+class IdleHibernator:
+    """Leader-only controller hibernating environments without activity"""
+
+    def __init__(self, pod_manager: PodManager, elector: LeaderElector, probe: ActivityProbe,
+                 idle_timeout: float = 7200, cpu_threshold_millicores: float = 50,
+                 interval: float = 300, concurrency: int = 4, rate_per_second: float = 5.0):
+        """
+        Initialize hibernator
+
+        Args:
+            pod_manager: PodManager used to hibernate environments
+            elector: Leader elector gating all work
+            probe: Activity signal source
+            idle_timeout: Seconds without activity before hibernating
+            cpu_threshold_millicores: CPU usage at or above this counts as activity
+            interval: Seconds between passes
+            concurrency: Maximum exec probes / hibernations in flight
+            rate_per_second: Maximum exec probes / hibernations started per second
+        """
+        self.pod_manager = pod_manager
+        self.registry = pod_manager.registry
+        self.elector = elector
+        self.probe = probe
+        self.idle_timeout = idle_timeout
+        self.cpu_threshold = cpu_threshold_millicores
+        self.interval = interval
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.last_result: Dict[str, Any] = {}
+
+    def _is_active(self, record: Dict[str, Any], cpu: Dict[str, float]) -> bool:
+        """Cheap signal first: CPU from the shared metrics list, exec only when CPU is low"""
+        pod_name = record["pod_name"]
+        if cpu.get(pod_name, 0.0) >= self.cpu_threshold:
+            return True
+        try:
+            return sum(self.probe.connection_counts(pod_name, record.get("namespace")).values()) > 0
+        except Exception as e:
+            # Unknown counts as active; never hibernate on a failed probe
+            logger.warning(f"Connection probe failed for {pod_name}: {e}")
+            return True
+
+    def _idle_since(self, record: Dict[str, Any]) -> Optional[datetime]:
+        timestamp = record.get("last_active_at") or record.get("start_time") or record.get("created_at")
+        return datetime.fromisoformat(timestamp) if timestamp else None
+
+    def _check(self, record: Dict[str, Any], cpu: Dict[str, float]) -> str:
+        """Probe one environment and hibernate it if idle for too long (blocking)"""
+        user_id = record["user_id"]
+        now = datetime.now(timezone.utc)
+        if self._is_active(record, cpu):
+            self.registry.update(user_id, last_active_at=now.isoformat())
+            return "active"
+
+        idle_since = self._idle_since(record)
+        if idle_since is None or (now - idle_since).total_seconds() < self.idle_timeout:
+            return "idle"
+        if not self.elector.ensure_leader():
+            return "not_leader"
+
+        idle_seconds = int((now - idle_since).total_seconds())
+        self.pod_manager.hibernate_environment(user_id)
+        hibernated_counter.inc()
+        emit_event(user_id, "hibernated", idle_seconds=idle_seconds)
+        return "hibernated"
+
+    async def check_once(self) -> Dict[str, int]:
+        """
+        Run one idle-detection pass if this worker is the leader
+
+        Returns:
+            Count of outcomes (active, idle, hibernated, ...)
+        """
+        if not self.elector.is_leader:
+            return {}
+
+        try:
+            cpu = await asyncio.to_thread(self.probe.cpu_usage)
+        except Exception as e:
+            logger.warning(f"metrics-server unavailable, using connections only: {e}")
+            cpu = {}
+
+        records = await asyncio.to_thread(lambda: list(self.registry.iter_records(phase="Running")))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AsyncRateLimiter(self.rate_per_second, burst=self.concurrency)
+        outcomes: Dict[str, int] = {}
+
+        async def handle(record: Dict[str, Any]):
+            async with semaphore:
+                if cpu.get(record["pod_name"], 0.0) < self.cpu_threshold:
+                    await limiter.acquire()
+                try:
+                    outcome = await asyncio.to_thread(self._check, record, cpu)
+                except Exception as e:
+                    logger.warning(f"Idle check failed for {record['user_id']}: {e}")
+                    outcome = "failed"
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        await asyncio.gather(*(handle(r) for r in records if r.get("pod_name")))
+        if outcomes.get("hibernated"):
+            logger.info(f"Idle detection pass: {outcomes}")
+        self.last_result = {"finished_at": datetime.now(timezone.utc).isoformat(), "outcomes": outcomes}
+        return outcomes
+
+    async def run(self):
+        """Check on schedule until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Idle detection pass failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Configuration and last pass for monitoring"""
+        return {
+            "idle_timeout_seconds": self.idle_timeout,
+            "cpu_threshold_millicores": self.cpu_threshold,
+            "interval_seconds": self.interval,
+            "last_result": self.last_result
+        }
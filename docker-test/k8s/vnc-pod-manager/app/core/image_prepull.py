@@ -0,0 +1,355 @@
+"""
+VNC image pre-pull and digest pinning
+
+The first VNC pod on a node, and the first pod after every push of the
+tag, used to pay a multi-GB image pull inside the user's create request.
+The leader keeps a DaemonSet (vnc-image-prepull) that runs the VNC image
+by digest on every node, which makes each kubelet pull and keep it:
+
+- Each pass resolves the configured tag to a digest with a manifest HEAD
+  against the registry. A new digest rolls the DaemonSet to it.
+- A node whose pre-pull pod for a digest is Ready gets the label
+  vnc-manager/image-{digest[:32]}=true.
+- The newest digest cached on at least pin_fraction of the nodes becomes
+  the pinned digest. New VNC pods use image@pinned with a required node
+  affinity on its label, so they only land on nodes that already have it.
+  Until a new push is cached widely enough, pods keep using the previous
+  digest.
+
+The state, including per-node pull status, is stored in Redis so every
+worker can place pods and serve /monitor/images.
+"""
+
+import asyncio
+import json
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from kubernetes.client.rest import ApiException
+from prometheus_client import Gauge
+
+from app.config import settings
+from app.core.k8s_projection import iter_list_items
+from app.core.leader_election import LeaderElector
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "image:prepull"
+DAEMONSET_NAME = "vnc-image-prepull"
+NODE_LABEL_PREFIX = "vnc-manager/image-"
+DIGEST_ANNOTATION = "vnc-manager/image-digest"
+
+# Manifest lists / indexes first, so the digest is valid on every architecture
+_MANIFEST_ACCEPT = ", ".join((
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json"
+))
+
+image_cached_nodes_gauge = Gauge(
+    'vnc_image_cached_nodes', 'Nodes with the VNC image cached, by digest role', ['digest'],
+    multiprocess_mode='livemostrecent'
+)
+
+def split_image(image: str) -> Tuple[str, str]:
+    """
+    Split a repository reference into repository and tag or digest
+
+    Args:
+        image: e.g. "vnc/void-desktop:latest" or "vnc/void-desktop@sha256:..."
+
+    Returns:
+        (repository, tag or digest); the tag defaults to latest
+    """
+    if "@" in image:
+        repository, digest = image.split("@", 1)
+        return repository, digest
+    name, _, tag = image.rpartition(":")
+    if not name or "/" in tag:
+        return image, "latest"
+    return name, tag
+
+def digest_label(digest: str) -> str:
+    """Node label key marking a digest as cached (label names are limited to 63 characters)"""
+    return f"{NODE_LABEL_PREFIX}{digest.split(':', 1)[-1][:32]}"
+
+class RegistryClient:
+    """Docker Registry HTTP API v2 client, limited to resolving tags to digests"""
+
+    def __init__(self, registry: str, scheme: str = "http", username: Optional[str] = None,
+                 password: Optional[str] = None, timeout: float = 10.0):
+        """
+        Initialize registry client
+
+        Args:
+            registry: Registry host[:port]
+            scheme: http or https
+            username: Optional basic auth user
+            password: Optional basic auth password
+            timeout: Request timeout in seconds
+        """
+        self.base_url = f"{scheme}://{registry}"
+        self.auth = (username, password) if username else None
+        self.timeout = timeout
+
+    def resolve_digest(self, repository: str, reference: str) -> str:
+        """
+        Digest a tag currently points to, without downloading the manifest (blocking)
+
+        Raises:
+            httpx.HTTPError: Registry unreachable or the tag does not exist
+            ValueError: The registry did not return Docker-Content-Digest
+        """
+        response = httpx.head(
+            f"{self.base_url}/v2/{repository}/manifests/{reference}",
+            headers={"Accept": _MANIFEST_ACCEPT},
+            auth=self.auth,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        digest = response.headers.get("Docker-Content-Digest")
+        if not digest:
+            raise ValueError(f"Registry returned no digest for {repository}:{reference}")
+        return digest
+
+class ImagePrepuller:
+    """Leader-only controller caching the VNC image on every node and pinning its digest"""
+
+    def __init__(self, k8s_manager, redis_client, elector: LeaderElector, registry_client: RegistryClient,
+                 registry: str, image: str, interval: float = 300, max_unavailable: str = "25%",
+                 pin_fraction: float = 0.5):
+        """
+        Initialize pre-puller
+
+        Args:
+            k8s_manager: K8sManager
+            redis_client: Redis client holding the shared state
+            elector: Leader elector gating all changes
+            registry_client: Client used to resolve the tag
+            registry: Registry host[:port] the pods pull from
+            image: Repository and tag, e.g. vnc/void-desktop:latest
+            interval: Seconds between passes
+            max_unavailable: DaemonSet rolling update budget (parallel pulls when a digest changes)
+            pin_fraction: Share of nodes that must have a digest before new pods use it
+        """
+        self.k8s = k8s_manager
+        self.redis = redis_client
+        self.elector = elector
+        self.registry_client = registry_client
+        self.registry = registry
+        self.repository, self.reference = split_image(image)
+        self.interval = interval
+        self.max_unavailable = max_unavailable
+        self.pin_fraction = pin_fraction
+        self.namespace = settings.k8s_namespace_pods
+
+    def image_ref(self, digest: str) -> str:
+        return f"{self.registry}/{self.repository}@{digest}"
+
+    def _daemonset(self, digest: str) -> Dict[str, Any]:
+        # Not managed-by=vnc-manager: that label selects user environments (informer, GC, metrics)
+        labels = {"app": DAEMONSET_NAME}
+        return {
+            "apiVersion": "apps/v1",
+            "kind": "DaemonSet",
+            "metadata": {
+                "name": DAEMONSET_NAME,
+                "namespace": self.namespace,
+                "labels": {**labels, "app.kubernetes.io/managed-by": "vnc-manager"}
+            },
+            "spec": {
+                "selector": {"matchLabels": {"app": DAEMONSET_NAME}},
+                "updateStrategy": {
+                    "type": "RollingUpdate",
+                    "rollingUpdate": {"maxUnavailable": self.max_unavailable}
+                },
+                "template": {
+                    "metadata": {"labels": labels, "annotations": {DIGEST_ANNOTATION: digest}},
+                    "spec": {
+                        "containers": [{
+                            "name": "prepull",
+                            "image": self.image_ref(digest),
+                            "imagePullPolicy": "IfNotPresent",
+                            # Keeps the image in use so the kubelet's image GC never evicts it
+                            "command": ["sleep", "infinity"],
+                            "resources": {
+                                "requests": {"cpu": "1m", "memory": "8Mi"},
+                                "limits": {"cpu": "10m", "memory": "32Mi"}
+                            }
+                        }],
+                        "terminationGracePeriodSeconds": 1
+                    }
+                }
+            }
+        }
+
+    def _apply_daemonset(self, digest: str):
+        """Create the DaemonSet or roll it to digest (blocking)"""
+        body = self._daemonset(digest)
+        try:
+            current = self.k8s.apps_v1.read_namespaced_daemon_set(DAEMONSET_NAME, self.namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            self.k8s.apps_v1.create_namespaced_daemon_set(self.namespace, body)
+            logger.info(f"Created image pre-pull DaemonSet for {self.image_ref(digest)}")
+            return
+        annotations = current.spec.template.metadata.annotations or {}
+        if annotations.get(DIGEST_ANNOTATION) != digest:
+            self.k8s.apps_v1.patch_namespaced_daemon_set(DAEMONSET_NAME, self.namespace, body)
+            logger.info(f"Rolling image pre-pull DaemonSet to {self.image_ref(digest)}")
+
+    def _node_status(self) -> Dict[str, Dict[str, Any]]:
+        """Pull status of every pre-pull pod, keyed by node (blocking)"""
+        nodes = {}
+        for pod in iter_list_items(
+            self.k8s.v1.list_namespaced_pod,
+            page_size=settings.k8s_list_page_size,
+            namespace=self.namespace,
+            label_selector=f"app={DAEMONSET_NAME}"
+        ):
+            node = (pod.get("spec") or {}).get("nodeName")
+            if not node:
+                continue
+            status = pod.get("status") or {}
+            container = next(iter(status.get("containerStatuses") or []), {})
+            waiting = (container.get("state") or {}).get("waiting") or {}
+            nodes[node] = {
+                "digest": ((pod.get("metadata") or {}).get("annotations") or {}).get(DIGEST_ANNOTATION),
+                "phase": status.get("phase"),
+                "cached": bool(container.get("ready")),
+                "reason": waiting.get("reason"),
+                "message": waiting.get("message")
+            }
+        return nodes
+
+    def _label_nodes(self, node_status: Dict[str, Dict[str, Any]], keep: List[str]) -> Optional[Dict[str, int]]:
+        """
+        Label nodes whose pre-pull pod is Ready and drop labels of digests no longer used (blocking)
+
+        Returns:
+            Mapping of digest -> nodes labeled as having it cached, or None if leadership was lost
+        """
+        keep_labels = {digest_label(d): d for d in keep if d}
+        cached = {d: 0 for d in keep_labels.values()}
+        for node in iter_list_items(self.k8s.v1.list_node, page_size=settings.k8s_list_page_size):
+            name = node["metadata"]["name"]
+            labels = node["metadata"].get("labels") or {}
+            patch = {key: None for key in labels if key.startswith(NODE_LABEL_PREFIX) and key not in keep_labels}
+            status = node_status.get(name)
+            if status and status["cached"] and status["digest"] in cached:
+                label = digest_label(status["digest"])
+                if labels.get(label) != "true":
+                    patch[label] = "true"
+            if patch:
+                if not self.elector.ensure_leader():
+                    return None
+                self.k8s.v1.patch_node(name, {"metadata": {"labels": patch}})
+            effective = {**labels, **patch}
+            for label, digest in keep_labels.items():
+                if effective.get(label) == "true":
+                    cached[digest] += 1
+        return cached
+
+    def _state(self) -> Dict[str, Any]:
+        raw = self.redis.hgetall(STATE_KEY)
+        if raw.get("nodes"):
+            raw["nodes"] = json.loads(raw["nodes"])
+        return raw
+
+    def sync_once(self) -> Dict[str, Any]:
+        """
+        Resolve the tag, roll the DaemonSet, label nodes and advance the pinned digest (blocking)
+
+        Returns:
+            Stored state
+        """
+        if not self.elector.ensure_leader():
+            return {}
+        state = self._state()
+        digest = state.get("digest")
+        try:
+            digest = self.registry_client.resolve_digest(self.repository, self.reference)
+        except Exception as e:
+            # Keep pre-pulling the last known digest while the registry is unreachable
+            logger.warning(f"Failed to resolve {self.repository}:{self.reference}: {e}")
+        if not digest:
+            return state
+
+        if not self.elector.ensure_leader():
+            return state
+        self._apply_daemonset(digest)
+
+        node_status = self._node_status()
+        pinned = state.get("pinned")
+        cached = self._label_nodes(node_status, [digest, pinned])
+        if cached is None:
+            return state
+        target = max(1, math.ceil(len(node_status) * self.pin_fraction))
+        if digest != pinned and cached.get(digest, 0) >= target:
+            logger.info(f"Pinning VNC image to {digest} (cached on {cached[digest]} nodes)")
+            pinned = digest
+
+        image_cached_nodes_gauge.labels(digest="latest").set(cached.get(digest, 0))
+        image_cached_nodes_gauge.labels(digest="pinned").set(cached.get(pinned, 0) if pinned else 0)
+        state = {
+            "digest": digest,
+            "pinned": pinned or "",
+            "synced_at": datetime.now(timezone.utc).isoformat(),
+            "nodes": json.dumps(node_status)
+        }
+        self.redis.hset(STATE_KEY, mapping=state)
+        return self._state()
+
+    def placement(self) -> Optional[Dict[str, Any]]:
+        """
+        Image and node affinity for a new VNC pod (blocking)
+
+        Returns:
+            {"image", "affinity"} for the pinned digest, or None before any digest is cached
+        """
+        pinned = self.redis.hget(STATE_KEY, "pinned")
+        if not pinned:
+            return None
+        return {
+            "image": self.image_ref(pinned),
+            "affinity": {
+                "nodeAffinity": {
+                    "requiredDuringSchedulingIgnoredDuringExecution": {
+                        "nodeSelectorTerms": [{
+                            "matchExpressions": [{"key": digest_label(pinned), "operator": "In", "values": ["true"]}]
+                        }]
+                    }
+                }
+            }
+        }
+
+    async def run(self):
+        """Sync on schedule until cancelled"""
+        while True:
+            if self.elector.is_leader:
+                try:
+                    await asyncio.to_thread(self.sync_once)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Image pre-pull pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> Dict[str, Any]:
+        """Resolved and pinned digests with per-node pull status for monitoring (blocking)"""
+        state = self._state()
+        nodes = state.get("nodes") or {}
+        return {
+            "image": f"{self.registry}/{self.repository}:{self.reference}",
+            "digest": state.get("digest"),
+            "pinned": state.get("pinned") or None,
+            "synced_at": state.get("synced_at"),
+            "interval_seconds": self.interval,
+            "nodes_cached": sum(1 for n in nodes.values() if n["cached"] and n["digest"] == state.get("digest")),
+            "nodes": nodes
+        }
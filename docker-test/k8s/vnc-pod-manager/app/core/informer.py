@@ -0,0 +1,223 @@
+"""
+Lightweight list+watch informer over raw JSON
+
+Keeps an in-memory cache of objects selected by label/field selectors and
+notifies handlers on every change. Objects are kept as raw dicts (no
+kubernetes model deserialization), matching app.core.k8s_projection, or
+as whatever smaller dict a transform projects them to.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.k8s_projection import _json_loads, iter_list_items
+
+logger = logging.getLogger(__name__)
+
+# Handler signature: (event_type, obj, old_obj) with event_type ADDED/MODIFIED/DELETED
+EventHandler = Callable[[str, Dict[str, Any], Optional[Dict[str, Any]]], None]
+# Projection of a raw object; must keep metadata name, namespace and resourceVersion
+Transform = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+def object_key(obj: Dict[str, Any]) -> str:
+    """Cache key for a raw object: namespace/name"""
+    metadata = obj.get("metadata") or {}
+    namespace = metadata.get("namespace")
+    return f"{namespace}/{metadata.get('name')}" if namespace else metadata.get("name")
+
+class ResourceInformer:
+    """
+    Watch a resource kind and mirror it into memory
+
+    A background thread lists once (paginated) to establish a snapshot,
+    then watches from that resourceVersion. On 410 Gone or connection loss
+    it relists and synthesizes DELETED events for objects that vanished in
+    the meantime, so handlers always converge to the live state.
+    """
+
+    def __init__(self, name: str, list_fn: Callable, label_selector: Optional[str] = None,
+                 field_selector: Optional[str] = None, page_size: Optional[int] = None,
+                 watch_timeout: int = 300, retry_backoff: float = 2.0,
+                 transform: Optional[Transform] = None, **list_kwargs):
+        """
+        Initialize informer
+
+        Args:
+            name: Name used in log messages
+            list_fn: Bound kubernetes list method (e.g. v1.list_namespaced_pod)
+            label_selector: Server-side label selector
+            field_selector: Server-side field selector
+            page_size: Page size for the initial/relist calls
+            watch_timeout: Server-side timeout of a single watch request
+            retry_backoff: Seconds to wait after an error before relisting
+            transform: Projection applied before an object is cached and dispatched
+            **list_kwargs: Extra list arguments (e.g. namespace)
+        """
+        self.name = name
+        self.list_fn = list_fn
+        self.page_size = page_size
+        self.watch_timeout = watch_timeout
+        self.retry_backoff = retry_backoff
+        self.transform = transform
+        self._kwargs = dict(list_kwargs)
+        if label_selector:
+            self._kwargs["label_selector"] = label_selector
+        if field_selector:
+            self._kwargs["field_selector"] = field_selector
+
+        self._store: Dict[str, Dict[str, Any]] = {}
+        self._handlers: List[EventHandler] = []
+        self._lock = threading.RLock()
+        self._synced = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._response = None
+        self.resource_version: Optional[str] = None
+
+    def add_handler(self, handler: EventHandler):
+        """Register a change handler (called from the informer thread)"""
+        self._handlers.append(handler)
+
+    def start(self):
+        """Start the background list+watch thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and close the open watch connection"""
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    @property
+    def has_synced(self) -> bool:
+        """True once the initial list has been loaded"""
+        return self._synced.is_set()
+
+    def wait_for_sync(self, timeout: Optional[float] = None):
+        """
+        Block until the initial list has been loaded
+
+        Raises:
+            TimeoutError: if the informer has not synced within timeout
+        """
+        if not self._synced.wait(timeout):
+            raise TimeoutError(f"Informer {self.name} has not synced yet")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached object by namespace/name"""
+        return self._store.get(key)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Snapshot of all cached objects"""
+        with self._lock:
+            return list(self._store.values())
+
+    def _dispatch(self, event_type: str, obj: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        for handler in self._handlers:
+            try:
+                handler(event_type, obj, old)
+            except Exception as e:
+                logger.error(f"Informer {self.name} handler failed on {event_type} {object_key(obj)}: {e}")
+
+    def _apply(self, event_type: str, obj: Dict[str, Any]):
+        key = object_key(obj)
+        with self._lock:
+            old = self._store.get(key)
+            if event_type == "DELETED":
+                self._store.pop(key, None)
+            else:
+                self._store[key] = obj
+        if event_type != "DELETED":
+            event_type = "MODIFIED" if old is not None else "ADDED"
+        self._dispatch(event_type, obj, old)
+
+    def _relist(self):
+        list_meta: Dict[str, Any] = {}
+        seen = set()
+        for obj in iter_list_items(self.list_fn, page_size=self.page_size, list_meta=list_meta, **self._kwargs):
+            if self.transform:
+                obj = self.transform(obj)
+            key = object_key(obj)
+            seen.add(key)
+            old = self._store.get(key)
+            if old is None or (old.get("metadata") or {}).get("resourceVersion") != \
+                    (obj.get("metadata") or {}).get("resourceVersion"):
+                self._apply("MODIFIED", obj)
+
+        with self._lock:
+            vanished = [key for key in self._store if key not in seen]
+        for key in vanished:
+            self._apply("DELETED", self._store[key])
+
+        self.resource_version = list_meta.get("resourceVersion")
+        self._synced.set()
+        logger.info(f"Informer {self.name} synced {len(seen)} objects at resourceVersion {self.resource_version}")
+
+    def _watch(self):
+        """Watch from the current resourceVersion until expiry or error"""
+        while not self._stop.is_set():
+            response = self.list_fn(
+                watch=True,
+                resource_version=self.resource_version,
+                allow_watch_bookmarks=True,
+                timeout_seconds=self.watch_timeout,
+                _preload_content=False,
+                **self._kwargs
+            )
+            self._response = response
+            try:
+                pending = b""
+                for chunk in response.stream(amt=None, decode_content=False):
+                    pending += chunk
+                    lines = pending.split(b"\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        if line.strip() and not self._handle_line(line):
+                            return
+            finally:
+                self._response = None
+                response.release_conn()
+
+    def _handle_line(self, line: bytes) -> bool:
+        """Process one watch event; returns False when a relist is required"""
+        event = _json_loads(line)
+        event_type = event.get("type")
+        obj = event.get("object") or {}
+
+        if event_type == "ERROR":
+            code = obj.get("code")
+            if code == 410:
+                logger.info(f"Informer {self.name} watch expired (410 Gone), relisting")
+            else:
+                logger.warning(f"Informer {self.name} watch error: {obj.get('message')}")
+            return False
+
+        resource_version = (obj.get("metadata") or {}).get("resourceVersion")
+        if resource_version:
+            self.resource_version = resource_version
+        if event_type == "BOOKMARK":
+            return True
+
+        self._apply(event_type, self.transform(obj) if self.transform else obj)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._relist()
+                self._watch()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Informer {self.name} error, relisting in {self.retry_backoff}s: {e}")
+                time.sleep(self.retry_backoff)
@@ -1,47 +1,153 @@
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.client.rest import ApiException
-from typing import Optional, Dict, List, Any
+from kubernetes.stream import stream
+from typing import Optional, Dict, List, Any, Iterator
+import base64
 import logging
 import random
+import threading
+import time
 from app.config import settings
+from app.core import manifests
+from app.core.placement import merge_affinity
+from app.core.k8s_projection import PodRecord, ServiceRecord, iter_records
 
 logger = logging.getLogger(__name__)
 
+_config_loaded = False
+
+def load_kube_config():
+    """
+    Load the Kubernetes client configuration once per process
+    
+    In pre-fork mode this runs in the master, and workers inherit the
+    resulting default Configuration. The per-worker connection pool size is
+    applied here from settings.k8s_connection_pool_maxsize.
+    """
+    global _config_loaded
+    if _config_loaded:
+        return
+    
+    try:
+        if settings.k8s_in_cluster:
+            config.load_incluster_config()
+            logger.info("Loaded in-cluster Kubernetes config")
+        else:
+            config.load_kube_config()
+            logger.info("Loaded local Kubernetes config")
+    except Exception as e:
+        logger.error(f"Failed to load Kubernetes config: {e}")
+        raise
+    
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = settings.k8s_connection_pool_maxsize
+    client.Configuration.set_default(configuration)
+    _config_loaded = True
+
 class K8sManager:
     def __init__(self):
-        try:
-            if settings.k8s_in_cluster:
-                config.load_incluster_config()
-                logger.info("Loaded in-cluster Kubernetes config")
-            else:
-                config.load_kube_config()
-                logger.info("Loaded local Kubernetes config")
-        except Exception as e:
-            logger.error(f"Failed to load Kubernetes config: {e}")
-            raise
-            
+        load_kube_config()
+        
         self.v1 = client.CoreV1Api()
         self.apps_v1 = client.AppsV1Api()
         self.networking_v1 = client.NetworkingV1Api()
         
-        # Track allocated ports
+        # Track allocated ports (loaded lazily, see ensure_allocated_ports)
         self._allocated_ports = set()
-        self._refresh_allocated_ports()
+        self._ports_loaded = False
+        self._ports_lock = threading.Lock()
+        
+        # Namespaces already verified, so create paths skip the read
+        self._known_namespaces = set()
+        
+        # ImagePrepuller pinning new pods to a cached image digest (set when pre-pull is enabled)
+        self.image_pinning = None
+        # PlacementPolicies giving new pods their tier's QoS class, affinity and spread (optional)
+        self.placement_policies = None
     
     def _refresh_allocated_ports(self):
         """Refresh the list of allocated NodePorts"""
-        try:
-            services = self.v1.list_service_for_all_namespaces()
-            for svc in services.items:
-                if svc.spec.type == "NodePort" and svc.spec.ports:
-                    for port in svc.spec.ports:
-                        if port.node_port:
-                            self._allocated_ports.add(port.node_port)
-        except Exception as e:
-            logger.error(f"Failed to refresh allocated ports: {e}")
+        for svc in self.iter_service_records():
+            if svc.type == "NodePort":
+                self._allocated_ports.update(svc.node_ports)
+        self._ports_loaded = True
+    
+    def ensure_allocated_ports(self):
+        """Load the allocated NodePort set once (warm-up or first allocation)"""
+        if self._ports_loaded:
+            return
+        with self._ports_lock:
+            if not self._ports_loaded:
+                self._refresh_allocated_ports()
+    
+    def release_node_ports(self, ports):
+        """Forget NodePorts freed outside delete_service (e.g. by the garbage collector)"""
+        with self._ports_lock:
+            self._allocated_ports.difference_update(ports)
+    
+    def iter_pod_records(self, namespace: str = None, label_selector: str = None,
+                         field_selector: str = None, page_size: int = None) -> Iterator[PodRecord]:
+        """
+        Stream pods as compact projections, page by page
+        
+        Args:
+            namespace: Namespace to list (defaults to the VNC pods namespace)
+            label_selector: Server-side label selector (e.g. "managed-by=vnc-manager")
+            field_selector: Server-side field selector (e.g. "status.phase=Running")
+            page_size: Items per page (defaults to settings.k8s_list_page_size)
+        
+        Returns:
+            Generator of PodRecord
+        """
+        if not namespace:
+            namespace = settings.k8s_namespace_pods
+        
+        kwargs = {"namespace": namespace}
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        
+        return iter_records(
+            self.v1.list_namespaced_pod,
+            PodRecord,
+            page_size=page_size or settings.k8s_list_page_size,
+            **kwargs
+        )
+    
+    def iter_service_records(self, label_selector: str = None, field_selector: str = None,
+                             page_size: int = None) -> Iterator[ServiceRecord]:
+        """
+        Stream Services in all namespaces as compact projections, page by page
+        
+        Args:
+            label_selector: Server-side label selector
+            field_selector: Server-side field selector
+            page_size: Items per page (defaults to settings.k8s_list_page_size)
+        
+        Returns:
+            Generator of ServiceRecord
+        """
+        kwargs = {}
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        
+        return iter_records(
+            self.v1.list_service_for_all_namespaces,
+            ServiceRecord,
+            page_size=page_size or settings.k8s_list_page_size,
+            **kwargs
+        )
     
     def _get_available_port(self, start: int, end: int) -> int:
         """Get an available NodePort in the specified range"""
+        try:
+            self.ensure_allocated_ports()
+        except Exception as e:
+            logger.error(f"Failed to refresh allocated ports: {e}")
+        
         for _ in range(100):  # Try up to 100 times
             port = random.randint(start, end)
             if port not in self._allocated_ports:
@@ -51,6 +157,9 @@ class K8sManager:
     
     def create_namespace_if_not_exists(self, namespace: str):
         """Create namespace if it doesn't exist"""
+        if namespace in self._known_namespaces:
+            return
+        
         try:
             self.v1.read_namespace(namespace)
             logger.info(f"Namespace {namespace} already exists")
@@ -59,13 +168,100 @@ class K8sManager:
                 body = client.V1Namespace(
                     metadata=client.V1ObjectMeta(name=namespace)
                 )
-                self.v1.create_namespace(body)
-                logger.info(f"Created namespace {namespace}")
+                try:
+                    self.v1.create_namespace(body)
+                    logger.info(f"Created namespace {namespace}")
+                except ApiException as create_error:
+                    if create_error.status != 409:
+                        raise
+            else:
+                raise
+        
+        self._known_namespaces.add(namespace)
+    
+    @staticmethod
+    def credentials_secret_name(user_id: str) -> str:
+        return f"vnc-cred-{user_id}"
+    
+    def apply_credentials(self, user_id: str, vnc_password: str = None, api_token: str = None) -> client.V1Secret:
+        """
+        Create or update the user's credentials Secret
+        
+        The Secret is mounted into the VNC pod, and the image re-reads it when
+        the kubelet refreshes the volume, so rotating a credential is a single
+        PATCH and does not recreate the pod. Credentials passed as None are
+        left unchanged.
+        
+        Args:
+            user_id: User identifier
+            vnc_password: New VNC password
+            api_token: New API token for void
+            
+        Returns:
+            Created or patched V1Secret
+        """
+        name = self.credentials_secret_name(user_id)
+        namespace = settings.k8s_namespace_pods
+        string_data = {}
+        if vnc_password is not None:
+            string_data["vnc-password"] = vnc_password
+        if api_token is not None:
+            string_data["void-sk-token"] = api_token
+        
+        try:
+            return self.v1.patch_namespaced_secret(name, namespace, {"stringData": string_data})
+        except ApiException as e:
+            if e.status != 404:
+                raise
+        
+        secret = client.V1Secret(
+            metadata=client.V1ObjectMeta(
+                name=name,
+                namespace=namespace,
+                labels={
+                    "app": "vnc",
+                    "user": user_id,
+                    "managed-by": "vnc-manager"
+                }
+            ),
+            type="Opaque",
+            string_data=string_data
+        )
+        try:
+            response = self.v1.create_namespaced_secret(namespace=namespace, body=secret)
+            logger.info(f"Created credentials secret {name}")
+            return response
+        except ApiException as e:
+            if e.status == 409:
+                # Created concurrently; apply our values on top
+                return self.v1.patch_namespaced_secret(name, namespace, {"stringData": string_data})
+            raise
+    
+    def get_credentials(self, user_id: str) -> Optional[Dict[str, str]]:
+        """Decoded contents of the user's credentials Secret, or None if it does not exist"""
+        try:
+            secret = self.v1.read_namespaced_secret(self.credentials_secret_name(user_id), settings.k8s_namespace_pods)
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+        return {key: base64.b64decode(value).decode() for key, value in (secret.data or {}).items()}
+    
+    def delete_credentials(self, user_id: str):
+        """Delete the user's credentials Secret"""
+        name = self.credentials_secret_name(user_id)
+        try:
+            self.v1.delete_namespaced_secret(name=name, namespace=settings.k8s_namespace_pods)
+            logger.info(f"Deleted credentials secret {name}")
+        except ApiException as e:
+            if e.status == 404:
+                logger.warning(f"Credentials secret {name} not found")
             else:
                 raise
     
-    def create_vnc_pod(self, user_id: str, token: str, api_token: str = None, resource_quota: Optional[Dict] = None) -> client.V1Pod:
-        """Create a VNC Pod for a user"""
+    def create_vnc_pod(self, user_id: str, token: str, api_token: str = None, resource_quota: Optional[Dict] = None,
+                       pvc_name: Optional[str] = None) -> client.V1Pod:
+        """Create a VNC Pod for a user (pvc_name defaults to pvc-{user_id}; pool PVCs have other names)"""
         pod_name = f"vnc-{user_id}"
         namespace = settings.k8s_namespace_pods
         
@@ -76,107 +272,47 @@ class K8sManager:
         if not resource_quota:
             resource_quota = {}
         
+        # Pinned image digest and affinity to nodes that have it cached
+        placement = None
+        if self.image_pinning:
+            try:
+                placement = self.image_pinning.placement()
+            except Exception as e:
+                logger.warning(f"Image pinning unavailable, using {settings.k8s_vnc_image}: {e}")
+        
+        # Tier placement: QoS class, affinity and topology spread ("pack" ranks only nodes the pin allows)
+        hints = {}
+        if self.placement_policies:
+            try:
+                resource_quota = self.placement_policies.apply_qos(user_id, resource_quota)
+                hints = self.placement_policies.placement(
+                    user_id, resource_quota, required=placement["affinity"] if placement else None
+                )
+            except Exception as e:
+                logger.warning(f"Placement policy unavailable for user {user_id}: {e}")
+        
         cpu_request = resource_quota.get("cpu_request", settings.default_cpu_request)
         cpu_limit = resource_quota.get("cpu_limit", settings.default_cpu_limit)
         memory_request = resource_quota.get("memory_request", settings.default_memory_request)
         memory_limit = resource_quota.get("memory_limit", settings.default_memory_limit)
         
-        # Pod specification
-        pod = client.V1Pod(
-            metadata=client.V1ObjectMeta(
-                name=pod_name,
-                namespace=namespace,
-                labels={
-                    "app": "vnc",
-                    "user": user_id,
-                    "managed-by": "vnc-manager"
-                },
-                annotations={
-                    "vnc-manager/token": token[:8],  # Store first 8 chars for reference
-                    "vnc-manager/created-at": "now"
-                }
-            ),
-            spec=client.V1PodSpec(
-                containers=[
-                    client.V1Container(
-                        name="vnc",
-                        image=f"{settings.k8s_image_registry}/{settings.k8s_vnc_image}",
-                        ports=[
-                            client.V1ContainerPort(container_port=5901, name="vnc", protocol="TCP"),
-                            client.V1ContainerPort(container_port=6080, name="novnc", protocol="TCP"),
-                            client.V1ContainerPort(container_port=22, name="ssh", protocol="TCP")
-                        ],
-                        env=[
-                            client.V1EnvVar(name="USER_ID", value=user_id),
-                            client.V1EnvVar(name="VNC_PASSWORD", value=token),  # token is now the VNC password
-                            client.V1EnvVar(name="VOID_SK_TOKEN", value=api_token) if api_token else client.V1EnvVar(name="VOID_SK_TOKEN", value=""),  # API token for void
-                            client.V1EnvVar(name="DISPLAY", value=":1"),
-                            client.V1EnvVar(name="VNC_RESOLUTION", value="1920x1080"),
-                            client.V1EnvVar(name="VNC_DEPTH", value="24")
-                        ],
-                        resources=client.V1ResourceRequirements(
-                            requests={
-                                "cpu": cpu_request,
-                                "memory": memory_request
-                            },
-                            limits={
-                                "cpu": cpu_limit,
-                                "memory": memory_limit
-                            }
-                        ),
-                        volume_mounts=[
-                            client.V1VolumeMount(
-                                name="user-data",
-                                mount_path="/home/void/workspace"
-                            ),
-                            client.V1VolumeMount(
-                                name="shm",
-                                mount_path="/dev/shm"
-                            )
-                        ],
-                        security_context=client.V1SecurityContext(
-                            capabilities=client.V1Capabilities(
-                                add=["SYS_ADMIN"]
-                            ),
-                            run_as_user=0,
-                            run_as_group=0,
-                            allow_privilege_escalation=True
-                        ),
-                        liveness_probe=client.V1Probe(
-                            tcp_socket=client.V1TCPSocketAction(port=5901),
-                            initial_delay_seconds=30,
-                            period_seconds=10,
-                            timeout_seconds=5,
-                            failure_threshold=3
-                        ),
-                        readiness_probe=client.V1Probe(
-                            tcp_socket=client.V1TCPSocketAction(port=5901),
-                            initial_delay_seconds=10,
-                            period_seconds=5,
-                            timeout_seconds=3,
-                            failure_threshold=3
-                        )
-                    )
-                ],
-                volumes=[
-                    client.V1Volume(
-                        name="user-data",
-                        persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                            claim_name=f"pvc-{user_id}"
-                        )
-                    ),
-                    client.V1Volume(
-                        name="shm",
-                        empty_dir=client.V1EmptyDirVolumeSource(
-                            medium="Memory",
-                            size_limit="2Gi"
-                        )
-                    )
-                ],
-                restart_policy="Always",
-                dns_policy="ClusterFirst",
-                termination_grace_period_seconds=30
-            )
+        # Credentials live in a Secret, not in the pod spec
+        self.apply_credentials(user_id, vnc_password=token, api_token=api_token)
+        credentials_secret = self.credentials_secret_name(user_id)
+        
+        # Pod specification, rendered from the precompiled template
+        pod = manifests.render(
+            "pod",
+            user_id=user_id,
+            credentials_secret=credentials_secret,
+            pvc_name=pvc_name or f"pvc-{user_id}",
+            image=placement["image"] if placement else f"{settings.k8s_image_registry}/{settings.k8s_vnc_image}",
+            affinity=merge_affinity(placement["affinity"] if placement else None, hints.get("affinity")),
+            topology_spread=hints.get("topology_spread"),
+            cpu_request=cpu_request,
+            cpu_limit=cpu_limit,
+            memory_request=memory_request,
+            memory_limit=memory_limit
         )
         
         try:
@@ -231,6 +367,23 @@ class K8sManager:
             logger.error(f"Failed to create PVC {pvc_name}: {e}")
             raise
     
+    def find_user_pvc(self, user_id: str) -> Optional[client.V1PersistentVolumeClaim]:
+        """The user's existing data PVC, whether created as pvc-{user_id} or claimed from the pool"""
+        pvcs = self.v1.list_namespaced_persistent_volume_claim(
+            namespace=settings.k8s_namespace_pods,
+            label_selector=f"user={user_id},managed-by=vnc-manager"
+        ).items
+        live = [pvc for pvc in pvcs if not pvc.metadata.deletion_timestamp]
+        return live[0] if live else None
+    
+    @staticmethod
+    def pod_claim_name(pod: client.V1Pod) -> Optional[str]:
+        """Name of the PVC mounted by a VNC Pod"""
+        for volume in pod.spec.volumes or []:
+            if volume.persistent_volume_claim:
+                return volume.persistent_volume_claim.claim_name
+        return None
+    
     def create_service(self, user_id: str) -> client.V1Service:
         """Create a Service to expose the VNC Pod"""
         service_name = f"vnc-service-{user_id}"
@@ -395,6 +548,56 @@ class K8sManager:
             logger.error(f"Failed to get logs for pod {pod_name}: {e}")
             raise
     
+    def stream_pod_logs(self, pod_name: str, namespace: str = None, tail_lines: Optional[int] = None,
+                        follow: bool = False, since_seconds: Optional[int] = None,
+                        limit_bytes: Optional[int] = None, timestamps: bool = False,
+                        read_timeout: Optional[float] = None):
+        """
+        Open a streaming connection to the Pod log endpoint
+        
+        The response body is not preloaded, so callers must read it
+        incrementally and close it (see app.utils.streaming).
+        
+        Args:
+            pod_name: Name of the pod
+            namespace: Pod namespace
+            tail_lines: Number of lines to return from the end
+            follow: Keep the connection open and stream new lines
+            since_seconds: Only return logs newer than this many seconds
+            limit_bytes: Maximum number of bytes the apiserver returns
+            timestamps: Prefix every line with an RFC3339 timestamp
+            read_timeout: Seconds a read may wait for data before ReadTimeoutError
+        
+        Returns:
+            Raw urllib3 response positioned at the start of the log body
+        """
+        if not namespace:
+            namespace = settings.k8s_namespace_pods
+        
+        kwargs = {
+            "follow": follow,
+            "timestamps": timestamps,
+            "_preload_content": False
+        }
+        if tail_lines is not None:
+            kwargs["tail_lines"] = tail_lines
+        if since_seconds is not None:
+            kwargs["since_seconds"] = since_seconds
+        if limit_bytes is not None:
+            kwargs["limit_bytes"] = limit_bytes
+        if read_timeout is not None:
+            kwargs["_request_timeout"] = (10, read_timeout)
+        
+        try:
+            return self.v1.read_namespaced_pod_log(
+                name=pod_name,
+                namespace=namespace,
+                **kwargs
+            )
+        except ApiException as e:
+            logger.error(f"Failed to stream logs for pod {pod_name}: {e}")
+            raise
+    
     def get_pod_status(self, pod_name: str, namespace: str = None) -> Dict[str, Any]:
         """Get detailed Pod status"""
         if not namespace:
@@ -435,8 +638,119 @@ class K8sManager:
             "start_time": pod.status.start_time
         }
     
-    def restart_pod(self, pod_name: str, namespace: str = None):
-        """Restart a Pod by deleting and recreating it"""
+    def wait_for_pod_deletion(self, pod_name: str, namespace: str = None, timeout: int = 60) -> bool:
+        """
+        Block until a Pod is gone, watching it instead of sleeping
+        
+        Args:
+            pod_name: Pod name
+            namespace: Namespace (defaults to the pods namespace)
+            timeout: Maximum seconds to wait
+            
+        Returns:
+            True once the Pod no longer exists, False on timeout
+        """
+        if not namespace:
+            namespace = settings.k8s_namespace_pods
+        
+        deadline = time.monotonic() + timeout
+        pod = self.get_pod(pod_name, namespace)
+        if not pod:
+            return True
+        
+        w = watch.Watch()
+        try:
+            for event in w.stream(
+                self.v1.list_namespaced_pod,
+                namespace=namespace,
+                field_selector=f"metadata.name={pod_name}",
+                resource_version=pod.metadata.resource_version,
+                timeout_seconds=max(1, int(timeout))
+            ):
+                if event["type"] == "DELETED":
+                    return True
+                if time.monotonic() >= deadline:
+                    break
+        except ApiException as e:
+            # 410 Gone: the resourceVersion is too old; fall back to a read
+            if e.status != 410:
+                raise
+        finally:
+            w.stop()
+        
+        return self.get_pod(pod_name, namespace) is None
+    
+    def exec_in_pod(self, pod_name: str, command: List[str], namespace: str = None,
+                    timeout: int = 60) -> Dict[str, Any]:
+        """
+        Run a command in a Pod through the exec API and wait for it to exit
+        
+        Args:
+            pod_name: Pod name
+            command: Command and arguments
+            namespace: Namespace (defaults to the pods namespace)
+            timeout: Maximum seconds to wait for the command
+            
+        Returns:
+            Exit code (None if still running at the timeout) and combined output
+        """
+        if not namespace:
+            namespace = settings.k8s_namespace_pods
+        
+        resp = stream(
+            self.v1.connect_get_namespaced_pod_exec,
+            pod_name,
+            namespace,
+            command=command,
+            stderr=True, stdin=False, stdout=True, tty=False,
+            _preload_content=False
+        )
+        try:
+            resp.run_forever(timeout=timeout)
+            output = resp.read_stdout() + resp.read_stderr()
+            return {"returncode": resp.returncode, "output": output}
+        finally:
+            resp.close()
+    
+    def soft_restart_pod(self, pod_name: str, namespace: str = None, timeout: int = 60) -> bool:
+        """
+        Restart the VNC server, noVNC and Void inside a running Pod
+        
+        The container, PVC, Service and VNC password are kept; only the
+        desktop session processes are restarted by the image's vnc-session
+        script.
+        
+        Returns:
+            True if the session restarted, False if it could not be restarted
+            in place (the caller should recreate the Pod)
+        """
+        try:
+            result = self.exec_in_pod(pod_name, [settings.vnc_session_command, "restart"], namespace, timeout)
+        except Exception as e:
+            logger.warning(f"Soft restart of pod {pod_name} failed: {e}")
+            return False
+        
+        if result["returncode"] != 0:
+            logger.warning(
+                f"Soft restart of pod {pod_name} exited with {result['returncode']}: {result['output'][-500:]}"
+            )
+            return False
+        
+        logger.info(f"Soft restarted pod {pod_name}")
+        return True
+    
+    def restart_pod(self, pod_name: str, namespace: str = None, soft: bool = True) -> client.V1Pod:
+        """
+        Restart a Pod, in place when possible
+        
+        Args:
+            pod_name: Pod name
+            namespace: Namespace (defaults to the pods namespace)
+            soft: Try restarting the session inside the running Pod first
+            
+        Returns:
+            The running Pod (unchanged after a soft restart) or the recreated Pod
+        """
         if not namespace:
             namespace = settings.k8s_namespace_pods
         
@@ -445,21 +759,26 @@ class K8sManager:
         if not pod:
             raise Exception(f"Pod {pod_name} not found")
         
+        if soft and pod.status.phase == "Running":
+            if self.soft_restart_pod(pod_name, namespace, timeout=settings.soft_restart_timeout_seconds):
+                return pod
+        
         # Extract user_id from labels
         user_id = pod.metadata.labels.get("user")
         if not user_id:
             raise Exception(f"Cannot determine user_id for pod {pod_name}")
         
-        # Generate new VNC password for restart
-        import secrets
-        token = secrets.token_urlsafe(6)[:8]
+        # Keep the current VNC password; generate one only if the Secret is gone
+        credentials = self.get_credentials(user_id) or {}
+        token = credentials.get("vnc-password")
+        if not token:
+            import secrets
+            token = secrets.token_urlsafe(6)[:8]
         
-        # Delete the pod
+        # Delete the pod and wait until it is gone, so the create does not hit 409
         self.delete_pod(pod_name, namespace)
+        if not self.wait_for_pod_deletion(pod_name, namespace, timeout=settings.pod_termination_timeout_seconds):
+            raise Exception(f"Pod {pod_name} is still terminating")
         
-        # Wait a moment for cleanup
-        import time
-        time.sleep(2)
-        
-        # Recreate the pod (no API token on restart)
-        return self.create_vnc_pod(user_id, token, api_token=None)
\ No newline at end of file
+        # Recreate the pod on the same PVC (the API token in the Secret is kept)
+        return self.create_vnc_pod(user_id, token, api_token=None, pvc_name=self.pod_claim_name(pod))
@@ -3,6 +3,7 @@ from kubernetes.client.rest import ApiException
 from typing import Optional, Dict, List, Any
 import logging
 from app.config import settings
+from app.core import manifests
 from app.core.k8s_tcp_proxy import K8sTCPProxyManager
 
 logger = logging.getLogger(__name__)
@@ -10,11 +11,31 @@ logger = logging.getLogger(__name__)
 class K8sIngressManager:
     """Manage Kubernetes Ingress resources for VNC access"""
     
-    def __init__(self, k8s_manager):
+    def __init__(self, k8s_manager, tcp_proxy: Optional[K8sTCPProxyManager] = None):
         self.k8s = k8s_manager
-        self.networking_v1 = client.NetworkingV1Api()
-        self.v1 = client.CoreV1Api()
-        self.tcp_proxy = K8sTCPProxyManager(k8s_manager)
+        # Reuse the manager's API clients instead of building new connection pools
+        self.networking_v1 = k8s_manager.networking_v1
+        self.v1 = k8s_manager.v1
+        self.tcp_proxy = tcp_proxy or K8sTCPProxyManager(k8s_manager)
+        
+        # domain -> precomputed VNC URL templates (see _vnc_templates)
+        self._url_templates: Dict[str, Dict[str, str]] = {}
+    
+    def _vnc_templates(self, domain: str) -> Dict[str, str]:
+        """Build (once per domain) the VNC access URL templates"""
+        templates = self._url_templates.get(domain)
+        if templates is None:
+            # Note: Using NodePort 80 and proper WebSocket path
+            base_url = f"http://{domain}"
+            novnc_url = f"{base_url}/user/{{user_id}}/vnc.html?path=user/{{user_id}}/websockify"
+            templates = {
+                "novnc_url": novnc_url,
+                "websocket_url": f"ws://{domain}/user/{{user_id}}/websockify",
+                "vnc_direct_url": f"{base_url}/user/{{user_id}}/vnc",
+                "access_instructions": f"Open {novnc_url} in your browser"
+            }
+            self._url_templates[domain] = templates
+        return templates
         
     def create_pod_service(self, user_id: str) -> client.V1Service:
         """
@@ -29,44 +50,7 @@ class K8sIngressManager:
         service_name = f"vnc-service-{user_id}"
         namespace = settings.k8s_namespace_pods
         
-        service = client.V1Service(
-            metadata=client.V1ObjectMeta(
-                name=service_name,
-                namespace=namespace,
-                labels={
-                    "app": "vnc",
-                    "user": user_id,
-                    "managed-by": "vnc-manager"
-                }
-            ),
-            spec=client.V1ServiceSpec(
-                type="ClusterIP",  # Use ClusterIP for Ingress
-                selector={
-                    "app": "vnc",
-                    "user": user_id
-                },
-                ports=[
-                    client.V1ServicePort(
-                        name="vnc",
-                        port=5901,
-                        target_port=5901,
-                        protocol="TCP"
-                    ),
-                    client.V1ServicePort(
-                        name="novnc",
-                        port=6080,
-                        target_port=6080,
-                        protocol="TCP"
-                    ),
-                    client.V1ServicePort(
-                        name="ssh",
-                        port=22,
-                        target_port=22,
-                        protocol="TCP"
-                    )
-                ]
-            )
-        )
+        service = manifests.render("service", user_id=user_id)
         
         try:
             response = self.v1.create_namespaced_service(
@@ -95,116 +79,9 @@ class K8sIngressManager:
         """
         ingress_name = f"vnc-ingress-{user_id}"
         namespace = settings.k8s_namespace_pods
-        service_name = f"vnc-service-{user_id}"
         
         # Create Ingress with WebSocket support
-        ingress = client.V1Ingress(
-            metadata=client.V1ObjectMeta(
-                name=ingress_name,
-                namespace=namespace,
-                labels={
-                    "app": "vnc",
-                    "user": user_id,
-                    "managed-by": "vnc-manager"
-                },
-                annotations={
-                    # Nginx Ingress annotations
-                    "nginx.ingress.kubernetes.io/proxy-body-size": "0",
-                    "nginx.ingress.kubernetes.io/proxy-read-timeout": "3600",
-                    "nginx.ingress.kubernetes.io/proxy-send-timeout": "3600",
-                    "nginx.ingress.kubernetes.io/proxy-connect-timeout": "3600",
-                    
-                    # Path rewrite to strip the user prefix
-                    "nginx.ingress.kubernetes.io/rewrite-target": "/$2",
-                    
-                    # WebSocket support for noVNC
-                    "nginx.ingress.kubernetes.io/websocket-services": service_name,
-                    "nginx.ingress.kubernetes.io/upstream-hash-by": "$remote_addr",
-                    
-                    # SSL redirect (if using HTTPS)
-                    "nginx.ingress.kubernetes.io/ssl-redirect": "false",
-                    
-                    # CORS settings for web access
-                    "nginx.ingress.kubernetes.io/enable-cors": "true",
-                    "nginx.ingress.kubernetes.io/cors-allow-origin": "*",
-                    "nginx.ingress.kubernetes.io/cors-allow-methods": "GET, POST, OPTIONS",
-                    "nginx.ingress.kubernetes.io/cors-allow-headers": "DNT,X-CustomHeader,Keep-Alive,User-Agent,X-Requested-With,If-Modified-Since,Cache-Control,Content-Type,Authorization",
-                    
-                    # Rewrite for different services
-                    "nginx.ingress.kubernetes.io/use-regex": "true",
-                    
-                    # Session affinity for consistent routing
-                    "nginx.ingress.kubernetes.io/affinity": "cookie",
-                    "nginx.ingress.kubernetes.io/affinity-mode": "persistent",
-                    "nginx.ingress.kubernetes.io/session-cookie-name": f"vnc-session-{user_id}",
-                    "nginx.ingress.kubernetes.io/session-cookie-max-age": "86400"
-                }
-            ),
-            spec=client.V1IngressSpec(
-                ingress_class_name="nginx",
-                rules=[
-                    client.V1IngressRule(
-                        host=domain,
-                        http=client.V1HTTPIngressRuleValue(
-                            paths=[
-                                # noVNC web interface path with regex capture
-                                client.V1HTTPIngressPath(
-                                    path=f"/user/{user_id}/novnc(/|$)(.*)",
-                                    path_type="ImplementationSpecific",
-                                    backend=client.V1IngressBackend(
-                                        service=client.V1IngressServiceBackend(
-                                            name=service_name,
-                                            port=client.V1ServiceBackendPort(
-                                                number=6080
-                                            )
-                                        )
-                                    )
-                                ),
-                                # WebSocket path for noVNC with regex capture
-                                client.V1HTTPIngressPath(
-                                    path=f"/user/{user_id}/websockify(/|$)(.*)",
-                                    path_type="ImplementationSpecific",
-                                    backend=client.V1IngressBackend(
-                                        service=client.V1IngressServiceBackend(
-                                            name=service_name,
-                                            port=client.V1ServiceBackendPort(
-                                                number=6080
-                                            )
-                                        )
-                                    )
-                                ),
-                                # Direct VNC access (if needed) with regex capture
-                                client.V1HTTPIngressPath(
-                                    path=f"/user/{user_id}/vnc(/|$)(.*)",
-                                    path_type="ImplementationSpecific",
-                                    backend=client.V1IngressBackend(
-                                        service=client.V1IngressServiceBackend(
-                                            name=service_name,
-                                            port=client.V1ServiceBackendPort(
-                                                number=5901
-                                            )
-                                        )
-                                    )
-                                ),
-                                # Generic path for all other resources under user directory
-                                client.V1HTTPIngressPath(
-                                    path=f"/user/{user_id}(/|$)(.*)",
-                                    path_type="ImplementationSpecific",
-                                    backend=client.V1IngressBackend(
-                                        service=client.V1IngressServiceBackend(
-                                            name=service_name,
-                                            port=client.V1ServiceBackendPort(
-                                                number=6080
-                                            )
-                                        )
-                                    )
-                                )
-                            ]
-                        )
-                    )
-                ]
-            )
-        )
+        ingress = manifests.render("ingress", user_id=user_id, domain=domain)
         
         try:
             response = self.networking_v1.create_namespaced_ingress(
@@ -220,13 +97,12 @@ class K8sIngressManager:
             logger.error(f"Failed to create Ingress {ingress_name}: {e}")
             raise
     
-    def delete_pod_ingress(self, user_id: str):
-        """Delete the Ingress and SSH proxy for a user's pod"""
+    def delete_ingress(self, user_id: str):
+        """Delete only the HTTP Ingress of a user's pod"""
         ingress_name = f"vnc-ingress-{user_id}"
         namespace = settings.k8s_namespace_pods
         
         try:
-            # Delete HTTP Ingress
             self.networking_v1.delete_namespaced_ingress(
                 name=ingress_name,
                 namespace=namespace
@@ -237,6 +113,11 @@ class K8sIngressManager:
                 logger.warning(f"Ingress {ingress_name} not found")
             else:
                 raise
+    
+    def delete_pod_ingress(self, user_id: str):
+        """Delete the Ingress and SSH proxy for a user's pod"""
+        # Delete HTTP Ingress
+        self.delete_ingress(user_id)
         
         # Remove SSH TCP proxy
         try:
@@ -248,6 +129,10 @@ class K8sIngressManager:
         """
         Get access information for a user's pod with both VNC and SSH access
         
+        Pure in-memory lookup: URLs come from precomputed templates and the
+        SSH port from the tcp proxy index. No apiserver calls are made; SSH
+        mappings are created only by explicit provisioning (add_ssh_proxy).
+        
         Args:
             user_id: User identifier
             domain: Base domain
@@ -255,18 +140,13 @@ class K8sIngressManager:
         Returns:
             Access information dictionary with VNC and SSH details
         """
-        # Note: Using NodePort 80 and proper WebSocket path
-        base_url = f"http://{domain}"
-        
-        # Get SSH proxy information
-        ssh_info = self.tcp_proxy.add_ssh_proxy(user_id)
+        templates = self._vnc_templates(domain)
+        ssh_info = self.tcp_proxy.get_ssh_info(user_id)
         
         return {
             "vnc": {
-                "novnc_url": f"{base_url}/user/{user_id}/vnc.html?path=user/{user_id}/websockify",
-                "websocket_url": f"ws://{domain}/user/{user_id}/websockify",
-                "vnc_direct_url": f"{base_url}/user/{user_id}/vnc",
-                "access_instructions": f"Open {base_url}/user/{user_id}/vnc.html?path=user/{user_id}/websockify in your browser"
+                key: template.format(user_id=user_id)
+                for key, template in templates.items()
             },
             "ssh": {
                 "port": ssh_info["ssh_port"],
@@ -274,7 +154,7 @@ class K8sIngressManager:
                 "command": ssh_info["ssh_command"],
                 "url": ssh_info["ssh_url"],
                 "access_instructions": f"Use: {ssh_info['ssh_command']}"
-            },
+            } if ssh_info else None,
             "credentials": {
                 "username": "void",
                 "password": "Use the password provided when creating the pod"
@@ -0,0 +1,205 @@
+"""
+Raw-JSON list projections for bulk Kubernetes queries
+
+List calls normally deserialize every item into V1Pod/V1Service model
+objects. The helpers here request the raw body (_preload_content=False),
+parse it with orjson and keep only the handful of fields the manager
+actually reads, stored in compact __slots__ records.
+
+Lists are fetched page by page with limit/continue tokens and exposed as
+generators, so only one page is held in memory regardless of cluster size.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+def _isoformat(timestamp: Optional[str]) -> Optional[str]:
+    """Normalize an RFC3339 'Z' timestamp to datetime.isoformat() output"""
+    if timestamp and timestamp.endswith("Z"):
+        return timestamp[:-1] + "+00:00"
+    return timestamp
+
+def parse_time(timestamp: Optional[str]) -> Optional[datetime]:
+    """Parse an RFC3339 timestamp from a raw object into an aware datetime"""
+    if not timestamp:
+        return None
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+def pod_ready_time(pod: Optional[Dict[str, Any]]) -> Optional[datetime]:
+    """Time a raw pod's Ready condition turned True, or None if it is not ready"""
+    if not pod:
+        return None
+    for condition in (pod.get("status") or {}).get("conditions") or []:
+        if condition.get("type") == "Ready" and condition.get("status") == "True":
+            return parse_time(condition.get("lastTransitionTime"))
+    return None
+
+class PodRecord:
+    """Projection of the V1Pod fields used by listing and metrics paths"""
+
+    __slots__ = ("name", "namespace", "user_id", "phase", "created_at",
+                 "pod_ip", "host_ip", "node_name")
+
+    def __init__(self, name: str, namespace: str, user_id: Optional[str], phase: Optional[str],
+                 created_at: Optional[str], pod_ip: Optional[str], host_ip: Optional[str],
+                 node_name: Optional[str]):
+        self.name = name
+        self.namespace = namespace
+        self.user_id = user_id
+        self.phase = phase
+        self.created_at = created_at
+        self.pod_ip = pod_ip
+        self.host_ip = host_ip
+        self.node_name = node_name
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "PodRecord":
+        """Build a record from a raw pod item of a PodList body"""
+        metadata = item.get("metadata") or {}
+        spec = item.get("spec") or {}
+        status = item.get("status") or {}
+        labels = metadata.get("labels") or {}
+        return cls(
+            name=metadata.get("name"),
+            namespace=metadata.get("namespace"),
+            user_id=labels.get("user"),
+            phase=status.get("phase"),
+            created_at=_isoformat(metadata.get("creationTimestamp")),
+            pod_ip=status.get("podIP"),
+            host_ip=status.get("hostIP"),
+            node_name=spec.get("nodeName")
+        )
+
+    def __repr__(self) -> str:
+        return f"PodRecord(name={self.name!r}, phase={self.phase!r})"
+
+class ServiceRecord:
+    """Projection of the V1Service fields used for NodePort bookkeeping"""
+
+    __slots__ = ("name", "namespace", "type", "node_ports")
+
+    def __init__(self, name: str, namespace: str, type: Optional[str], node_ports: Tuple[int, ...]):
+        self.name = name
+        self.namespace = namespace
+        self.type = type
+        self.node_ports = node_ports
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "ServiceRecord":
+        """Build a record from a raw service item of a ServiceList body"""
+        metadata = item.get("metadata") or {}
+        spec = item.get("spec") or {}
+        node_ports = tuple(
+            port["nodePort"]
+            for port in (spec.get("ports") or [])
+            if port.get("nodePort")
+        )
+        return cls(
+            name=metadata.get("name"),
+            namespace=metadata.get("namespace"),
+            type=spec.get("type"),
+            node_ports=node_ports
+        )
+
+    def __repr__(self) -> str:
+        return f"ServiceRecord(name={self.name!r}, node_ports={self.node_ports!r})"
+
+def load_list_body(response) -> Dict[str, Any]:
+    """
+    Parse the raw body of a list call made with _preload_content=False
+
+    Args:
+        response: urllib3 response returned by the kubernetes client
+
+    Returns:
+        Decoded list object (dict with "items" and "metadata")
+    """
+    try:
+        return _json_loads(response.data)
+    finally:
+        response.release_conn()
+
+def project_items(body: Dict[str, Any], record_cls) -> List[Any]:
+    """
+    Project every item of a decoded list body into records
+
+    Args:
+        body: Decoded list object
+        record_cls: PodRecord or ServiceRecord
+
+    Returns:
+        List of records
+    """
+    from_item = record_cls.from_item
+    return [from_item(item) for item in (body.get("items") or [])]
+
+def iter_list_items(list_fn: Callable, page_size: Optional[int] = None,
+                    list_meta: Optional[Dict[str, Any]] = None,
+                    **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the raw items of a paginated list call
+
+    Args:
+        list_fn: Bound kubernetes list method (e.g. v1.list_namespaced_pod)
+        page_size: Items per page (limit); None lists in a single call
+        list_meta: Optional dict that receives the list resourceVersion
+            (the snapshot all pages belong to, used to start a watch)
+        **kwargs: Extra arguments such as namespace, label_selector, field_selector
+
+    Returns:
+        Iterator of raw item dicts, one page resident at a time
+    """
+    continue_token = None
+    pages = 0
+    while True:
+        params = dict(kwargs, _preload_content=False)
+        if page_size:
+            params["limit"] = page_size
+        if continue_token:
+            params["_continue"] = continue_token
+
+        body = load_list_body(list_fn(**params))
+        pages += 1
+        metadata = body.get("metadata") or {}
+        continue_token = metadata.get("continue")
+        if list_meta is not None and pages == 1:
+            list_meta["resourceVersion"] = metadata.get("resourceVersion")
+        items = body.get("items") or []
+        del body
+
+        yield from items
+        del items
+
+        if not continue_token:
+            break
+
+    logger.debug(f"Listed {getattr(list_fn, '__name__', 'items')} in {pages} page(s)")
+
+def iter_records(list_fn: Callable, record_cls, page_size: Optional[int] = None,
+                 **kwargs) -> Iterator[Any]:
+    """
+    Iterate over a paginated list call, projecting items into records
+
+    Args:
+        list_fn: Bound kubernetes list method
+        record_cls: PodRecord or ServiceRecord
+        page_size: Items per page (limit)
+        **kwargs: Extra list arguments (selectors, namespace)
+
+    Returns:
+        Iterator of records
+    """
+    from_item = record_cls.from_item
+    for item in iter_list_items(list_fn, page_size=page_size, **kwargs):
+        yield from_item(item)
@@ -5,8 +5,10 @@ This manages TCP services configuration for Nginx Ingress Controller
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, List, Any
 import logging
+import threading
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +19,118 @@ class K8sTCPProxyManager:
     SSH_PORT_START = 22000
     SSH_PORT_END = 22399
     
+    # External SSH port = internal tcp-services port + offset
+    EXTERNAL_PORT_OFFSET = 10000
+    
     def __init__(self, k8s_manager):
         self.k8s = k8s_manager
-        self.v1 = client.CoreV1Api()
-        self.apps_v1 = client.AppsV1Api()
+        self.v1 = k8s_manager.v1
+        self.apps_v1 = k8s_manager.apps_v1
+        
+        # user_id -> internal SSH port, mirrored from the tcp-services ConfigMap
+        self._ssh_ports: Dict[str, int] = {}
+        self._index_lock = threading.Lock()
+        # Local adds/removes (port or None) made while a refresh is reading the ConfigMap
+        self._index_changes: Dict[str, Optional[int]] = {}
+        self._refreshes = 0
+        self.index_loaded = False
+        
+        # Precomputed access info templates
+        self._ssh_domain = settings.vnc_domain
+        self._ssh_command_template = f"ssh -p {{port}} void@{self._ssh_domain}"
+        self._ssh_url_template = f"ssh://void@{self._ssh_domain}:{{port}}"
+        self._service_suffix = ":22"
+        self._service_prefix = f"{settings.k8s_namespace_pods}/vnc-service-"
+    
+    def refresh_ssh_index(self):
+        """
+        Rebuild the user -> SSH port index from the tcp-services ConfigMap
+        
+        Runs during warm-up and periodically in the background, so read
+        paths never have to call the apiserver. Adds and removes made by
+        this worker while the ConfigMap is being read are applied on top.
+        """
+        with self._index_lock:
+            self._refreshes += 1
+        try:
+            mappings = self.get_all_ssh_proxies()
+        except ApiException as e:
+            logger.error(f"Failed to refresh SSH port index: {e}")
+            with self._index_lock:
+                self._end_refresh()
+            raise
+        
+        index = {}
+        for port, service_mapping in mappings.items():
+            if service_mapping.startswith(self._service_prefix) and service_mapping.endswith(self._service_suffix):
+                user_id = service_mapping[len(self._service_prefix):-len(self._service_suffix)]
+                index[user_id] = port
+        
+        with self._index_lock:
+            for user_id, port in self._index_changes.items():
+                if port is None:
+                    index.pop(user_id, None)
+                else:
+                    index[user_id] = port
+            self._ssh_ports = index
+            self._end_refresh()
+        self.index_loaded = True
+        logger.debug(f"SSH port index refreshed: {len(index)} mappings")
+    
+    def _end_refresh(self):
+        """Called with the index lock held"""
+        self._refreshes -= 1
+        if not self._refreshes:
+            self._index_changes.clear()
+    
+    def _set_indexed_port(self, user_id: str, port: Optional[int]):
+        """Record a local add (port) or remove (None) in the index"""
+        with self._index_lock:
+            if port is None:
+                self._ssh_ports.pop(user_id, None)
+            else:
+                self._ssh_ports[user_id] = port
+            if self._refreshes:
+                self._index_changes[user_id] = port
+    
+    def get_ssh_port(self, user_id: str) -> Optional[int]:
+        """
+        Look up a user's internal SSH port in the in-memory index
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            Internal SSH port or None if not provisioned
+        """
+        return self._ssh_ports.get(user_id)
+    
+    def get_ssh_info(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get SSH access information without any apiserver calls
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            SSH access information or None if not provisioned
+        """
+        port = self._ssh_ports.get(user_id)
+        if port is None:
+            return None
+        return self._build_ssh_info(port)
+    
+    def _build_ssh_info(self, internal_port: int) -> Dict[str, Any]:
+        """Render SSH access information from the precomputed templates"""
+        external_port = internal_port + self.EXTERNAL_PORT_OFFSET
+        return {
+            "ssh_port": external_port,  # Return external port (22xxx + 10000)
+            "internal_port": internal_port,  # Keep internal port for reference
+            "ssh_domain": self._ssh_domain,
+            "ssh_command": self._ssh_command_template.format(port=external_port),
+            "ssh_url": self._ssh_url_template.format(port=external_port),
+            "type": "tcp-proxy"
+        }
         
     def _allocate_available_ssh_port(self, user_id: str) -> int:
         """
@@ -289,6 +399,12 @@ class K8sTCPProxyManager:
         """
         Add SSH proxy configuration for a user (idempotent)
         
+        This is a provisioning write path: it may read and patch the
+        tcp-services ConfigMap and the controller Service. It always reads
+        the ConfigMap, since the in-memory index of this worker may be stale
+        (another worker may have removed or reassigned the port). Read paths
+        should use get_ssh_info() instead.
+        
         Args:
             user_id: User identifier
             
@@ -299,31 +415,16 @@ class K8sTCPProxyManager:
         existing_mapping = self._get_existing_ssh_mapping(user_id)
         
         if existing_mapping:
-            # Return existing configuration with port + 10000 for external access
-            external_port = existing_mapping + 10000
-            logger.info(f"User {user_id} already has SSH port {existing_mapping} (external: {external_port})")
-            return {
-                "ssh_port": external_port,  # Return external port (22xxx + 10000)
-                "internal_port": existing_mapping,  # Keep internal port for reference
-                "ssh_domain": "vnc.service.thinkgs.cn",
-                "ssh_command": f"ssh -p {external_port} void@vnc.service.thinkgs.cn",
-                "ssh_url": f"ssh://void@vnc.service.thinkgs.cn:{external_port}",
-                "type": "tcp-proxy"
-            }
-        
-        # Create new mapping if doesn't exist
-        ssh_port = self._update_tcp_services_configmap(user_id)
-        
-        # Return access information with port + 10000 for external access
-        external_port = ssh_port + 10000
-        return {
-            "ssh_port": external_port,  # Return external port (22xxx + 10000)
-            "internal_port": ssh_port,  # Keep internal port for reference
-            "ssh_domain": "vnc.service.thinkgs.cn",
-            "ssh_command": f"ssh -p {external_port} void@vnc.service.thinkgs.cn",
-            "ssh_url": f"ssh://void@vnc.service.thinkgs.cn:{external_port}",
-            "type": "tcp-proxy"
-        }
+            logger.info(f"User {user_id} already has SSH port {existing_mapping} "
+                        f"(external: {existing_mapping + self.EXTERNAL_PORT_OFFSET})")
+            ssh_port = existing_mapping
+        else:
+            # Create new mapping if doesn't exist
+            ssh_port = self._update_tcp_services_configmap(user_id)
+        
+        self._set_indexed_port(user_id, ssh_port)
+        
+        return self._build_ssh_info(ssh_port)
     
     def remove_ssh_proxy(self, user_id: str):
         """
@@ -332,6 +433,8 @@ class K8sTCPProxyManager:
         Args:
             user_id: User identifier
         """
+        self._set_indexed_port(user_id, None)
+        
         # Find the user's current SSH port
         existing_port = self._get_existing_ssh_mapping(user_id)
         if not existing_port:
@@ -399,6 +502,55 @@ class K8sTCPProxyManager:
                 return {}
             raise
     
+    def get_exposed_ssh_ports(self) -> Dict[int, Optional[int]]:
+        """
+        SSH ports exposed on the Ingress Controller Service
+        
+        Returns:
+            Dictionary of port -> NodePort for ports in the SSH range
+        """
+        service = self.v1.read_namespaced_service(
+            name="ingress-nginx-controller-nginx-tcp",
+            namespace="ingress-nginx"
+        )
+        return {
+            p.port: p.node_port
+            for p in service.spec.ports or []
+            if self.SSH_PORT_START <= p.port <= self.SSH_PORT_END
+        }
+    
+    def remove_port_mappings(self, mapping_ports: List[int], service_ports: List[int]):
+        """
+        Remove many SSH port mappings with one patch per object
+        
+        Uses strategic merge patches (null deletes a ConfigMap key, $patch:
+        delete removes a Service port by its merge key) instead of a
+        read-modify-write per port, and restarts the controller once.
+        
+        Args:
+            mapping_ports: Ports to remove from the tcp-services ConfigMap
+            service_ports: Ports to remove from the Ingress Controller Service
+        """
+        if mapping_ports:
+            self.v1.patch_namespaced_config_map(
+                name="tcp-services",
+                namespace="ingress-nginx",
+                body={"data": {str(port): None for port in mapping_ports}}
+            )
+            logger.info(f"Removed {len(mapping_ports)} TCP proxy mappings")
+        
+        if service_ports:
+            self.v1.patch_namespaced_service(
+                name="ingress-nginx-controller-nginx-tcp",
+                namespace="ingress-nginx",
+                body={"spec": {"ports": [{"port": port, "$patch": "delete"} for port in service_ports]}}
+            )
+            logger.info(f"Removed {len(service_ports)} TCP ports from Ingress Controller Service")
+        
+        if mapping_ports or service_ports:
+            self.refresh_ssh_index()
+            self._restart_ingress_controller()
+    
     def ensure_tcp_proxy_support(self) -> bool:
         """
         Ensure that the Nginx Ingress Controller supports TCP proxy
@@ -0,0 +1,161 @@
+"""
+Redis-based leader election for background controllers
+
+Every API worker of every replica runs an elector; the one holding the
+lease key runs the controllers. The lease is a SET NX PX key renewed by
+compare-and-extend, so it expires on its own when the leader dies. Each
+acquisition increments an epoch counter, and controllers re-check the
+lease (ensure_leader) right before side effects, so a leader that lost
+the lease during a pause stops acting instead of racing its successor.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Extend the lease only if we still hold it
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Delete the lease only if we still hold it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class LeaderElector:
+    """Lease-style leader election on a single Redis key"""
+
+    def __init__(self, redis_client, name: str, lease_seconds: float = 15.0,
+                 renew_interval: float = 5.0, identity: Optional[str] = None):
+        """
+        Initialize elector
+
+        Args:
+            redis_client: Redis client
+            name: Election name; one leader per name
+            lease_seconds: Lease TTL; a dead leader is replaced after at most this long
+            renew_interval: Seconds between acquire/renew attempts (must be < lease_seconds)
+            identity: Unique candidate identity (defaults to host:pid:random)
+        """
+        self.redis = redis_client
+        self.name = name
+        self.key = f"leader:{name}"
+        self.epoch_key = f"leader:{name}:epoch"
+        self.lease_ms = int(lease_seconds * 1000)
+        self.renew_interval = renew_interval
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.epoch: Optional[int] = None
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._lease_deadline = 0.0
+        self.transitions = 0
+
+    @property
+    def is_leader(self) -> bool:
+        """
+        True while we hold a lease that has not locally expired
+
+        Uses the local monotonic clock with the last successful renew, so a
+        leader cut off from Redis steps down on its own before the key
+        expires and another candidate can take over.
+        """
+        return self.epoch is not None and time.monotonic() < self._lease_deadline
+
+    def try_acquire_or_renew(self) -> bool:
+        """
+        One election round (blocking Redis I/O)
+
+        Returns:
+            Whether this candidate is the leader after the round
+        """
+        started = time.monotonic()
+        # Leave a safety margin so we step down before the key can expire in Redis
+        deadline = started + (self.lease_ms / 1000.0) - self.renew_interval / 2
+
+        if self.epoch is not None:
+            if self._renew(keys=[self.key], args=[self.identity, self.lease_ms]):
+                self._lease_deadline = deadline
+                return True
+            logger.warning(f"Lost leadership of {self.name} (epoch {self.epoch})")
+            self._step_down()
+            return False
+
+        if self.redis.set(self.key, self.identity, nx=True, px=self.lease_ms):
+            self.epoch = self.redis.incr(self.epoch_key)
+            self._lease_deadline = deadline
+            self.transitions += 1
+            logger.info(f"Acquired leadership of {self.name} as {self.identity} (epoch {self.epoch})")
+            return True
+        return False
+
+    def ensure_leader(self) -> bool:
+        """
+        Verify against Redis that we still hold the lease (blocking)
+
+        Call right before a side effect that must not be done twice.
+        """
+        if not self.is_leader:
+            return False
+        if self.redis.get(self.key) != self.identity:
+            logger.warning(f"Lease of {self.name} is no longer ours, stepping down")
+            self._step_down()
+            return False
+        return True
+
+    def release(self):
+        """Give up the lease so another candidate takes over immediately"""
+        if self.epoch is None:
+            return
+        try:
+            self._release(keys=[self.key], args=[self.identity])
+            logger.info(f"Released leadership of {self.name}")
+        except Exception as e:
+            logger.warning(f"Failed to release leadership of {self.name}: {e}")
+        self._step_down()
+
+    def _step_down(self):
+        self.epoch = None
+        self._lease_deadline = 0.0
+
+    def status(self) -> Dict[str, Any]:
+        """Election status for monitoring"""
+        leader = None
+        try:
+            leader = self.redis.get(self.key)
+        except Exception as e:
+            logger.debug(f"Failed to read leader of {self.name}: {e}")
+        return {
+            "name": self.name,
+            "identity": self.identity,
+            "is_leader": self.is_leader,
+            "epoch": self.epoch,
+            "current_leader": leader,
+            "transitions": self.transitions
+        }
+
+    async def run(self):
+        """Run election rounds until cancelled; releases the lease on exit"""
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(self.try_acquire_or_renew)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Leader election round for {self.name} failed: {e}")
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            await asyncio.to_thread(self.release)
@@ -0,0 +1,309 @@
+"""
+Precompiled manifest templates for per-user objects
+
+Building a pod from client.V1* models allocates a deep tree of objects on
+every create, which the client then walks again to turn back into dicts.
+The manifests here are written once as plain API-format dicts with
+placeholders, compiled at startup (in the pre-fork master when enabled)
+and rendered per user by rebuilding only the dicts and lists on the path
+to a placeholder. Every constant subtree is shared between renders, so a
+rendered manifest must be treated as read-only; the client only reads it
+while serializing the request body.
+
+Values fixed for the process (namespace, probe settings) are baked in at
+compile time.
+"""
+
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.core.prefork import register_preload
+
+logger = logging.getLogger(__name__)
+
+class Var:
+    """Placeholder replaced by a render value as-is"""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+class Opt(Var):
+    """Placeholder whose key is left out of its dict when the value is None"""
+
+    __slots__ = ()
+
+class Fmt:
+    """Placeholder string interpolated with str.format_map(render values)"""
+
+    __slots__ = ("template",)
+
+    def __init__(self, template: str):
+        self.template = template
+
+def _compile(node: Any) -> Optional[Callable[[Dict[str, Any]], Any]]:
+    """Render function for node, or None if node contains no placeholders"""
+    if isinstance(node, Opt):
+        name = node.name
+        return lambda values: values.get(name)
+    if isinstance(node, Var):
+        name = node.name
+        return lambda values: values[name]
+    if isinstance(node, Fmt):
+        template = node.template
+        return lambda values: template.format_map(values)
+    if isinstance(node, dict):
+        dynamic = tuple(
+            (key, fn, isinstance(value, Opt))
+            for key, value, fn in ((k, v, _compile(v)) for k, v in node.items()) if fn
+        )
+        if not dynamic:
+            return None
+        dynamic_keys = {key for key, _, _ in dynamic}
+        static = {key: value for key, value in node.items() if key not in dynamic_keys}
+
+        def render_dict(values: Dict[str, Any]) -> Dict[str, Any]:
+            rendered = static.copy()
+            for key, fn, optional in dynamic:
+                value = fn(values)
+                if value is not None or not optional:
+                    rendered[key] = value
+            return rendered
+        return render_dict
+    if isinstance(node, list):
+        fns = [_compile(item) for item in node]
+        if not any(fns):
+            return None
+        parts = tuple((fn, item) for fn, item in zip(fns, node))
+        return lambda values: [fn(values) if fn else item for fn, item in parts]
+    return None
+
+class ManifestTemplate:
+    """A manifest compiled once and rendered per user"""
+
+    def __init__(self, name: str, manifest: Dict[str, Any]):
+        """
+        Compile a manifest
+
+        Args:
+            name: Template name (for logging)
+            manifest: API-format dict containing Var/Fmt placeholders
+        """
+        self.name = name
+        self._manifest = manifest
+        self._render = _compile(manifest)
+
+    def render(self, **values) -> Dict[str, Any]:
+        """
+        Manifest with placeholders substituted
+
+        Args:
+            **values: Placeholder values (user_id, ...)
+
+        Returns:
+            Request body for the create call; must not be mutated
+        """
+        return self._render(values) if self._render else self._manifest
+
+def _labels() -> Dict[str, Any]:
+    return {"app": "vnc", "user": Var("user_id"), "managed-by": "vnc-manager"}
+
+def _pod_manifest() -> Dict[str, Any]:
+    namespace = settings.k8s_namespace_pods
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": Fmt("vnc-{user_id}"),
+            "namespace": namespace,
+            "labels": _labels(),
+            "annotations": {
+                "vnc-manager/credentials": Var("credentials_secret"),
+                "vnc-manager/created-at": "now"
+            }
+        },
+        "spec": {
+            "containers": [{
+                "name": "vnc",
+                "image": Var("image"),
+                "ports": [
+                    {"containerPort": 5901, "name": "vnc", "protocol": "TCP"},
+                    {"containerPort": 6080, "name": "novnc", "protocol": "TCP"},
+                    {"containerPort": 22, "name": "ssh", "protocol": "TCP"}
+                ],
+                "env": [
+                    {"name": "USER_ID", "value": Var("user_id")},
+                    # Startup values for images without the credentials mount; the mounted
+                    # files are re-read on rotation and take precedence
+                    {"name": "VNC_PASSWORD", "valueFrom": {"secretKeyRef": {
+                        "name": Var("credentials_secret"), "key": "vnc-password", "optional": True
+                    }}},
+                    {"name": "VOID_SK_TOKEN", "valueFrom": {"secretKeyRef": {
+                        "name": Var("credentials_secret"), "key": "void-sk-token", "optional": True
+                    }}},
+                    {"name": "VNC_CREDENTIALS_DIR", "value": settings.vnc_credentials_mount_path},
+                    {"name": "DISPLAY", "value": ":1"},
+                    {"name": "VNC_RESOLUTION", "value": "1920x1080"},
+                    {"name": "VNC_DEPTH", "value": "24"}
+                ],
+                "resources": {
+                    "requests": {"cpu": Var("cpu_request"), "memory": Var("memory_request")},
+                    "limits": {"cpu": Var("cpu_limit"), "memory": Var("memory_limit")}
+                },
+                "volumeMounts": [
+                    {"name": "user-data", "mountPath": "/home/void/workspace"},
+                    {"name": "shm", "mountPath": "/dev/shm"},
+                    {"name": "credentials", "mountPath": settings.vnc_credentials_mount_path, "readOnly": True}
+                ],
+                "securityContext": {
+                    "capabilities": {"add": ["SYS_ADMIN"]},
+                    "runAsUser": 0,
+                    "runAsGroup": 0,
+                    "allowPrivilegeEscalation": True
+                },
+                "livenessProbe": {
+                    "tcpSocket": {"port": 5901},
+                    "initialDelaySeconds": 30,
+                    "periodSeconds": 10,
+                    "timeoutSeconds": 5,
+                    "failureThreshold": 3
+                },
+                "readinessProbe": {
+                    "tcpSocket": {"port": 5901},
+                    "initialDelaySeconds": 10,
+                    "periodSeconds": 5,
+                    "timeoutSeconds": 3,
+                    "failureThreshold": 3
+                }
+            }],
+            "volumes": [
+                {"name": "user-data", "persistentVolumeClaim": {"claimName": Var("pvc_name")}},
+                {"name": "shm", "emptyDir": {"medium": "Memory", "sizeLimit": "2Gi"}},
+                {"name": "credentials", "projected": {
+                    "sources": [{"secret": {"name": Var("credentials_secret")}}],
+                    "defaultMode": 0o400
+                }}
+            ],
+            "affinity": Opt("affinity"),
+            "topologySpreadConstraints": Opt("topology_spread"),
+            "restartPolicy": "Always",
+            "dnsPolicy": "ClusterFirst",
+            "terminationGracePeriodSeconds": 30
+        }
+    }
+
+def _service_manifest() -> Dict[str, Any]:
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {
+            "name": Fmt("vnc-service-{user_id}"),
+            "namespace": settings.k8s_namespace_pods,
+            "labels": _labels()
+        },
+        "spec": {
+            "type": "ClusterIP",  # Use ClusterIP for Ingress
+            "selector": {"app": "vnc", "user": Var("user_id")},
+            "ports": [
+                {"name": "vnc", "port": 5901, "targetPort": 5901, "protocol": "TCP"},
+                {"name": "novnc", "port": 6080, "targetPort": 6080, "protocol": "TCP"},
+                {"name": "ssh", "port": 22, "targetPort": 22, "protocol": "TCP"}
+            ]
+        }
+    }
+
+def _ingress_path(path: str, port: int) -> Dict[str, Any]:
+    return {
+        "path": Fmt(path),
+        "pathType": "ImplementationSpecific",
+        "backend": {"service": {"name": Fmt("vnc-service-{user_id}"), "port": {"number": port}}}
+    }
+
+def _ingress_manifest() -> Dict[str, Any]:
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "Ingress",
+        "metadata": {
+            "name": Fmt("vnc-ingress-{user_id}"),
+            "namespace": settings.k8s_namespace_pods,
+            "labels": _labels(),
+            "annotations": {
+                # Nginx Ingress annotations
+                "nginx.ingress.kubernetes.io/proxy-body-size": "0",
+                "nginx.ingress.kubernetes.io/proxy-read-timeout": "3600",
+                "nginx.ingress.kubernetes.io/proxy-send-timeout": "3600",
+                "nginx.ingress.kubernetes.io/proxy-connect-timeout": "3600",
+
+                # Path rewrite to strip the user prefix
+                "nginx.ingress.kubernetes.io/rewrite-target": "/$2",
+
+                # WebSocket support for noVNC
+                "nginx.ingress.kubernetes.io/websocket-services": Fmt("vnc-service-{user_id}"),
+                "nginx.ingress.kubernetes.io/upstream-hash-by": "$remote_addr",
+
+                # SSL redirect (if using HTTPS)
+                "nginx.ingress.kubernetes.io/ssl-redirect": "false",
+
+                # CORS settings for web access
+                "nginx.ingress.kubernetes.io/enable-cors": "true",
+                "nginx.ingress.kubernetes.io/cors-allow-origin": "*",
+                "nginx.ingress.kubernetes.io/cors-allow-methods": "GET, POST, OPTIONS",
+                "nginx.ingress.kubernetes.io/cors-allow-headers": "DNT,X-CustomHeader,Keep-Alive,User-Agent,X-Requested-With,If-Modified-Since,Cache-Control,Content-Type,Authorization",
+
+                # Rewrite for different services
+                "nginx.ingress.kubernetes.io/use-regex": "true",
+
+                # Session affinity for consistent routing
+                "nginx.ingress.kubernetes.io/affinity": "cookie",
+                "nginx.ingress.kubernetes.io/affinity-mode": "persistent",
+                "nginx.ingress.kubernetes.io/session-cookie-name": Fmt("vnc-session-{user_id}"),
+                "nginx.ingress.kubernetes.io/session-cookie-max-age": "86400"
+            }
+        },
+        "spec": {
+            "ingressClassName": "nginx",
+            "rules": [{
+                "host": Var("domain"),
+                "http": {"paths": [
+                    # noVNC web interface path with regex capture
+                    _ingress_path("/user/{user_id}/novnc(/|$)(.*)", 6080),
+                    # WebSocket path for noVNC with regex capture
+                    _ingress_path("/user/{user_id}/websockify(/|$)(.*)", 6080),
+                    # Direct VNC access (if needed) with regex capture
+                    _ingress_path("/user/{user_id}/vnc(/|$)(.*)", 5901),
+                    # Generic path for all other resources under user directory
+                    _ingress_path("/user/{user_id}(/|$)(.*)", 6080)
+                ]}
+            }]
+        }
+    }
+
+_templates: Optional[Dict[str, ManifestTemplate]] = None
+
+@register_preload
+def compile_templates() -> Dict[str, ManifestTemplate]:
+    """Compile the per-user manifests once per process (before forking when pre-fork is enabled)"""
+    global _templates
+    if _templates is None:
+        _templates = {
+            "pod": ManifestTemplate("pod", _pod_manifest()),
+            "service": ManifestTemplate("service", _service_manifest()),
+            "ingress": ManifestTemplate("ingress", _ingress_manifest())
+        }
+        logger.info(f"Compiled manifest templates: {', '.join(_templates)}")
+    return _templates
+
+def render(kind: str, **values) -> Dict[str, Any]:
+    """
+    Render a compiled manifest
+
+    Args:
+        kind: pod, service or ingress
+        **values: Placeholder values; every template takes user_id
+
+    Returns:
+        Read-only request body
+    """
+    return compile_templates()[kind].render(**values)
@@ -0,0 +1,220 @@
+"""
+Placement policies for VNC pods
+
+Every VNC pod used to be Burstable with no affinity, so the default
+scheduler's least-allocated scoring spread them across all nodes and left
+every node partly used. A placement policy, chosen by the user's quota
+plan (tier), now decides:
+
+- qos: "burstable" keeps the plan's requests and limits; "guaranteed"
+  raises the requests to the limits
+- strategy:
+  - "pack" prefers nodes already running VNC pods (pod affinity on the
+    hostname) and, when the capacity model is loaded, the most-allocated
+    nodes that still fit the pod (graded preferred node affinity). This is
+    the MostAllocated scoring the default scheduler lacks, as a per-pod hint
+  - "spread" adds a topology spread constraint over the VNC pods
+  - "default" adds nothing
+- node_selector: labels the node must carry (required node affinity)
+
+Policies are configured as JSON in PLACEMENT_POLICIES, keyed by plan name;
+"*" applies to plans without their own entry, e.g.
+
+    {"*": {"strategy": "pack"},
+     "team": {"strategy": "spread", "qos": "guaranteed", "node_selector": {"pool": "dedicated"}}}
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("default", "pack", "spread")
+QOS_CLASSES = ("burstable", "guaranteed")
+
+_HOSTNAME = "kubernetes.io/hostname"
+_VNC_PODS = {"matchLabels": {"app": "vnc", "managed-by": "vnc-manager"}}
+# Preferred node affinity weights for the most-allocated nodes, best first
+_PACK_WEIGHTS = (100, 60, 30)
+
+def parse_policies(spec: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse and validate the policy configuration
+
+    Args:
+        spec: JSON object of plan name -> policy
+
+    Returns:
+        Plan name -> policy with strategy, qos, node_selector, topology_key and max_skew
+
+    Raises:
+        ValueError: Invalid JSON, strategy or QoS class
+    """
+    policies = {}
+    for plan, policy in (json.loads(spec) if spec and spec.strip() else {}).items():
+        strategy = policy.get("strategy", "default")
+        qos = policy.get("qos", "burstable")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Placement policy '{plan}': unknown strategy {strategy}")
+        if qos not in QOS_CLASSES:
+            raise ValueError(f"Placement policy '{plan}': unknown QoS class {qos}")
+        policies[plan] = {
+            "strategy": strategy,
+            "qos": qos,
+            "node_selector": dict(policy.get("node_selector") or {}),
+            "topology_key": policy.get("topology_key", _HOSTNAME),
+            "max_skew": int(policy.get("max_skew", 1))
+        }
+    return policies
+
+def required_node_terms(affinity: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Required node selector terms of a pod affinity, or None if it has none"""
+    required = ((affinity or {}).get("nodeAffinity") or {}).get("requiredDuringSchedulingIgnoredDuringExecution")
+    return (required or {}).get("nodeSelectorTerms") or None
+
+def merge_affinity(base: Optional[Dict[str, Any]], extra: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Combine two pod affinities so that both sets of constraints apply
+
+    Required node selector terms are ORed by the scheduler, so the match
+    expressions of every pair of terms are joined (AND); preferred terms
+    are concatenated.
+
+    Returns:
+        A new affinity dict (inputs are not modified), or None if both are empty
+    """
+    if not base or not extra:
+        return extra or base
+    merged: Dict[str, Any] = {}
+    for kind in ("nodeAffinity", "podAffinity", "podAntiAffinity"):
+        a = base.get(kind) or {}
+        b = extra.get(kind) or {}
+        if not a and not b:
+            continue
+        section: Dict[str, Any] = {}
+        required_a = a.get("requiredDuringSchedulingIgnoredDuringExecution")
+        required_b = b.get("requiredDuringSchedulingIgnoredDuringExecution")
+        if kind == "nodeAffinity" and required_a and required_b:
+            section["requiredDuringSchedulingIgnoredDuringExecution"] = {"nodeSelectorTerms": [
+                {"matchExpressions": (ta.get("matchExpressions") or []) + (tb.get("matchExpressions") or [])}
+                for ta in required_a["nodeSelectorTerms"] for tb in required_b["nodeSelectorTerms"]
+            ]}
+        elif kind == "nodeAffinity":
+            if required_a or required_b:
+                section["requiredDuringSchedulingIgnoredDuringExecution"] = required_a or required_b
+        elif required_a or required_b:
+            section["requiredDuringSchedulingIgnoredDuringExecution"] = (required_a or []) + (required_b or [])
+        preferred = (a.get("preferredDuringSchedulingIgnoredDuringExecution") or []) + \
+                    (b.get("preferredDuringSchedulingIgnoredDuringExecution") or [])
+        if preferred:
+            section["preferredDuringSchedulingIgnoredDuringExecution"] = preferred
+        merged[kind] = section
+    return merged
+
+class PlacementPolicies:
+    """Per-tier QoS class, affinity and topology spread for new VNC pods"""
+
+    def __init__(self, policies: Dict[str, Dict[str, Any]], quotas, capacity=None):
+        """
+        Initialize policies
+
+        Args:
+            policies: Parsed policies (parse_policies)
+            quotas: QuotaCache mapping users to their plan (tier)
+            capacity: CapacityModel ranking nodes for "pack", or None for pod affinity only
+        """
+        self.policies = policies
+        self.quotas = quotas
+        self.capacity = capacity
+
+    def policy_for(self, user_id: str) -> Dict[str, Any]:
+        """Policy of the user's plan, the "*" policy, or an empty default policy"""
+        tier, _ = self.quotas.plan_for(user_id)
+        policy = self.policies.get(tier) or self.policies.get("*")
+        if policy is None:
+            return {"tier": tier, "strategy": "default", "qos": "burstable", "node_selector": {}}
+        return {"tier": tier, **policy}
+
+    def apply_qos(self, user_id: str, quota: Dict[str, str]) -> Dict[str, str]:
+        """
+        Quota with requests adjusted to the policy's QoS class
+
+        Idempotent, so it may be applied both before admission and when the
+        pod is rendered.
+        """
+        if self.policy_for(user_id)["qos"] != "guaranteed":
+            return quota
+        quota = dict(quota)
+        quota["cpu_request"] = quota.get("cpu_limit", settings.default_cpu_limit)
+        quota["memory_request"] = quota.get("memory_limit", settings.default_memory_limit)
+        return quota
+
+    def required_affinity(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Required node affinity from the policy's node_selector, or None"""
+        node_selector = self.policy_for(user_id)["node_selector"]
+        if not node_selector:
+            return None
+        return {"nodeAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": {
+            "nodeSelectorTerms": [{"matchExpressions": [
+                {"key": key, "operator": "In", "values": [str(value)]}
+                for key, value in sorted(node_selector.items())
+            ]}]
+        }}}
+
+    def _pack_affinity(self, quota: Dict[str, str], node_terms: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        affinity: Dict[str, Any] = {"podAffinity": {"preferredDuringSchedulingIgnoredDuringExecution": [{
+            "weight": 50,
+            "podAffinityTerm": {"labelSelector": _VNC_PODS, "topologyKey": _HOSTNAME}
+        }]}}
+        if self.capacity:
+            nodes = self.capacity.most_allocated(
+                quota.get("cpu_request", settings.default_cpu_request),
+                quota.get("memory_request", settings.default_memory_request),
+                limit=len(_PACK_WEIGHTS),
+                node_terms=node_terms
+            )
+            if nodes:
+                affinity["nodeAffinity"] = {"preferredDuringSchedulingIgnoredDuringExecution": [
+                    {"weight": weight, "preference": {"matchExpressions": [
+                        {"key": _HOSTNAME, "operator": "In", "values": [node]}
+                    ]}}
+                    for weight, node in zip(_PACK_WEIGHTS, nodes)
+                ]}
+        return affinity
+
+    def placement(self, user_id: str, quota: Dict[str, str],
+                  required: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Scheduling hints for a new pod
+
+        Args:
+            user_id: User identifier
+            quota: Effective resource quota of the pod
+            required: Other affinity the pod must satisfy (e.g. the pinned image digest);
+                "pack" only ranks nodes it allows
+
+        Returns:
+            {"affinity", "topology_spread"}; either may be None
+        """
+        policy = self.policy_for(user_id)
+        affinity = self.required_affinity(user_id)
+        topology_spread: Optional[List[Dict[str, Any]]] = None
+
+        if policy["strategy"] == "pack":
+            node_terms = required_node_terms(merge_affinity(required, affinity))
+            affinity = merge_affinity(affinity, self._pack_affinity(quota, node_terms))
+        elif policy["strategy"] == "spread":
+            topology_spread = [{
+                "maxSkew": policy.get("max_skew", 1),
+                "topologyKey": policy.get("topology_key", _HOSTNAME),
+                "whenUnsatisfiable": "ScheduleAnyway",
+                "labelSelector": _VNC_PODS
+            }]
+        return {"affinity": affinity, "topology_spread": topology_spread}
+
+    def status(self) -> Dict[str, Any]:
+        """Configured policies and whether pack can rank nodes"""
+        return {"policies": self.policies, "capacity_ranking": self.capacity is not None}
@@ -1,13 +1,13 @@
 """Pod lifecycle management with business logic"""
 
 import logging
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timezone
-import json
+from typing import Optional, Dict, Any, List, Iterator
+from datetime import datetime, timedelta, timezone
 
 from app.core.k8s_client import K8sManager
 from app.core.k8s_ingress import K8sIngressManager
 from app.core.redis_lock import RedisLock
+from app.core.environment_registry import EnvironmentRegistry
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -15,10 +15,12 @@ logger = logging.getLogger(__name__)
 class PodManager:
     """High-level Pod management with business logic"""
     
-    def __init__(self, k8s_manager: K8sManager, ingress_manager: K8sIngressManager, redis_client):
+    def __init__(self, k8s_manager: K8sManager, ingress_manager: K8sIngressManager, redis_client,
+                 registry: Optional[EnvironmentRegistry] = None):
         self.k8s = k8s_manager
         self.ingress = ingress_manager
         self.redis = redis_client
+        self.registry = registry or EnvironmentRegistry(redis_client)
         
     def create_user_environment(self, user_id: str, token: str, api_token: str = None, resource_quota: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -72,7 +74,7 @@ class PodManager:
                 # Get access information
                 access_info = self.ingress.get_pod_access_info(user_id, settings.vnc_domain)
                 
-                # Store environment info in Redis
+                # Record the environment in the registry
                 env_info = {
                     "user_id": user_id,
                     "pod_name": pod.metadata.name,
@@ -80,15 +82,12 @@ class PodManager:
                     "ingress_name": ingress.metadata.name,
                     "pvc_name": pvc.metadata.name,
                     "created_at": datetime.now(timezone.utc).isoformat(),
-                    "status": "Running",
-                    "access_info": access_info
+                    "phase": "Pending"
                 }
+                self.registry.update(**env_info)
                 
-                self.redis.setex(
-                    f"environment:{user_id}",
-                    86400,  # Cache for 24 hours
-                    json.dumps(env_info)
-                )
+                env_info["status"] = env_info["phase"]
+                env_info["access_info"] = access_info
                 
                 logger.info(f"Successfully created environment for user {user_id}")
                 return env_info
@@ -116,15 +115,21 @@ class PodManager:
                 # Delete Service
                 self.k8s.delete_service(f"vnc-service-{user_id}")
                 
-                # Delete Pod
+                # Delete Pod and its credentials
                 self.k8s.delete_pod(f"vnc-{user_id}")
+                self.k8s.delete_credentials(user_id)
                 
                 # Optionally delete PVC
                 if not keep_data:
-                    self.k8s.delete_pvc(f"pvc-{user_id}")
+                    self.k8s.delete_pvc(self.registry.get_field(user_id, "pvc_name") or f"pvc-{user_id}")
                 
-                # Clear cache
-                self.redis.delete(f"environment:{user_id}")
+                # Update registry
+                if keep_data:
+                    self.registry.mark_pod_deleted(
+                        user_id, ssh_port=None, service_name=None, ingress_name=None, hibernated_at=None
+                    )
+                else:
+                    self.registry.delete(user_id)
                 
                 logger.info(f"Successfully deleted environment for user {user_id}")
                 return True
@@ -133,6 +138,57 @@ class PodManager:
             logger.error(f"Failed to delete environment for user {user_id}: {e}")
             raise
     
+    def hibernate_environment(self, user_id: str) -> bool:
+        """
+        Stop an idle environment while keeping everything needed to resume it
+        
+        Only the pod is deleted; the PVC, Service, Ingress and SSH port mapping
+        stay in place so resume_environment just starts a new pod.
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            True if hibernated
+        """
+        with RedisLock(self.redis, f"delete_env_{user_id}", timeout=30).acquire_context():
+            # Set before deleting so the informer records the pod as Hibernated, not Deleted
+            self.registry.update(user_id, hibernated_at=datetime.now(timezone.utc).isoformat())
+            self.k8s.delete_pod(f"vnc-{user_id}")
+            logger.info(f"Hibernated environment for user {user_id}")
+            return True
+    
+    def resume_environment(self, user_id: str, token: str, api_token: str = None, resource_quota: Optional[Dict] = None):
+        """
+        Fast-path resume of a hibernated environment: only the pod is created
+        
+        Args:
+            user_id: User identifier
+            token: VNC password for the new pod
+            api_token: API token passed to void
+            resource_quota: Optional resource limits
+            
+        Returns:
+            Created V1Pod
+        """
+        pod = self.k8s.create_vnc_pod(
+            user_id=user_id,
+            token=token,
+            api_token=api_token,
+            resource_quota=resource_quota,
+            pvc_name=self.registry.get_field(user_id, "pvc_name")
+        )
+        self.registry.update(
+            user_id,
+            pod_name=pod.metadata.name,
+            namespace=pod.metadata.namespace,
+            hibernated_at=None,
+            last_active_at=None,
+            created_at=pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None
+        )
+        logger.info(f"Resumed hibernated environment for user {user_id}")
+        return pod
+    
     def get_user_environment(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Get user environment details
@@ -143,93 +199,107 @@ class PodManager:
         Returns:
             Environment details or None
         """
-        # Check cache first
-        cached = self.redis.get(f"environment:{user_id}")
-        if cached:
-            return json.loads(cached)
-        
-        # Check actual resources
-        pod = self.k8s.get_pod(f"vnc-{user_id}")
-        if not pod:
+        record = self.registry.get(user_id)
+        if not record or record.get("phase") in (None, "Deleted"):
             return None
         
-        # Rebuild environment info
-        env_info = {
-            "user_id": user_id,
-            "pod_name": pod.metadata.name,
-            "status": pod.status.phase,
-            "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-            "access_info": self.ingress.get_pod_access_info(user_id, settings.vnc_domain)
-        }
-        
-        # Cache it
-        self.redis.setex(
-            f"environment:{user_id}",
-            3600,  # Cache for 1 hour
-            json.dumps(env_info)
-        )
+        record["status"] = record.get("phase")
+        record["access_info"] = self.ingress.get_pod_access_info(user_id, settings.vnc_domain)
+        return record
+    
+    def iter_environments(self, phase: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream user environments from the registry
         
-        return env_info
+        Args:
+            phase: Optional pod phase filter, served from the phase index (e.g. "Running")
+            
+        Returns:
+            Generator of environment details
+        """
+        for record in self.registry.iter_records(phase=phase):
+            if not record.get("pod_name") or record.get("phase") == "Deleted":
+                continue
+            yield {
+                "user_id": record.get("user_id"),
+                "pod_name": record["pod_name"],
+                "status": record.get("phase"),
+                "created_at": record.get("created_at"),
+                "pod_ip": record.get("pod_ip"),
+                "host_ip": record.get("host_ip"),
+                "node_name": record.get("node_name")
+            }
     
-    def list_all_environments(self) -> List[Dict[str, Any]]:
+    def list_all_environments(self, phase: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all user environments
         
+        Args:
+            phase: Optional pod phase filter
+        
         Returns:
             List of environment details
         """
         try:
-            pods = self.k8s.v1.list_namespaced_pod(
-                namespace=settings.k8s_namespace_pods,
-                label_selector="managed-by=vnc-manager"
-            )
-            
-            environments = []
-            for pod in pods.items:
-                user_id = pod.metadata.labels.get("user")
-                if user_id:
-                    env_info = {
-                        "user_id": user_id,
-                        "pod_name": pod.metadata.name,
-                        "status": pod.status.phase,
-                        "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-                        "pod_ip": pod.status.pod_ip,
-                        "host_ip": pod.status.host_ip
-                    }
-                    environments.append(env_info)
-            
-            return environments
-            
+            return list(self.iter_environments(phase=phase))
         except Exception as e:
             logger.error(f"Failed to list environments: {e}")
             raise
     
+    @staticmethod
+    def is_stale(record: Optional[Dict[str, Any]], cutoff: datetime) -> bool:
+        """
+        Check whether a registry record is a live environment created before cutoff
+        
+        Args:
+            record: Registry record (EnvironmentRegistry.get)
+            cutoff: Environments created before this time are stale
+            
+        Returns:
+            True if the environment should be reclaimed
+        """
+        if not record or not record.get("pod_name") or not record.get("created_at"):
+            return False
+        if record.get("phase") in ("Deleted", "Terminating", "Hibernated"):
+            return False
+        return datetime.fromisoformat(record["created_at"]) < cutoff
+    
+    def find_stale_environments(self, max_age_hours: int = 24) -> List[str]:
+        """
+        Find user IDs of environments older than the given age (registry only)
+        
+        Args:
+            max_age_hours: Maximum age in hours
+            
+        Returns:
+            List of user IDs
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+        return [
+            record["user_id"] for record in self.registry.iter_records()
+            if self.is_stale(record, cutoff)
+        ]
+    
     def cleanup_stale_environments(self, max_age_hours: int = 24) -> int:
         """
         Clean up stale environments older than specified hours
         
+        Runs sequentially in the caller; the scheduled, leader-elected path is
+        app.core.reconciler.StaleEnvironmentReconciler.
+        
         Args:
             max_age_hours: Maximum age in hours
             
         Returns:
             Number of environments cleaned up
         """
-        from datetime import timedelta
-        
         try:
-            current_time = datetime.now(timezone.utc)
             cleaned_count = 0
             
-            environments = self.list_all_environments()
-            for env in environments:
-                if env.get("created_at"):
-                    created_at = datetime.fromisoformat(env["created_at"].replace("+00:00", "+00:00"))
-                    age = current_time - created_at
-                    
-                    if age > timedelta(hours=max_age_hours):
-                        logger.info(f"Cleaning up stale environment for user {env['user_id']} (age: {age})")
-                        self.delete_user_environment(env["user_id"], keep_data=True)
-                        cleaned_count += 1
+            for user_id in self.find_stale_environments(max_age_hours):
+                logger.info(f"Cleaning up stale environment for user {user_id}")
+                self.delete_user_environment(user_id, keep_data=True)
+                cleaned_count += 1
             
             logger.info(f"Cleaned up {cleaned_count} stale environments")
             return cleaned_count
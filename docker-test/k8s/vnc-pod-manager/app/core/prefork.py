@@ -0,0 +1,110 @@
+"""
+Pre-fork support: shared initialization and per-worker memory reporting
+
+In pre-fork mode (see app/gunicorn_conf.py) the master process imports the
+application, loads the kube config and builds immutable data once, then
+freezes the GC heap so the pages stay shared copy-on-write with every
+worker. Anything that owns sockets or threads (Redis pools, kubernetes
+ApiClients, background tasks) is still created per worker in lifespan.
+"""
+
+import gc
+import logging
+import os
+from typing import Any, Callable, Dict, List
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Environment variable the master exports so workers can find their siblings
+MASTER_PID_ENV = "VNC_MANAGER_MASTER_PID"
+
+# Callables producing immutable data that should be built before forking
+_preload_hooks: List[Callable[[], Any]] = []
+
+def register_preload(hook: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Register a callable that builds immutable, fork-shareable data
+
+    Args:
+        hook: Zero-argument callable, run once in the master before forking
+
+    Returns:
+        The hook itself, so this can be used as a decorator
+    """
+    _preload_hooks.append(hook)
+    return hook
+
+def preload():
+    """
+    Run shared initialization in the master and freeze the heap
+
+    Loads the kube config, runs registered preload hooks, then collects
+    garbage and moves every surviving object into the permanent
+    generation so later collections in the workers do not touch (and
+    un-share) those pages.
+    """
+    from app.core.k8s_client import load_kube_config
+
+    load_kube_config()
+    for hook in _preload_hooks:
+        hook()
+
+    gc.collect()
+    gc.freeze()
+    os.environ[MASTER_PID_ENV] = str(os.getpid())
+    logger.info(f"Pre-fork initialization complete, {gc.get_freeze_count()} objects frozen")
+
+def _memory_info(proc: psutil.Process) -> Dict[str, Any]:
+    """Collect RSS/USS/PSS for a single process"""
+    info = {"pid": proc.pid}
+    try:
+        full = proc.memory_full_info()
+        info["rss_mb"] = round(full.rss / (1024 * 1024), 2)
+        info["uss_mb"] = round(full.uss / (1024 * 1024), 2)
+        if hasattr(full, "pss"):
+            info["pss_mb"] = round(full.pss / (1024 * 1024), 2)
+    except (psutil.AccessDenied, psutil.NoSuchProcess) as e:
+        info["error"] = str(e)
+    return info
+
+def worker_memory_report() -> Dict[str, Any]:
+    """
+    Report per-process memory for the master and all workers
+
+    USS (unique set size) is the memory a worker would free if it exited;
+    RSS double-counts pages shared with the master. Sum of worker USS plus
+    master RSS approximates the container's working set.
+
+    Returns:
+        Report with master, workers and totals
+    """
+    master_pid = os.environ.get(MASTER_PID_ENV)
+    current = psutil.Process()
+
+    if master_pid:
+        try:
+            master = psutil.Process(int(master_pid))
+            workers = master.children()
+        except psutil.NoSuchProcess:
+            master, workers = None, [current]
+    else:
+        # Single-process mode (plain uvicorn)
+        master, workers = None, [current]
+
+    worker_info = [_memory_info(proc) for proc in workers]
+    for info in worker_info:
+        info["current"] = info["pid"] == current.pid
+
+    report = {
+        "mode": "prefork" if master else "single",
+        "master": _memory_info(master) if master else None,
+        "workers": worker_info,
+        "worker_count": len(worker_info),
+        "total_worker_uss_mb": round(sum(w.get("uss_mb", 0) for w in worker_info), 2),
+        "total_worker_rss_mb": round(sum(w.get("rss_mb", 0) for w in worker_info), 2)
+    }
+    if master and report["master"].get("rss_mb") is not None:
+        report["estimated_total_mb"] = round(report["master"]["rss_mb"] + report["total_worker_uss_mb"], 2)
+    return report
@@ -0,0 +1,287 @@
+"""
+Environment provisioning as a saga with compensating rollback
+
+Provisioning runs the steps pvc -> pod -> service -> ingress -> ssh and
+records the output of every completed step in the Redis hash
+provision:{user_id}. A failed attempt leaves the hash in state "failed",
+and the next create request resumes from the first incomplete step
+instead of repeating the whole sequence. The VNC password chosen by the
+first attempt is kept in the hash until the saga completes, so a resumed
+attempt returns the password the pod was started with.
+
+A permanent failure (a rejected request such as an invalid spec or an
+exceeded quota, or max_attempts failed attempts) runs the compensating
+deletes of the completed steps in reverse order. The PVC is only deleted
+if this saga created it, never when it held data from an earlier
+environment. If a compensation fails, the saga stays in state
+"compensating" and the next request finishes it before starting over.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from kubernetes.client.rest import ApiException
+
+from app.config import settings
+from app.core.events import emit_event
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "provision:"
+STEP_PREFIX = "step:"
+
+STEPS = ("pvc", "pod", "service", "ingress", "ssh")
+
+# Saga states
+RUNNING = "running"
+FAILED = "failed"
+COMPENSATING = "compensating"
+COMPLETED = "completed"
+COMPENSATED = "compensated"
+
+# The apiserver rejected the request itself; retrying cannot succeed
+_PERMANENT_STATUSES = {400, 403, 422}
+
+class ProvisioningError(Exception):
+    """Provisioning attempt failed at a step"""
+
+    def __init__(self, user_id: str, step: str, cause: Exception, permanent: bool):
+        self.user_id = user_id
+        self.step = step
+        self.cause = cause
+        self.permanent = permanent
+        outcome = "not retryable" if permanent else "retry to resume"
+        super().__init__(f"Provisioning failed at step {step} ({outcome}): {cause}")
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class ProvisioningSaga:
+    """Resumable, compensating provisioning of a user environment"""
+
+    def __init__(self, k8s_manager, ingress_manager, tcp_proxy, redis_client,
+                 max_attempts: int = 3, state_ttl: int = 86400, pvc_pool=None):
+        """
+        Initialize saga coordinator
+
+        Args:
+            k8s_manager: K8sManager (PVC, pod, service)
+            ingress_manager: K8sIngressManager (ingress)
+            tcp_proxy: K8sTCPProxyManager (SSH mapping)
+            redis_client: Redis client holding saga state
+            max_attempts: Failed attempts before the saga is rolled back
+            state_ttl: Seconds saga state is kept after the last update
+            pvc_pool: Optional PVCPool claimed from before creating a PVC
+        """
+        self.k8s = k8s_manager
+        self.ingress = ingress_manager
+        self.tcp_proxy = tcp_proxy
+        self.redis = redis_client
+        self.max_attempts = max_attempts
+        self.state_ttl = state_ttl
+        self.pvc_pool = pvc_pool
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"{KEY_PREFIX}{user_id}"
+
+    def state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Saga state with decoded step outputs (without the VNC password)"""
+        raw = self.redis.hgetall(self.key(user_id))
+        if not raw:
+            return None
+        raw.pop("vnc_password", None)
+        steps = {
+            field[len(STEP_PREFIX):]: json.loads(value)
+            for field, value in raw.items() if field.startswith(STEP_PREFIX)
+        }
+        state = {field: value for field, value in raw.items() if not field.startswith(STEP_PREFIX)}
+        state["steps"] = steps
+        return state
+
+    def is_pending(self, user_id: str) -> bool:
+        """Whether an interrupted saga must be resumed or rolled back"""
+        return self.redis.hget(self.key(user_id), "state") in (RUNNING, FAILED, COMPENSATING)
+
+    def discard(self, user_id: str):
+        """Forget saga state (the environment was deleted explicitly)"""
+        self.redis.delete(self.key(user_id))
+
+    def _save(self, user_id: str, **fields):
+        key = self.key(user_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping={field: value for field, value in fields.items() if value is not None})
+        pipe.hset(key, "updated_at", _now())
+        pipe.expire(key, self.state_ttl)
+        pipe.execute()
+
+    def _is_permanent(self, exc: Exception, attempts: int) -> bool:
+        if attempts >= self.max_attempts:
+            return True
+        return isinstance(exc, ApiException) and exc.status in _PERMANENT_STATUSES
+
+    # Steps: each returns the JSON-serializable output recorded for it
+
+    def _create_pvc(self, user_id: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        size = ctx["resource_quota"].get("storage", settings.default_storage_size)
+        pvc = None
+        if self.pvc_pool:
+            # A returning user keeps their data (which may be on an earlier pool PVC)
+            pvc = self.k8s.find_user_pvc(user_id)
+            if pvc is None:
+                pvc = self.pvc_pool.claim(user_id, size)
+                if pvc:
+                    emit_event(user_id, "pvc_claimed", pvc_name=pvc.metadata.name, size=size)
+                    return {"pvc_name": pvc.metadata.name, "created": True}
+
+        if pvc is None:
+            pvc = self.k8s.create_pvc(user_id=user_id, size=size)
+        # create_pvc returns an existing claim on 409; one older than the saga holds user data
+        created_at = pvc.metadata.creation_timestamp
+        started_at = datetime.fromisoformat(ctx["started_at"]).replace(microsecond=0)
+        created = created_at is None or created_at >= started_at
+        emit_event(user_id, "pvc_created" if created else "pvc_reused", pvc_name=pvc.metadata.name)
+        return {"pvc_name": pvc.metadata.name, "created": created}
+
+    def _create_pod(self, user_id: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        pod = self.k8s.create_vnc_pod(
+            user_id=user_id,
+            token=ctx["vnc_password"],
+            api_token=ctx["api_token"],
+            resource_quota=ctx["resource_quota"],
+            pvc_name=ctx.get("pvc_name")
+        )
+        emit_event(user_id, "pod_created", pod_uid=pod.metadata.uid, phase="Pending", pod_name=pod.metadata.name)
+        return {
+            "pod_name": pod.metadata.name,
+            "namespace": pod.metadata.namespace,
+            "pod_uid": pod.metadata.uid,
+            "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None
+        }
+
+    def _create_service(self, user_id: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        service = self.ingress.create_pod_service(user_id)
+        emit_event(user_id, "service_created", pod_uid=ctx.get("pod_uid"), service_name=service.metadata.name)
+        return {"service_name": service.metadata.name}
+
+    def _create_ingress(self, user_id: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        ingress = self.ingress.create_pod_ingress(user_id=user_id, domain=settings.vnc_domain)
+        emit_event(user_id, "ingress_created", pod_uid=ctx.get("pod_uid"), ingress_name=ingress.metadata.name)
+        return {"ingress_name": ingress.metadata.name}
+
+    def _create_ssh(self, user_id: str, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        ssh_info = self.tcp_proxy.add_ssh_proxy(user_id)
+        emit_event(user_id, "ssh_mapped", pod_uid=ctx.get("pod_uid"),
+                   ssh_port=ssh_info.get("ssh_port") if ssh_info else None)
+        return {"ssh_info": ssh_info, "ssh_port": self.tcp_proxy.get_ssh_port(user_id)}
+
+    # Compensations: must tolerate the resource being gone already
+
+    def _undo_pvc(self, user_id: str, output: Dict[str, Any]):
+        if output.get("created"):
+            self.k8s.delete_pvc(output["pvc_name"])
+
+    def _undo_pod(self, user_id: str, output: Dict[str, Any]):
+        self.k8s.delete_pod(output["pod_name"], output.get("namespace"))
+        self.k8s.delete_credentials(user_id)
+
+    def _undo_service(self, user_id: str, output: Dict[str, Any]):
+        self.k8s.delete_service(output["service_name"])
+
+    def _undo_ingress(self, user_id: str, output: Dict[str, Any]):
+        self.ingress.delete_ingress(user_id)
+
+    def _undo_ssh(self, user_id: str, output: Dict[str, Any]):
+        self.tcp_proxy.remove_ssh_proxy(user_id)
+
+    def _actions(self, step: str) -> Tuple[Callable, Callable]:
+        return getattr(self, f"_create_{step}"), getattr(self, f"_undo_{step}")
+
+    def compensate(self, user_id: str) -> bool:
+        """
+        Undo the completed steps of a saga in reverse order (blocking)
+
+        Returns:
+            True if every compensation succeeded
+        """
+        key = self.key(user_id)
+        self._save(user_id, state=COMPENSATING)
+        for step in reversed(STEPS):
+            output = self.redis.hget(key, f"{STEP_PREFIX}{step}")
+            if output is None:
+                continue
+            try:
+                self._actions(step)[1](user_id, json.loads(output))
+            except Exception as e:
+                logger.error(f"Compensation of step {step} failed for user {user_id}: {e}")
+                self._save(user_id, error=f"compensation of {step} failed: {e}")
+                return False
+            self.redis.hdel(key, f"{STEP_PREFIX}{step}")
+
+        self.redis.hdel(key, "vnc_password")
+        self._save(user_id, state=COMPENSATED)
+        emit_event(user_id, "provisioning_rolled_back")
+        logger.info(f"Rolled back provisioning for user {user_id}")
+        return True
+
+    def provision(self, user_id: str, vnc_password: str, api_token: Optional[str] = None,
+                  resource_quota: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Run or resume provisioning for a user (blocking; call under the create lock)
+
+        Args:
+            user_id: User identifier
+            vnc_password: Password for a new saga; a resumed saga keeps its own
+            api_token: API token passed to void
+            resource_quota: Optional resource limits
+
+        Returns:
+            Merged step outputs plus the VNC password the pod was started with
+
+        Raises:
+            ProvisioningError: A step failed; permanent failures are rolled back
+        """
+        key = self.key(user_id)
+        state = self.redis.hget(key, "state")
+
+        if state == COMPENSATING and not self.compensate(user_id):
+            raise ProvisioningError(user_id, "compensate", Exception("previous rollback incomplete"), False)
+
+        if state in (RUNNING, FAILED):
+            saved = self.redis.hgetall(key)
+            logger.info(f"Resuming provisioning for user {user_id} (attempt {int(saved.get('attempts', 0)) + 1})")
+        else:
+            self.redis.delete(key)
+            saved = {"started_at": _now(), "vnc_password": vnc_password, "attempts": "0"}
+            self._save(user_id, state=RUNNING, **saved)
+
+        ctx: Dict[str, Any] = {
+            "started_at": saved["started_at"],
+            "vnc_password": saved.get("vnc_password") or vnc_password,
+            "api_token": api_token,
+            "resource_quota": resource_quota or {}
+        }
+        for step in STEPS:
+            output = saved.get(f"{STEP_PREFIX}{step}")
+            if output is not None:
+                ctx.update(json.loads(output))
+                continue
+            try:
+                result = self._actions(step)[0](user_id, ctx)
+            except Exception as e:
+                attempts = self.redis.hincrby(key, "attempts", 1)
+                permanent = self._is_permanent(e, attempts)
+                logger.error(f"Provisioning step {step} failed for user {user_id} (attempt {attempts}): {e}")
+                self._save(user_id, state=FAILED, failed_step=step, error=str(e))
+                emit_event(user_id, "create_failed", step=step, attempt=attempts, permanent=permanent, error=str(e))
+                if permanent:
+                    self.compensate(user_id)
+                raise ProvisioningError(user_id, step, e, permanent) from e
+            ctx.update(result)
+            self._save(user_id, **{f"{STEP_PREFIX}{step}": json.dumps(result, default=str)})
+
+        self.redis.hdel(key, "vnc_password", "failed_step", "error")
+        self._save(user_id, state=COMPLETED, completed_at=_now())
+        return ctx
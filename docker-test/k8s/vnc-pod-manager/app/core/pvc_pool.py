@@ -0,0 +1,236 @@
+"""
+Pool of pre-provisioned PVCs for first-time environments
+
+Dynamic provisioning on the NFS storage class adds seconds to the first
+create of every user. The leader keeps, per size class, a configured
+number of unassigned PVCs (generated names pvc-pool-*, labeled
+vnc-manager/pvc-pool={size}) provisioned and bound ahead of time.
+
+A create for a user without a PVC claims a Bound pool PVC by relabeling
+it: one PATCH that drops the pool label and adds the user labels, sent
+with the resourceVersion read from the list, so two workers claiming the
+same PVC cannot both succeed (the loser gets 409 and tries another). The
+claimed name is recorded as pvc_name in the environment registry and used
+as the pod's claimName. The leader refills the pool on its next pass.
+
+Pool PVCs carry neither managed-by=vnc-manager nor a user label, so the
+informer, garbage collector and metrics ignore them until claimed.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from kubernetes.client.rest import ApiException
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.core.k8s_projection import iter_list_items
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "vnc-manager/pvc-pool"
+NAME_PREFIX = "pvc-pool-"
+CLAIMED_ANNOTATION = "vnc-manager/claimed-at"
+
+pvc_pool_claims_counter = Counter(
+    'vnc_pvc_pool_claims_total', 'PVC pool claims by outcome', ['size', 'outcome']
+)
+pvc_pool_available_gauge = Gauge(
+    'vnc_pvc_pool_available', 'Bound, unassigned PVCs in the pool', ['size'],
+    multiprocess_mode='livemostrecent'
+)
+
+def parse_pool_sizes(spec: str) -> Dict[str, int]:
+    """
+    Parse the pool configuration
+
+    Args:
+        spec: Comma-separated size=count pairs, e.g. "10Gi=5,20Gi=2"
+
+    Returns:
+        Size -> target number of unassigned PVCs
+    """
+    sizes = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        size, _, count = item.partition("=")
+        sizes[size.strip()] = int(count or 0)
+    return sizes
+
+class PVCPool:
+    """Pre-provisioned PVCs claimed by relabeling, refilled by the leader"""
+
+    def __init__(self, k8s_manager, elector, sizes: Dict[str, int], storage_class: str = "183nfs",
+                 interval: float = 15, max_claim_attempts: int = 3):
+        """
+        Initialize pool
+
+        Args:
+            k8s_manager: K8sManager
+            elector: LeaderElector gating refills
+            sizes: Size class (storage request, e.g. "10Gi") -> target unassigned PVCs
+            storage_class: Storage class of pool PVCs (same as create_pvc)
+            interval: Seconds between refill passes
+            max_claim_attempts: Pool PVCs tried per claim before falling back to create_pvc
+        """
+        self.k8s = k8s_manager
+        self.elector = elector
+        self.sizes = sizes
+        self.storage_class = storage_class
+        self.interval = interval
+        self.max_claim_attempts = max_claim_attempts
+        self.namespace = settings.k8s_namespace_pods
+        self.last_refill: Optional[Dict[str, Any]] = None
+
+    def _list(self, size: str) -> List[Dict[str, Any]]:
+        """Unassigned pool PVCs of a size class (raw objects, not terminating)"""
+        return [
+            item for item in iter_list_items(
+                self.k8s.v1.list_namespaced_persistent_volume_claim,
+                page_size=settings.k8s_list_page_size,
+                namespace=self.namespace,
+                label_selector=f"{POOL_LABEL}={size}"
+            )
+            if not (item.get("metadata") or {}).get("deletionTimestamp")
+        ]
+
+    @staticmethod
+    def _is_bound(item: Dict[str, Any]) -> bool:
+        return (item.get("status") or {}).get("phase") == "Bound"
+
+    def claim(self, user_id: str, size: str):
+        """
+        Assign a bound pool PVC to a user (blocking)
+
+        Args:
+            user_id: User identifier
+            size: Requested storage size
+
+        Returns:
+            The relabeled V1PersistentVolumeClaim, or None if the size is not
+            pooled or no bound PVC could be claimed
+        """
+        if not self.sizes.get(size):
+            return None
+
+        candidates = [item for item in self._list(size) if self._is_bound(item)]
+        random.shuffle(candidates)  # concurrent claims rarely pick the same PVC
+        for item in candidates[:self.max_claim_attempts]:
+            metadata = item["metadata"]
+            patch = {
+                "metadata": {
+                    # Precondition: fails with 409 if another worker relabeled it first
+                    "resourceVersion": metadata["resourceVersion"],
+                    "labels": {
+                        POOL_LABEL: None,
+                        "app.kubernetes.io/managed-by": None,
+                        "app": "vnc",
+                        "user": user_id,
+                        "managed-by": "vnc-manager"
+                    },
+                    "annotations": {CLAIMED_ANNOTATION: datetime.now(timezone.utc).isoformat()}
+                }
+            }
+            try:
+                pvc = self.k8s.v1.patch_namespaced_persistent_volume_claim(metadata["name"], self.namespace, patch)
+            except ApiException as e:
+                if e.status in (404, 409):
+                    pvc_pool_claims_counter.labels(size=size, outcome="conflict").inc()
+                    continue
+                raise
+            pvc_pool_claims_counter.labels(size=size, outcome="claimed").inc()
+            logger.info(f"Claimed pool PVC {pvc.metadata.name} ({size}) for user {user_id}")
+            return pvc
+
+        pvc_pool_claims_counter.labels(size=size, outcome="empty").inc()
+        logger.info(f"No pool PVC of size {size} available for user {user_id}")
+        return None
+
+    def _create(self, size: str):
+        body = {
+            "apiVersion": "v1",
+            "kind": "PersistentVolumeClaim",
+            "metadata": {
+                "generateName": NAME_PREFIX,
+                "namespace": self.namespace,
+                "labels": {POOL_LABEL: size, "app.kubernetes.io/managed-by": "vnc-manager"}
+            },
+            "spec": {
+                "accessModes": ["ReadWriteOnce"],
+                "storageClassName": self.storage_class,
+                "resources": {"requests": {"storage": size}}
+            }
+        }
+        pvc = self.k8s.v1.create_namespaced_persistent_volume_claim(self.namespace, body)
+        logger.info(f"Created pool PVC {pvc.metadata.name} ({size})")
+
+    def refill_once(self) -> Dict[str, Any]:
+        """
+        Bring every size class back to its target (blocking, leader only)
+
+        Pending PVCs count towards the target, so a slow provisioner is not
+        flooded with new claims. Surplus PVCs (target lowered) are deleted.
+
+        Returns:
+            Per size: target, bound, pending, created and deleted counts
+        """
+        report = {}
+        for size, target in self.sizes.items():
+            if not self.elector.ensure_leader():
+                break
+            items = self._list(size)
+            bound = sum(1 for item in items if self._is_bound(item))
+            created = deleted = 0
+            for _ in range(target - len(items)):
+                self._create(size)
+                created += 1
+            # Unbound first, then newest
+            surplus = sorted(items, key=lambda item: item["metadata"]["creationTimestamp"], reverse=True)
+            surplus.sort(key=self._is_bound)
+            for item in surplus[:max(0, len(items) - target)]:
+                try:
+                    self.k8s.v1.delete_namespaced_persistent_volume_claim(item["metadata"]["name"], self.namespace)
+                    deleted += 1
+                except ApiException as e:
+                    if e.status != 404:
+                        raise
+            pvc_pool_available_gauge.labels(size=size).set(bound)
+            report[size] = {
+                "target": target,
+                "bound": bound,
+                "pending": len(items) - bound,
+                "created": created,
+                "deleted": deleted
+            }
+        self.last_refill = {"refilled_at": datetime.now(timezone.utc).isoformat(), "sizes": report}
+        return report
+
+    async def run(self):
+        """Refill on schedule until cancelled"""
+        while True:
+            if self.elector.is_leader:
+                try:
+                    await asyncio.to_thread(self.refill_once)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"PVC pool refill failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> Dict[str, Any]:
+        """Live pool contents per size class and this worker's last refill pass (blocking)"""
+        pools = {}
+        for size, target in self.sizes.items():
+            items = self._list(size)
+            bound = sum(1 for item in items if self._is_bound(item))
+            pools[size] = {"target": target, "bound": bound, "pending": len(items) - bound}
+        return {
+            "sizes": pools,
+            "storage_class": self.storage_class,
+            "interval_seconds": self.interval,
+            "last_refill": self.last_refill
+        }
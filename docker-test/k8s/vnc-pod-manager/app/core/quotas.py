@@ -0,0 +1,201 @@
+"""
+Per-user resource quotas from tiered plans
+
+Plans (vnc_quota_plan) and user assignments (vnc_user_quota) live in
+MySQL next to im_user; the schema is in sql/quota_plans.sql. Every worker
+bulk-loads both tables into memory and resolves quotas from there, so
+neither token validation nor a create waits on MySQL for them.
+
+Triggers bump vnc_quota_meta.version on every change. Each worker reads
+that single row every QUOTA_REFRESH_INTERVAL_SECONDS and reloads the
+tables only when the version differs from the one it holds. Until the
+first load succeeds (or when the tables are not installed) every user
+gets the DEFAULT_* settings.
+
+A plan's values are the defaults of a new pod and also its ceiling: a
+create may override them downwards, never upwards. A plan row with an
+unparseable or non-positive value, or a request above its limit, is
+logged and skipped on load; its users fall back to the default plan.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.utils.helpers import parse_resource_string
+
+logger = logging.getLogger(__name__)
+
+QUOTA_FIELDS = ("cpu_request", "cpu_limit", "memory_request", "memory_limit", "storage")
+
+quota_reloads_counter = Counter(
+    'vnc_quota_reloads_total', 'Quota table reload checks by outcome', ['outcome']
+)
+quota_rejections_counter = Counter(
+    'vnc_quota_rejections_total', 'Creates rejected for exceeding the user plan', ['plan']
+)
+quota_version_gauge = Gauge(
+    'vnc_quota_version', 'Version of the quota tables loaded by this worker',
+    multiprocess_mode='livemin'
+)
+
+class QuotaExceeded(Exception):
+    """A requested override is above the user's plan"""
+
+class InvalidQuota(ValueError):
+    """A requested override is not a valid quota"""
+
+def quota_error(quota: Dict[str, str]) -> Optional[str]:
+    """
+    Why a complete quota is invalid
+
+    Returns:
+        None if every field is a positive quantity and no request is above its limit
+    """
+    for field in QUOTA_FIELDS:
+        value = parse_resource_string(quota.get(field))
+        if value is None or value <= 0:
+            return f"invalid quantity for {field}: {quota.get(field)}"
+    for resource in ("cpu", "memory"):
+        if parse_resource_string(quota[f"{resource}_request"]) > parse_resource_string(quota[f"{resource}_limit"]):
+            return (
+                f"{resource}_request={quota[f'{resource}_request']} is above "
+                f"{resource}_limit={quota[f'{resource}_limit']}"
+            )
+    return None
+
+def settings_quota() -> Dict[str, str]:
+    """Quota from the DEFAULT_* settings, used when no plan applies"""
+    return {
+        "cpu_request": settings.default_cpu_request,
+        "cpu_limit": settings.default_cpu_limit,
+        "memory_request": settings.default_memory_request,
+        "memory_limit": settings.default_memory_limit,
+        "storage": settings.default_storage_size
+    }
+
+class QuotaCache:
+    """In-memory copy of the quota tables, reloaded when their version changes"""
+
+    def __init__(self, db_manager, default_plan: str = "default"):
+        """
+        Initialize cache
+
+        Args:
+            db_manager: DatabaseManager (MySQL)
+            default_plan: Plan of users without an assignment
+        """
+        self.db = db_manager
+        self.default_plan = default_plan
+        self.version: Optional[int] = None
+        # Replaced as a whole on reload, so lookups need no lock
+        self._tables: Tuple[Dict[str, Dict[str, str]], Dict[str, str]] = ({}, {})
+        self._reload_lock = threading.Lock()
+        self._warned_missing = False
+
+    def refresh(self) -> bool:
+        """
+        Reload the tables if their version changed (blocking)
+
+        Returns:
+            True if the tables were reloaded
+        """
+        with self._reload_lock:
+            version = self.db.get_quota_version()
+            if version is None:
+                quota_reloads_counter.labels(outcome="missing").inc()
+                if self.version is not None or not self._warned_missing:
+                    logger.warning("Quota tables not installed, using default resource limits")
+                    self._warned_missing = True
+                self._tables, self.version = ({}, {}), None
+                return False
+            if version == self.version:
+                quota_reloads_counter.labels(outcome="unchanged").inc()
+                return False
+
+            # Read after the version: a change in between is picked up again on the next check
+            plans, assignments = self.db.load_quotas()
+            for name, plan in list(plans.items()):
+                error = quota_error({**settings_quota(), **{f: v for f, v in plan.items() if f in QUOTA_FIELDS and v}})
+                if error:
+                    logger.error(f"Skipping quota plan '{name}': {error}")
+                    del plans[name]
+            self._tables = (plans, assignments)
+            previous, self.version = self.version, version
+            quota_version_gauge.set(version)
+            quota_reloads_counter.labels(outcome="reloaded").inc()
+        logger.info(
+            f"Loaded quota tables version {version} (was {previous}): "
+            f"{len(plans)} plans, {len(assignments)} user assignments"
+        )
+        return True
+
+    def plan_for(self, user_id: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Plan of a user, from memory
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            (plan name, quota dict); the DEFAULT_* settings fill in whatever
+            the plan does not define
+        """
+        plans, assignments = self._tables
+        name = assignments.get(str(user_id), self.default_plan)
+        plan = plans.get(name)
+        if plan is None and name != self.default_plan:
+            logger.warning(f"User {user_id} is assigned unknown plan {name}, using {self.default_plan}")
+            name = self.default_plan
+            plan = plans.get(name)
+        quota = settings_quota()
+        quota.update({field: plan[field] for field in QUOTA_FIELDS if plan and plan.get(field)})
+        return name, quota
+
+    def resolve(self, user_id: str, override: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Effective quota of a new pod: the user's plan, lowered by the override
+
+        Args:
+            user_id: User identifier
+            override: Requested values (any of QUOTA_FIELDS)
+
+        Returns:
+            Quota dict with every field of QUOTA_FIELDS
+
+        Raises:
+            InvalidQuota: Unknown field, unparseable quantity, or a request above its limit
+            QuotaExceeded: A requested value is above the plan
+        """
+        name, quota = self.plan_for(user_id)
+        for field, value in (override or {}).items():
+            if field not in QUOTA_FIELDS:
+                raise InvalidQuota(f"Unknown resource quota field: {field}")
+            requested = parse_resource_string(value)
+            if requested is None or requested <= 0:
+                raise InvalidQuota(f"Invalid quantity for {field}: {value}")
+            ceiling = parse_resource_string(quota[field])
+            if ceiling is not None and requested > ceiling:
+                quota_rejections_counter.labels(plan=name).inc()
+                raise QuotaExceeded(f"{field}={value} exceeds plan '{name}' ({field}={quota[field]})")
+            quota[field] = value
+
+        error = quota_error(quota)
+        if error:
+            raise InvalidQuota(error)
+        return quota
+
+    def status(self) -> Dict[str, Any]:
+        """Loaded version, plans and number of assigned users per plan"""
+        plans, assignments = self._tables
+        users: Dict[str, int] = {}
+        for name in assignments.values():
+            users[name] = users.get(name, 0) + 1
+        return {
+            "version": self.version,
+            "default_plan": self.default_plan,
+            "plans": {name: {**plan, "users": users.get(name, 0)} for name, plan in sorted(plans.items())}
+        }
@@ -0,0 +1,179 @@
+"""
+Leader-elected reconciler that reclaims stale environments
+
+Runs in every worker but only acts while its LeaderElector holds the
+lease. Progress lives in Redis rather than in the leader's memory:
+
+- cleanup:last_run    - when the last plan was made (schedule survives failover)
+- cleanup:pending     - user IDs still to reclaim in the current run
+- cleanup:claim:{id}  - short-lived claim taken before deleting one environment
+
+A new leader first drains cleanup:pending left by its predecessor, and
+every item is re-checked against the registry under a claim before it is
+deleted, so nothing is deleted twice. Deletions run with bounded
+concurrency behind a token-bucket rate limit toward the apiserver.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from prometheus_client import Counter
+
+from app.core.events import emit_event
+from app.core.leader_election import LeaderElector
+from app.core.pod_manager import PodManager
+from app.utils.rate_limiter import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
+LAST_RUN_KEY = "cleanup:last_run"
+PENDING_KEY = "cleanup:pending"
+ATTEMPTS_KEY = "cleanup:attempts"
+CLAIM_PREFIX = "cleanup:claim:"
+
+stale_reclaimed_counter = Counter(
+    'vnc_stale_environments_reclaimed_total', 'Stale environments deleted by the reconciler'
+)
+
+class StaleEnvironmentReconciler:
+    """Periodically delete environments older than max_age_hours"""
+
+    def __init__(self, pod_manager: PodManager, elector: LeaderElector, interval: float = 3600,
+                 max_age_hours: int = 24, concurrency: int = 4, rate_per_second: float = 2.0,
+                 max_attempts: int = 3, poll_interval: float = 30):
+        """
+        Initialize reconciler
+
+        Args:
+            pod_manager: PodManager used to find and delete environments
+            elector: Leader elector gating all work
+            interval: Seconds between reconciliation runs
+            max_age_hours: Environments older than this are reclaimed
+            concurrency: Maximum deletions in flight
+            rate_per_second: Maximum deletions started per second
+            max_attempts: Failed deletions are retried this many times, then dropped
+            poll_interval: Seconds between checks for leadership / due runs
+        """
+        self.pod_manager = pod_manager
+        self.redis = pod_manager.redis
+        self.registry = pod_manager.registry
+        self.elector = elector
+        self.interval = interval
+        self.max_age_hours = max_age_hours
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.max_attempts = max_attempts
+        self.poll_interval = min(poll_interval, interval)
+        self.claim_ttl = 300
+        self.last_result: Dict[str, Any] = {}
+
+    def _plan(self) -> List[str]:
+        """Return pending work, resuming an interrupted run or planning a due one (blocking)"""
+        pending = self.redis.smembers(PENDING_KEY)
+        if pending:
+            logger.info(f"Resuming stale-environment cleanup with {len(pending)} pending")
+            return sorted(pending)
+
+        last_run = self.redis.get(LAST_RUN_KEY)
+        if last_run and time.time() - float(last_run) < self.interval:
+            return []
+        if not self.elector.ensure_leader():
+            return []
+
+        candidates = self.pod_manager.find_stale_environments(self.max_age_hours)
+        pipe = self.redis.pipeline()
+        pipe.set(LAST_RUN_KEY, time.time())
+        pipe.delete(ATTEMPTS_KEY)
+        if candidates:
+            pipe.sadd(PENDING_KEY, *candidates)
+        pipe.execute()
+        logger.info(f"Planned stale-environment cleanup: {len(candidates)} candidates")
+        return candidates
+
+    def _reclaim(self, user_id: str) -> str:
+        """Re-check and delete one environment (blocking); returns the outcome"""
+        if not self.elector.ensure_leader():
+            return "not_leader"
+
+        claim_key = f"{CLAIM_PREFIX}{user_id}"
+        if not self.redis.set(claim_key, self.elector.identity, nx=True, ex=self.claim_ttl):
+            return "claimed"
+
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=self.max_age_hours)
+            if not self.pod_manager.is_stale(self.registry.get(user_id), cutoff):
+                # Already deleted (e.g. by a previous leader) or recreated since planning
+                self.redis.srem(PENDING_KEY, user_id)
+                return "skipped"
+
+            try:
+                self.pod_manager.delete_user_environment(user_id, keep_data=True)
+            except Exception as e:
+                attempts = self.redis.hincrby(ATTEMPTS_KEY, user_id, 1)
+                logger.warning(f"Failed to reclaim environment of {user_id} (attempt {attempts}): {e}")
+                if attempts >= self.max_attempts:
+                    self.redis.srem(PENDING_KEY, user_id)
+                return "failed"
+
+            self.redis.srem(PENDING_KEY, user_id)
+            stale_reclaimed_counter.inc()
+            emit_event(user_id, "stale_reclaimed", max_age_hours=self.max_age_hours)
+            return "deleted"
+        finally:
+            self.redis.delete(claim_key)
+
+    async def reconcile_once(self) -> Dict[str, int]:
+        """
+        Run (or resume) one reconciliation pass if this worker is the leader
+
+        Returns:
+            Count of outcomes (deleted, skipped, failed, ...)
+        """
+        if not self.elector.is_leader:
+            return {}
+        pending = await asyncio.to_thread(self._plan)
+        if not pending:
+            return {}
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AsyncRateLimiter(self.rate_per_second, burst=self.concurrency)
+        outcomes: Dict[str, int] = {}
+
+        async def handle(user_id: str):
+            async with semaphore:
+                await limiter.acquire()
+                if not self.elector.is_leader:
+                    outcome = "not_leader"
+                else:
+                    outcome = await asyncio.to_thread(self._reclaim, user_id)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+        await asyncio.gather(*(handle(user_id) for user_id in pending))
+        logger.info(f"Stale-environment cleanup pass finished: {outcomes}")
+        self.last_result = {"finished_at": datetime.now(timezone.utc).isoformat(), "outcomes": outcomes}
+        return outcomes
+
+    async def run(self):
+        """Reconcile on schedule until cancelled"""
+        while True:
+            try:
+                await self.reconcile_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stale-environment reconciliation failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def status(self) -> Dict[str, Any]:
+        """Schedule and progress for monitoring"""
+        last_run = self.redis.get(LAST_RUN_KEY)
+        return {
+            "interval_seconds": self.interval,
+            "max_age_hours": self.max_age_hours,
+            "last_run": datetime.fromtimestamp(float(last_run), timezone.utc).isoformat() if last_run else None,
+            "pending": self.redis.scard(PENDING_KEY),
+            "last_result": self.last_result
+        }
@@ -153,8 +153,16 @@ class RedisConnectionPool:
         return cls._instance
     
     @classmethod
-    def get_client(cls, host: str, port: int, db: int = 0, password: Optional[str] = None) -> redis.Redis:
-        """Get or create Redis client with connection pooling"""
+    def get_client(cls, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                   ping: bool = True, max_connections: int = 50) -> redis.Redis:
+        """
+        Get or create Redis client with connection pooling
+        
+        Connections are opened lazily; pass ping=False to skip the initial
+        connectivity check (startup verifies it in the background instead).
+        max_connections is the per-process budget, so the total per replica
+        is max_connections x workers.
+        """
         if cls._redis_client is None:
             pool = redis.ConnectionPool(
                 host=host,
@@ -162,17 +170,18 @@ class RedisConnectionPool:
                 db=db,
                 password=password,
                 decode_responses=True,
-                max_connections=50,
+                max_connections=max_connections,
                 socket_keepalive=True
             )
             cls._redis_client = redis.Redis(connection_pool=pool)
             
             # Test connection
-            try:
-                cls._redis_client.ping()
-                logger.info("Redis connection established")
-            except redis.ConnectionError as e:
-                logger.error(f"Failed to connect to Redis: {e}")
-                raise
+            if ping:
+                try:
+                    cls._redis_client.ping()
+                    logger.info("Redis connection established")
+                except redis.ConnectionError as e:
+                    logger.error(f"Failed to connect to Redis: {e}")
+                    raise
         
         return cls._redis_client
\ No newline at end of file
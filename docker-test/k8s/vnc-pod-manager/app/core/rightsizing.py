@@ -0,0 +1,400 @@
+"""
+Usage-based right-sizing of VNC pod requests and limits
+
+Every pod gets its plan's requests and limits, while most desktops idle
+at a fraction of them. The leader samples CPU and memory of all VNC pods
+from metrics-server (one list call per interval) into per-user ring
+buffers of unsigned 16-bit values (millicores and MiB), so a day of
+minute samples costs under 6 KB per user. The buffers are persisted to
+Redis on every recompute pass and reloaded when a worker becomes leader.
+
+From the percentiles of those samples it recommends, per user:
+
+- cpu_request: p90 plus headroom (CPU is compressible; the limit stays
+  at the plan's value so bursts are throttled, never killed)
+- memory_request: p95 plus headroom
+- memory_limit: the observed maximum plus twice the headroom
+
+Recommendations only ever lower the plan's values and need a minimum
+number of samples. A user whose container was OOM-killed gets no
+recommendation for a cooldown period. With RIGHTSIZING_AUTO_APPLY the
+recommendation replaces the plan defaults on the user's next create (an
+explicit resource_quota in the request still wins).
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from kubernetes import client
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.core.quotas import InvalidQuota, QuotaExceeded
+from app.utils.helpers import parse_resource_string
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_KEY = "rightsizing:samples"
+RECOMMENDATIONS_KEY = "rightsizing:recommendations"
+OOM_KEY = "rightsizing:oom"
+
+# Fields a recommendation may lower; cpu_limit and storage keep the plan's value
+APPLIED_FIELDS = ("cpu_request", "memory_request", "memory_limit")
+
+_MIB = 1024 ** 2
+_MIN_CPU_MILLICORES = 100
+_MIN_MEMORY_REQUEST_MIB = 256
+_MIN_MEMORY_LIMIT_MIB = 1024
+_CPU_STEP_MILLICORES = 50
+_MEMORY_STEP_MIB = 64
+_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+rightsizing_recommendations_gauge = Gauge(
+    'vnc_rightsizing_recommendations', 'Users with a right-sizing recommendation',
+    multiprocess_mode='livemostrecent'
+)
+rightsizing_applied_counter = Counter(
+    'vnc_rightsizing_applied_total', 'Creates that used a right-sized quota'
+)
+rightsizing_oom_counter = Counter(
+    'vnc_rightsizing_oom_kills_total', 'VNC containers OOM-killed (suspends right-sizing for the user)'
+)
+
+class RingBuffer:
+    """Fixed-capacity circular buffer of unsigned 16-bit samples"""
+
+    __slots__ = ("capacity", "values", "next")
+
+    def __init__(self, capacity: int, data: bytes = b""):
+        """
+        Initialize buffer
+
+        Args:
+            capacity: Maximum number of samples kept
+            data: Samples from to_bytes(), oldest first
+        """
+        self.capacity = capacity
+        self.values = array("H")
+        self.values.frombytes(data)
+        if len(self.values) > capacity:
+            del self.values[:len(self.values) - capacity]
+        self.next = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, value: float):
+        value = min(max(int(round(value)), 0), 0xFFFF)
+        if len(self.values) < self.capacity:
+            self.values.append(value)
+        else:
+            self.values[self.next] = value
+            self.next = (self.next + 1) % self.capacity
+
+    def to_bytes(self) -> bytes:
+        """Samples oldest first"""
+        return (self.values[self.next:] + self.values[:self.next]).tobytes()
+
+def percentiles(values: Iterable[int], quantiles=_QUANTILES) -> Dict[str, int]:
+    """Nearest-rank percentiles and the maximum of samples"""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    result = {f"p{round(q * 100):g}": ordered[max(0, math.ceil(q * len(ordered)) - 1)] for q in quantiles}
+    result["max"] = ordered[-1]
+    return result
+
+def _round_up(value: float, step: int) -> int:
+    return int(math.ceil(value / step) * step)
+
+class _UserSamples:
+    __slots__ = ("cpu", "memory", "last_sample")
+
+    def __init__(self, capacity: int, cpu: bytes = b"", memory: bytes = b"", last_sample: float = 0.0):
+        self.cpu = RingBuffer(capacity, cpu)
+        self.memory = RingBuffer(capacity, memory)
+        self.last_sample = last_sample
+
+class RightSizer:
+    """Leader-side sampler and recommender; recommendations are read by every worker"""
+
+    def __init__(self, k8s_manager, redis_client, elector, quotas, interval: float = 60,
+                 window_samples: int = 1440, min_samples: int = 360, headroom: float = 0.2,
+                 recompute_interval: float = 600, oom_cooldown_hours: float = 168,
+                 retention_days: float = 14):
+        """
+        Initialize right-sizer
+
+        Args:
+            k8s_manager: K8sManager
+            redis_client: Redis client (buffers, recommendations, OOM marks)
+            elector: LeaderElector gating sampling
+            quotas: QuotaCache; recommendations never exceed the user's plan
+            interval: Seconds between metrics-server samples
+            window_samples: Samples kept per user and resource
+            min_samples: Samples needed before recommending
+            headroom: Fraction added on top of the observed percentiles
+            recompute_interval: Seconds between recommendation passes (buffers persisted then)
+            oom_cooldown_hours: Hours without recommendations after an OOM kill
+            retention_days: Users without samples for this long are forgotten
+        """
+        self.k8s = k8s_manager
+        self.redis = redis_client
+        self.elector = elector
+        self.quotas = quotas
+        self.interval = interval
+        self.window_samples = window_samples
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.recompute_interval = recompute_interval
+        self.oom_cooldown_seconds = oom_cooldown_hours * 3600
+        self.retention_seconds = retention_days * 86400
+        self.custom = client.CustomObjectsApi(k8s_manager.v1.api_client)
+        self._users: Dict[str, _UserSamples] = {}
+        self._loaded = False
+        self.last_recompute: Optional[Dict[str, Any]] = None
+
+    # Sampling (leader)
+
+    def _load(self):
+        """Restore the persisted buffers (on becoming leader)"""
+        self._users = {}
+        for user_id, raw in (self.redis.hgetall(SAMPLES_KEY) or {}).items():
+            try:
+                stored = json.loads(raw)
+                self._users[user_id] = _UserSamples(
+                    self.window_samples,
+                    base64.b64decode(stored["cpu"]),
+                    base64.b64decode(stored["memory"]),
+                    stored.get("last_sample", 0.0)
+                )
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Discarding unreadable right-sizing samples of user {user_id}: {e}")
+        self._loaded = True
+        logger.info(f"Loaded right-sizing samples of {len(self._users)} users")
+
+    def sample_once(self) -> int:
+        """
+        Record CPU and memory of every VNC pod (blocking, leader only)
+
+        Returns:
+            Number of pods sampled
+        """
+        if not self._loaded:
+            self._load()
+        metrics = self.custom.list_namespaced_custom_object(
+            "metrics.k8s.io", "v1beta1", settings.k8s_namespace_pods, "pods",
+            label_selector="managed-by=vnc-manager"
+        )
+        now = time.time()
+        sampled = 0
+        for item in metrics.get("items", []):
+            metadata = item.get("metadata") or {}
+            user_id = (metadata.get("labels") or {}).get("user")
+            if not user_id or metadata.get("name") != f"vnc-{user_id}":
+                continue
+            usage = [c.get("usage") or {} for c in item.get("containers") or []]
+            cpu = sum(parse_resource_string(u.get("cpu")) or 0.0 for u in usage)
+            memory = sum(parse_resource_string(u.get("memory")) or 0.0 for u in usage)
+            samples = self._users.get(user_id)
+            if samples is None:
+                samples = self._users[user_id] = _UserSamples(self.window_samples)
+            samples.cpu.append(cpu * 1000)
+            samples.memory.append(memory / _MIB)
+            samples.last_sample = now
+            sampled += 1
+        return sampled
+
+    # Recommendations
+
+    def recommend(self, user_id: str, samples: _UserSamples) -> Optional[Dict[str, Any]]:
+        """
+        Recommendation for one user from their samples
+
+        Returns:
+            Recommended APPLIED_FIELDS with the percentiles they came from, or
+            None with too few samples
+        """
+        if len(samples.cpu) < self.min_samples:
+            return None
+        cpu = percentiles(samples.cpu.values)
+        memory = percentiles(samples.memory.values)
+        _, plan = self.quotas.plan_for(user_id)
+        plan_mib = {field: (parse_resource_string(plan[field]) or 0) / _MIB for field in ("memory_request", "memory_limit")}
+
+        cpu_request = max(_MIN_CPU_MILLICORES, _round_up(cpu["p90"] * (1 + self.headroom), _CPU_STEP_MILLICORES))
+        cpu_request = min(cpu_request, int((parse_resource_string(plan["cpu_request"]) or 0) * 1000))
+        memory_limit = max(_MIN_MEMORY_LIMIT_MIB, _round_up(memory["max"] * (1 + 2 * self.headroom), _MEMORY_STEP_MIB))
+        memory_limit = min(memory_limit, int(plan_mib["memory_limit"]))
+        memory_request = max(_MIN_MEMORY_REQUEST_MIB, _round_up(memory["p95"] * (1 + self.headroom), _MEMORY_STEP_MIB))
+        memory_request = min(memory_request, int(plan_mib["memory_request"]), memory_limit)
+
+        return {
+            "cpu_request": f"{cpu_request}m",
+            "memory_request": f"{memory_request}Mi",
+            "memory_limit": f"{memory_limit}Mi",
+            "samples": len(samples.cpu),
+            "usage": {"cpu_millicores": cpu, "memory_mib": memory},
+            "computed_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    def recompute_once(self) -> Dict[str, Any]:
+        """
+        Recompute all recommendations and persist the buffers (blocking, leader only)
+
+        Returns:
+            Counts of users sampled, recommended, suspended after OOM and forgotten
+        """
+        if not self._loaded:
+            self._load()
+        now = time.time()
+        oom = {user_id: float(at) for user_id, at in (self.redis.hgetall(OOM_KEY) or {}).items()}
+        expired = [user_id for user_id, s in self._users.items() if now - s.last_sample > self.retention_seconds]
+        for user_id in expired:
+            del self._users[user_id]
+
+        recommendations = {}
+        suspended = 0
+        for user_id, samples in self._users.items():
+            if now - oom.get(user_id, 0.0) < self.oom_cooldown_seconds:
+                suspended += 1
+                continue
+            recommendation = self.recommend(user_id, samples)
+            if recommendation:
+                recommendations[user_id] = json.dumps(recommendation)
+
+        if not self.elector.ensure_leader():
+            return {}
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(SAMPLES_KEY, RECOMMENDATIONS_KEY)
+        if self._users:
+            pipe.hset(SAMPLES_KEY, mapping={
+                user_id: json.dumps({
+                    "cpu": base64.b64encode(s.cpu.to_bytes()).decode(),
+                    "memory": base64.b64encode(s.memory.to_bytes()).decode(),
+                    "last_sample": s.last_sample
+                })
+                for user_id, s in self._users.items()
+            })
+        if recommendations:
+            pipe.hset(RECOMMENDATIONS_KEY, mapping=recommendations)
+        expired_oom = [user_id for user_id, at in oom.items() if now - at >= self.oom_cooldown_seconds]
+        if expired_oom:
+            pipe.hdel(OOM_KEY, *expired_oom)
+        pipe.execute()
+
+        rightsizing_recommendations_gauge.set(len(recommendations))
+        report = {
+            "users": len(self._users),
+            "recommended": len(recommendations),
+            "suspended_after_oom": suspended,
+            "forgotten": len(expired)
+        }
+        self.last_recompute = {"recomputed_at": datetime.now(timezone.utc).isoformat(), **report}
+        logger.info(f"Right-sizing pass: {report}")
+        return report
+
+    async def run(self):
+        """Sample and recompute on schedule until cancelled"""
+        last_recompute = time.monotonic()
+        while True:
+            if self.elector.is_leader:
+                try:
+                    await asyncio.to_thread(self.sample_once)
+                    if time.monotonic() - last_recompute >= self.recompute_interval:
+                        last_recompute = time.monotonic()
+                        await asyncio.to_thread(self.recompute_once)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Right-sizing pass failed: {e}")
+            else:
+                # Another worker may sample meanwhile; reload its buffers if leadership returns
+                self._loaded = False
+            await asyncio.sleep(self.interval)
+
+    # OOM guard
+
+    def on_pod(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        """Pod informer handler: suspend right-sizing for users whose container was OOM-killed"""
+        if event_type != "MODIFIED" or not old or not self.elector.is_leader:
+            return
+        user_id = ((pod.get("metadata") or {}).get("labels") or {}).get("user")
+        if not user_id:
+            return
+        restarts = {c.get("name"): c.get("restartCount", 0) for c in (old.get("status") or {}).get("containerStatuses") or []}
+        for status in (pod.get("status") or {}).get("containerStatuses") or []:
+            terminated = (status.get("lastState") or {}).get("terminated") or {}
+            if terminated.get("reason") == "OOMKilled" and status.get("restartCount", 0) > restarts.get(status.get("name"), 0):
+                rightsizing_oom_counter.inc()
+                self.redis.hset(OOM_KEY, user_id, time.time())
+                self.redis.hdel(RECOMMENDATIONS_KEY, user_id)
+                logger.warning(f"Container of user {user_id} was OOM-killed; right-sizing suspended")
+                return
+
+    # Reads (any worker)
+
+    def recommendation(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Stored recommendation of a user (blocking)"""
+        raw = self.redis.hget(RECOMMENDATIONS_KEY, user_id)
+        return json.loads(raw) if raw else None
+
+    def recommended_quota(self, user_id: str) -> Optional[Dict[str, str]]:
+        """
+        The user's plan lowered to the recommendation (blocking)
+
+        Returns:
+            Quota dict, or None without a recommendation or when it no longer
+            fits the plan (the plan changed since it was computed)
+        """
+        try:
+            recommendation = self.recommendation(user_id)
+        except Exception as e:
+            logger.warning(f"Right-sizing recommendation unavailable for user {user_id}: {e}")
+            return None
+        if not recommendation:
+            return None
+        try:
+            quota = self.quotas.resolve(user_id, {field: recommendation[field] for field in APPLIED_FIELDS})
+        except (QuotaExceeded, InvalidQuota, KeyError):
+            return None
+        rightsizing_applied_counter.inc()
+        return quota
+
+    def status(self, user_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Recommendations compared with the users' plans (blocking)
+
+        Args:
+            user_ids: Users to include in detail (all when None)
+        """
+        stored = self.redis.hgetall(RECOMMENDATIONS_KEY) or {}
+        saved = {"cpu_millicores": 0, "memory_mib": 0}
+        users = {}
+        for user_id, raw in stored.items():
+            recommendation = json.loads(raw)
+            _, plan = self.quotas.plan_for(user_id)
+            saved["cpu_millicores"] += int(round(
+                ((parse_resource_string(plan["cpu_request"]) or 0) - parse_resource_string(recommendation["cpu_request"])) * 1000
+            ))
+            saved["memory_mib"] += int(round(
+                ((parse_resource_string(plan["memory_request"]) or 0) - parse_resource_string(recommendation["memory_request"])) / _MIB
+            ))
+            if user_ids is None or user_id in user_ids:
+                users[user_id] = {**recommendation, "plan": {field: plan[field] for field in APPLIED_FIELDS}}
+        return {
+            "recommended_users": len(stored),
+            "suspended_after_oom": self.redis.hlen(OOM_KEY),
+            "requests_saved": saved,
+            "auto_apply": settings.rightsizing_auto_apply,
+            "sampled_users": len(self._users) if self._loaded else None,
+            "last_recompute": self.last_recompute,
+            "users": users
+        }
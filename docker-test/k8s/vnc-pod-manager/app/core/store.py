@@ -0,0 +1,274 @@
+"""
+PostgreSQL store for environment history, lifecycle events and sessions
+
+Environment and session writes are queued and flushed in batches by a
+background thread (app.core.batch_writer), and lifecycle events arrive in
+bulk from the event pipeline (app.core.events), so request handlers and
+the informer never wait on the database. Admin statistics are answered from indexed tables
+instead of scanning Redis or listing pods on the apiserver.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.core.batch_writer import BatchWriter
+from app.core.k8s_projection import parse_time, pod_ready_time
+from app.models.tables import Environment, LifecycleEvent, Session
+
+logger = logging.getLogger(__name__)
+
+# Columns never overwritten when an environment row already exists
+_INSERT_ONLY_COLUMNS = {"pod_uid", "user_id", "created_at"}
+
+def database_url() -> str:
+    """SQLAlchemy URL built from the db_* settings"""
+    return (
+        f"postgresql+psycopg2://{quote_plus(settings.db_user)}:{quote_plus(settings.db_password)}"
+        f"@{settings.db_host}:{settings.db_port}/{settings.db_name}"
+    )
+
+class EnvironmentStore:
+    """Batched writer and admin queries over the PostgreSQL history tables"""
+
+    def __init__(self, url: Optional[str] = None):
+        """
+        Initialize store (no connection is opened until the first flush or query)
+
+        Args:
+            url: SQLAlchemy database URL (defaults to the db_* settings)
+        """
+        self.engine = create_engine(
+            url or database_url(),
+            pool_size=settings.db_pool_size,
+            max_overflow=0,
+            pool_pre_ping=True
+        )
+        self.writer = BatchWriter(
+            "store",
+            self._write_batch,
+            max_queue=settings.db_queue_size,
+            batch_size=settings.db_batch_size,
+            flush_interval=settings.db_flush_interval
+        )
+
+    def start(self):
+        """Start the background writer"""
+        self.writer.start()
+
+    def close(self):
+        """Flush queued writes and release pooled connections"""
+        self.writer.stop()
+        self.engine.dispose()
+
+    def ping(self):
+        """Check database connectivity (raises on failure)"""
+        with self.engine.connect() as conn:
+            conn.execute(select(1))
+
+    def insert_events(self, rows: List[Dict[str, Any]]):
+        """
+        Insert lifecycle events with one multi-row INSERT (blocking)
+
+        Called from the lifecycle event pipeline thread (app.core.events).
+
+        Args:
+            rows: Event rows (user_id, pod_uid, event_type, phase, occurred_at, details)
+        """
+        if not rows:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(pg_insert(LifecycleEvent).values(rows))
+
+    # Write API (non-blocking)
+
+    def upsert_environment(self, pod_uid: str, **fields) -> bool:
+        """
+        Queue an insert-or-update of an environment row keyed by pod UID
+
+        Inserting requires user_id, pod_name and created_at; later updates
+        only need the changed columns.
+
+        Args:
+            pod_uid: Pod UID
+            **fields: Environment columns to set
+
+        Returns:
+            False if the write was dropped because the queue is full
+        """
+        fields["pod_uid"] = pod_uid
+        return self.writer.submit(("environment", fields))
+
+    def open_session(self, user_id: str, pod_uid: str, started_at: datetime) -> bool:
+        """Queue the start of a session (idempotent per pod)"""
+        return self.writer.submit(("session_open", {
+            "user_id": user_id,
+            "pod_uid": pod_uid,
+            "started_at": started_at
+        }))
+
+    def close_session(self, pod_uid: str, ended_at: Optional[datetime] = None) -> bool:
+        """Queue the end of the open session of a pod"""
+        return self.writer.submit(("session_close", {
+            "pod_uid": pod_uid,
+            "ended_at": ended_at or datetime.now(timezone.utc)
+        }))
+
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Flush one batch in a single transaction using multi-row statements"""
+        environments: Dict[str, Dict[str, Any]] = {}
+        sessions_opened = {}
+        sessions_closed = {}
+
+        for op, row in batch:
+            if op == "environment":
+                # Coalesce several updates of the same pod into one row
+                environments.setdefault(row["pod_uid"], {}).update(row)
+            elif op == "session_open":
+                sessions_opened.setdefault(row["pod_uid"], row)
+            elif op == "session_close":
+                sessions_closed[row["pod_uid"]] = row
+
+        with self.engine.begin() as conn:
+            # executemany needs identical keys, so group rows by column set
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            for row in environments.values():
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            for columns, rows in groups.items():
+                stmt = pg_insert(Environment).values(rows)
+                update_columns = {
+                    column: stmt.excluded[column]
+                    for column in columns if column not in _INSERT_ONLY_COLUMNS
+                }
+                update_columns["updated_at"] = func.now()
+                conn.execute(stmt.on_conflict_do_update(index_elements=["pod_uid"], set_=update_columns))
+
+            if sessions_opened:
+                conn.execute(
+                    pg_insert(Session).values(list(sessions_opened.values()))
+                    .on_conflict_do_nothing(index_elements=["pod_uid"])
+                )
+
+            for row in sessions_closed.values():
+                conn.execute(
+                    update(Session)
+                    .where(Session.pod_uid == row["pod_uid"], Session.ended_at.is_(None))
+                    .values(ended_at=row["ended_at"])
+                )
+
+        logger.debug(
+            f"Store flushed {len(environments)} environments, "
+            f"{len(sessions_opened) + len(sessions_closed)} session updates"
+        )
+
+    # Admin queries
+
+    def pods_per_day(self, days: int = 30, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Count created environments per day
+
+        Args:
+            days: Number of days to look back
+            user_id: Optional user filter (served by the (user_id, created_at) index)
+
+        Returns:
+            List of {"day", "count"} ordered by day
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        day = func.date_trunc("day", Environment.created_at).label("day")
+        stmt = select(day, func.count().label("count")).where(Environment.created_at >= since)
+        if user_id:
+            stmt = stmt.where(Environment.user_id == user_id)
+        stmt = stmt.group_by(day).order_by(day)
+
+        with self.engine.connect() as conn:
+            return [{"day": row.day.date().isoformat(), "count": row.count} for row in conn.execute(stmt)]
+
+    def cold_start_stats(self, days: int = 7) -> Dict[str, Any]:
+        """
+        Cold-start time (pod creation -> Ready) statistics
+
+        Args:
+            days: Number of days to look back
+
+        Returns:
+            Count, average, p50 and p95 in seconds
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        seconds = Environment.cold_start_seconds
+        stmt = select(
+            func.count(seconds).label("count"),
+            func.avg(seconds).label("avg"),
+            func.percentile_cont(0.5).within_group(seconds).label("p50"),
+            func.percentile_cont(0.95).within_group(seconds).label("p95")
+        ).where(Environment.created_at >= since, seconds.is_not(None))
+
+        with self.engine.connect() as conn:
+            row = conn.execute(stmt).one()
+        return {
+            "days": days,
+            "count": row.count,
+            "avg_seconds": round(row.avg, 3) if row.avg is not None else None,
+            "p50_seconds": round(row.p50, 3) if row.p50 is not None else None,
+            "p95_seconds": round(row.p95, 3) if row.p95 is not None else None
+        }
+
+    def environments_by_phase(self) -> Dict[str, int]:
+        """
+        Count live (not deleted) environments per phase
+
+        Returns:
+            Mapping of phase -> count
+        """
+        stmt = (
+            select(Environment.phase, func.count().label("count"))
+            .where(Environment.deleted_at.is_(None))
+            .group_by(Environment.phase)
+        )
+        with self.engine.connect() as conn:
+            return {row.phase or "Unknown": row.count for row in conn.execute(stmt)}
+
+class StoreSync:
+    """Informer handler that records environment history from pod changes"""
+
+    def __init__(self, store: EnvironmentStore):
+        self.store = store
+
+    def __call__(self, event_type: str, pod: Dict[str, Any], old: Optional[Dict[str, Any]]):
+        metadata = pod.get("metadata") or {}
+        pod_uid = metadata.get("uid")
+        user_id = (metadata.get("labels") or {}).get("user")
+        if not pod_uid or not user_id:
+            return
+
+        created_at = parse_time(metadata.get("creationTimestamp"))
+        base = {"user_id": user_id, "pod_name": metadata.get("name"), "created_at": created_at}
+        if event_type == "DELETED":
+            now = datetime.now(timezone.utc)
+            self.store.upsert_environment(pod_uid, phase="Deleted", deleted_at=now, **base)
+            self.store.close_session(pod_uid, now)
+            return
+
+        phase = (pod.get("status") or {}).get("phase")
+        node_name = (pod.get("spec") or {}).get("nodeName")
+        old_status = (old or {}).get("status") or {}
+        old_node = ((old or {}).get("spec") or {}).get("nodeName")
+
+        fields = {}
+        if old is None or phase != old_status.get("phase") or node_name != old_node:
+            fields.update(phase=phase, node_name=node_name)
+
+        ready_at = pod_ready_time(pod)
+        if ready_at and not pod_ready_time(old):
+            fields["ready_at"] = ready_at
+            if created_at:
+                fields["cold_start_seconds"] = (ready_at - created_at).total_seconds()
+            self.store.open_session(user_id, pod_uid, ready_at)
+
+        if fields:
+            self.store.upsert_environment(pod_uid, **base, **fields)
@@ -3,19 +3,22 @@
 from typing import Optional, Dict, Any, List
 import hashlib
 import logging
+import random
 from datetime import datetime, timezone
 import json
-from app.config import settings
 from app.core.database import get_db_manager
+from app.core.quotas import settings_quota
 
 logger = logging.getLogger(__name__)
 
 class TokenManager:
     """Token management for user authentication using MySQL database"""
     
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, quotas=None):
         self.redis_client = redis_client
         self.db_manager = get_db_manager()
+        # QuotaCache resolving resource quotas in memory (app.core.quotas)
+        self.quotas = quotas
         # Token prefix for identification
         self.token_prefix = "sk-"
         
@@ -85,7 +88,6 @@ class TokenManager:
             "nickname": user_data.get("nickname", ""),
             "token_hash": token_hash,
             "permissions": ["vnc", "ssh", "novnc"],  # Default permissions
-            "resource_quota": self.db_manager.get_user_resource_quota(user_data["user_id"]),
             "created_at": datetime.now(timezone.utc).isoformat(),
             "is_valid": True,
             "db_user_id": user_data["user_id"]  # Keep original int ID
@@ -96,7 +98,8 @@ class TokenManager:
             try:
                 self.redis_client.setex(
                     f"token:{token_hash}",
-                    3600,  # Cache for 1 hour
+                    # Cache for about 1 hour; jitter keeps keys cached together from expiring together
+                    int(3600 * random.uniform(0.9, 1.1)),
                     json.dumps(user_info)
                 )
                 logger.debug(f"Cached token info for user: {user_info['username']}")
@@ -151,13 +154,9 @@ class TokenManager:
         """
         user_info = self.validate_token(token)
         if user_info:
-            return user_info.get("resource_quota", {
-                "cpu_request": settings.default_cpu_request,
-                "cpu_limit": settings.default_cpu_limit,
-                "memory_request": settings.default_memory_request,
-                "memory_limit": settings.default_memory_limit,
-                "storage": settings.default_storage_size
-            })
+            if self.quotas:
+                return self.quotas.resolve(user_info["user_id"])
+            return settings_quota()
         return None
     
     def has_permission(self, token: str, permission: str) -> bool:
@@ -0,0 +1,138 @@
+"""Background warm-up tasks run after the API starts serving"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class WarmupTask:
+    """State of a single warm-up step"""
+
+    def __init__(self, name: str, func: Callable[[], Any], required: bool = True):
+        self.name = name
+        self.func = func
+        self.required = required
+        self.status = "pending"
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "attempts": self.attempts,
+            "duration_seconds": round(self.duration, 3) if self.duration is not None else None,
+            "error": self.error
+        }
+
+class WarmupTracker:
+    """
+    Run blocking initialization steps off the critical startup path
+
+    Each step runs in a worker thread and is retried with capped exponential
+    backoff until it succeeds, so a dependency that is briefly unavailable
+    at boot (Redis, apiserver) only delays readiness instead of crashing
+    the worker. /ready reports progress from this tracker.
+    """
+
+    def __init__(self, initial_backoff: float = 0.5, max_backoff: float = 30.0):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.started_at = time.monotonic()
+        self._tasks: Dict[str, WarmupTask] = {}
+        self._futures: List[asyncio.Task] = []
+
+    def add(self, name: str, func: Callable[[], Any], required: bool = True):
+        """
+        Register a warm-up step
+
+        Args:
+            name: Step name reported by /ready
+            func: Blocking callable performing the step
+            required: Whether the API is ready only after this step succeeds
+        """
+        self._tasks[name] = WarmupTask(name, func, required)
+
+    def start(self):
+        """Schedule all registered steps on the running event loop"""
+        for task in self._tasks.values():
+            self._futures.append(asyncio.create_task(self._run(task)))
+
+    async def _run(self, task: WarmupTask):
+        backoff = self.initial_backoff
+        task.status = "running"
+        start = time.monotonic()
+        while True:
+            task.attempts += 1
+            try:
+                await asyncio.to_thread(task.func)
+                task.status = "done"
+                task.error = None
+                task.duration = time.monotonic() - start
+                logger.info(f"Warm-up step '{task.name}' finished in {task.duration:.3f}s")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                task.error = str(e)
+                logger.warning(f"Warm-up step '{task.name}' failed (attempt {task.attempts}): {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    async def stop(self):
+        """Cancel any steps still retrying"""
+        for future in self._futures:
+            future.cancel()
+        await asyncio.gather(*self._futures, return_exceptions=True)
+        self._futures.clear()
+
+    def is_done(self, name: str) -> bool:
+        """Check whether a step has completed"""
+        task = self._tasks.get(name)
+        return task is not None and task.status == "done"
+
+    @property
+    def ready(self) -> bool:
+        """True once every required step has completed"""
+        return all(t.status == "done" for t in self._tasks.values() if t.required)
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get warm-up progress
+
+        Returns:
+            Completed/total counts, elapsed time and per-step details
+        """
+        done = sum(1 for t in self._tasks.values() if t.status == "done")
+        return {
+            "completed": done,
+            "total": len(self._tasks),
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "steps": {name: t.to_dict() for name, t in self._tasks.items()}
+        }
+
+async def run_periodically(name: str, func: Callable[[], Any], interval: float,
+                           initial_delay: Optional[float] = None):
+    """
+    Run a blocking refresh function in a worker thread at a fixed interval
+
+    Failures are logged and retried on the next tick. Cancel the task to stop.
+
+    Args:
+        name: Name used in log messages
+        func: Blocking callable
+        interval: Seconds between runs
+        initial_delay: Seconds before the first run (defaults to interval)
+    """
+    await asyncio.sleep(interval if initial_delay is None else initial_delay)
+    while True:
+        try:
+            await asyncio.to_thread(func)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Periodic task '{name}' failed: {e}")
+        await asyncio.sleep(interval)
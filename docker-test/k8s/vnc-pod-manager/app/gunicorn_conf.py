@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for the pre-fork server mode
+
+Usage:
+    gunicorn -c app/gunicorn_conf.py app.main:app
+
+The application is imported once in the master (preload_app), shared
+initialization runs in when_ready, and the heap is frozen before workers
+are forked so imported modules and immutable data stay copy-on-write
+shared. Each worker runs the ASGI lifespan and opens its own Redis and
+apiserver connections, bounded by REDIS_MAX_CONNECTIONS and
+K8S_CONNECTION_POOL_MAXSIZE.
+
+Prometheus metrics run in multiprocess mode: every worker writes its
+samples to files under PROMETHEUS_MULTIPROC_DIR (emptied when the master
+starts) and /metrics aggregates all workers, whichever worker serves the
+scrape. The variable is set here, before the application and
+prometheus_client are imported.
+"""
+
+import logging
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import multiprocess
+
+from app.config import settings
+from app.core.prefork import preload, worker_memory_report
+
+bind = f"{settings.api_host}:{settings.api_port}"
+workers = settings.server_workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+logger = logging.getLogger("gunicorn.error")
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers fork"""
+    preload()
+    report = worker_memory_report()
+    logger.info(f"Master ready, RSS {report['master'].get('rss_mb')} MB; forking {workers} workers")
+
+def post_worker_init(worker):
+    """Log each worker's memory right after it starts"""
+    report = worker_memory_report()
+    current = next((w for w in report["workers"] if w.get("current")), {})
+    logger.info(f"Worker {worker.pid} started: RSS {current.get('rss_mb')} MB, USS {current.get('uss_mb')} MB")
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited"""
+    multiprocess.mark_process_dead(worker.pid)
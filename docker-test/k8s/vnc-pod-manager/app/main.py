@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, BackgroundTasks, Request, Response
+from fastapi import FastAPI, HTTPException, Depends, Header, BackgroundTasks, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from kubernetes.client.rest import ApiException
 from typing import Optional, Dict, Any
+from datetime import datetime
+import asyncio
 import logging
 import json
+import os
 import uvicorn
 from contextlib import asynccontextmanager
 
@@ -13,7 +17,30 @@ from app.core.k8s_ingress import K8sIngressManager
 from app.core.k8s_tcp_proxy import K8sTCPProxyManager
 from app.core.redis_lock import RedisLock, RedisConnectionPool
 from app.core.token_manager import TokenManager
+from app.core.informer import ResourceInformer
+from app.core.environment_registry import EnvironmentRegistry, RegistrySync, status_from_record
+from app.core.store import EnvironmentStore, StoreSync
+from app.core.events import EventPipeline, RedisStreamSink, PostgresSink, PodEventSync, set_event_pipeline
+from app.core.pod_manager import PodManager
+from app.core.provisioning import ProvisioningSaga, ProvisioningError
+from app.core.idempotency import IdempotencyCoalescer, IdempotencyConflict, request_fingerprint
+from app.core.leader_election import LeaderElector
+from app.core.reconciler import StaleEnvironmentReconciler
+from app.core.idle import ActivityProbe, IdleHibernator
+from app.core.garbage_collector import OrphanCollector
+from app.core.image_prepull import ImagePrepuller, RegistryClient
+from app.core.cold_start import ColdStartTracker, phase_percentiles, project_event
+from app.core.pvc_pool import PVCPool, parse_pool_sizes
+from app.core.capacity import CapacityModel, AdmissionRejected, project_node, project_pod
+from app.core.quotas import QuotaCache, QuotaExceeded, InvalidQuota
+from app.core.placement import PlacementPolicies, merge_affinity, parse_policies, required_node_terms
+from app.core.rightsizing import RightSizer
+from app.core.database import get_db_manager
+from app.core.warmup import WarmupTracker, run_periodically
+from app.core.prefork import worker_memory_report
 from app.api.v1 import pods, health, monitor
+from app.utils.cache import SWRCache
+from app.utils.streaming import iter_response_chunks, iter_follow_chunks, iter_ndjson_lines, gzip_stream, accepts_gzip
 
 # Configure logging
 logging.basicConfig(
@@ -28,40 +55,302 @@ ingress_manager = None
 tcp_proxy_manager = None
 redis_client = None
 token_manager = None
+registry = None
+store = None
+events = None
+pod_informer = None
+cold_start = None
+pvc_pool = None
+capacity = None
+capacity_informers = []
+quotas = None
+placement = None
+rightsizer = None
+pod_manager = None
+provisioner = None
+coalescer = None
+token_cache = None
+read_caches = {}
+elector = None
+reconciler = None
+hibernator = None
+collector = None
+prepuller = None
+warmup = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global k8s_manager, ingress_manager, tcp_proxy_manager, redis_client, token_manager
+    global k8s_manager, ingress_manager, tcp_proxy_manager, redis_client, token_manager, registry, store, events, pod_informer
+    global pod_manager, provisioner, coalescer, token_cache, elector, reconciler, hibernator, collector, warmup
+    global prepuller, cold_start, pvc_pool, capacity, quotas, placement, rightsizer
     
     # Startup
     logger.info("Starting VNC Pod Manager API")
     
-    # Initialize K8s client
+    # Critical path: only local work (config load, client objects), no network I/O
     k8s_manager = K8sManager()
-    ingress_manager = K8sIngressManager(k8s_manager)
     tcp_proxy_manager = K8sTCPProxyManager(k8s_manager)
+    ingress_manager = K8sIngressManager(k8s_manager, tcp_proxy=tcp_proxy_manager)
     
-    # Initialize Redis client
+    # Initialize Redis client (connections are opened lazily)
     redis_client = RedisConnectionPool.get_client(
         host=settings.redis_host,
         port=settings.redis_port,
         db=settings.redis_db,
-        password=settings.redis_password
+        password=settings.redis_password,
+        ping=False,
+        max_connections=settings.redis_max_connections
     )
     
+    # Per-user quota plans, bulk-loaded from MySQL and resolved in memory
+    quotas = QuotaCache(get_db_manager(), default_plan=settings.quota_default_plan)
+    
     # Initialize Token Manager
-    token_manager = TokenManager(redis_client=redis_client)
+    token_manager = TokenManager(redis_client=redis_client, quotas=quotas)
+    
+    # Per-worker single-flight caches in front of token validation (MySQL) and read endpoints
+    token_cache = SWRCache("token", settings.token_cache_ttl_seconds, settings.token_cache_stale_seconds)
+    read_caches.update({
+        "pod_status": SWRCache("pod_status", settings.read_cache_ttl_seconds, settings.read_cache_stale_seconds),
+        "pod_list": SWRCache("pod_list", settings.read_cache_ttl_seconds, settings.read_cache_stale_seconds),
+        "cluster": SWRCache("cluster", settings.cluster_cache_ttl_seconds, settings.cluster_cache_ttl_seconds)
+    })
+    
+    # Single-flight execution of lifecycle mutations (create/delete/restart)
+    coalescer = IdempotencyCoalescer(
+        redis_client,
+        key_ttl=settings.idempotency_key_ttl_seconds,
+        coalesce_ttl=settings.idempotency_coalesce_ttl_seconds
+    )
+    
+    # Background controllers (and informer handlers writing shared state) run only in
+    # the worker holding the leader lease; the lease is acquired by elector.run() below
+    elector = LeaderElector(
+        redis_client,
+        "vnc-controller",
+        lease_seconds=settings.leader_lease_seconds,
+        renew_interval=settings.leader_renew_seconds
+    )
+    
+    # Environment registry, kept in sync with VNC pods by a list+watch informer
+    registry = EnvironmentRegistry(redis_client)
+    pod_informer = ResourceInformer(
+        "pods",
+        k8s_manager.v1.list_namespaced_pod,
+        namespace=settings.k8s_namespace_pods,
+        label_selector="managed-by=vnc-manager",
+        page_size=settings.k8s_list_page_size
+    )
+    pod_informer.add_handler(RegistrySync(registry))
+    
+    # Optional PostgreSQL history store, written in batches off the request path
+    if settings.db_enabled:
+        store = EnvironmentStore()
+        store.start()
+        pod_informer.add_handler(StoreSync(store))
+    
+    # Lifecycle events are queued and flushed in bulk to a Redis Stream (and PostgreSQL)
+    sinks = [RedisStreamSink(redis_client, settings.events_stream_key, settings.events_stream_maxlen)]
+    if store:
+        sinks.append(PostgresSink(store))
+    events = EventPipeline(
+        sinks,
+        max_queue=settings.events_queue_size,
+        batch_size=settings.events_batch_size,
+        flush_interval=settings.events_flush_interval
+    )
+    events.start()
+    set_event_pipeline(events)
+    pod_informer.add_handler(PodEventSync(events, elector))
+    
+    # Cold-start phases from pod conditions and kubelet/provisioner events; the leader
+    # runs the events informer (started in cold_start.run() below)
+    if settings.cold_start_tracking_enabled:
+        cold_start = ColdStartTracker(
+            registry,
+            elector,
+            lambda: ResourceInformer(
+                "events",
+                k8s_manager.v1.list_namespaced_event,
+                namespace=settings.k8s_namespace_pods,
+                page_size=settings.k8s_list_page_size,
+                transform=project_event
+            ),
+            grace_seconds=settings.cold_start_event_grace_seconds
+        )
+        pod_informer.add_handler(cold_start.on_pod)
+    
+    pod_informer.start()
+    
+    # Cluster capacity model for admission and placement, updated incrementally from node and pod informers
+    policies = parse_policies(settings.placement_policies)
+    if settings.capacity_admission_enabled or policies:
+        capacity = CapacityModel(
+            settings.k8s_namespace_pods,
+            redis_client,
+            reservation_ttl=settings.capacity_reservation_seconds,
+            release_window=settings.capacity_release_window_seconds
+        )
+        node_informer = ResourceInformer(
+            "nodes",
+            k8s_manager.v1.list_node,
+            page_size=settings.k8s_list_page_size,
+            transform=project_node
+        )
+        node_informer.add_handler(capacity.on_node)
+        cluster_pod_informer = ResourceInformer(
+            "cluster-pods",
+            k8s_manager.v1.list_pod_for_all_namespaces,
+            field_selector="status.phase!=Succeeded,status.phase!=Failed",
+            page_size=settings.k8s_list_page_size,
+            transform=project_pod
+        )
+        cluster_pod_informer.add_handler(capacity.on_pod)
+        capacity_informers.extend([node_informer, cluster_pod_informer])
+        for informer in capacity_informers:
+            informer.start()
     
-    # Ensure namespaces exist
-    k8s_manager.create_namespace_if_not_exists(settings.k8s_namespace_pods)
+    # Per-tier QoS class, affinity ("pack" ranks nodes from the capacity model) and topology spread
+    if policies:
+        placement = PlacementPolicies(policies, quotas, capacity=capacity)
+        k8s_manager.placement_policies = placement
     
-    logger.info("VNC Pod Manager API started successfully")
+    # Network-bound initialization runs in the background; /ready reports progress
+    warmup = WarmupTracker()
+    warmup.add("redis", redis_client.ping)
+    warmup.add("namespace", lambda: k8s_manager.create_namespace_if_not_exists(settings.k8s_namespace_pods))
+    warmup.add("allocated_ports", k8s_manager.ensure_allocated_ports, required=False)
+    warmup.add("ssh_index", tcp_proxy_manager.refresh_ssh_index)
+    warmup.add("pod_informer", lambda: pod_informer.wait_for_sync(timeout=5))
+    warmup.add("quotas", quotas.refresh, required=False)
+    if store:
+        warmup.add("database", store.ping, required=False)
+    warmup.start()
+    
+    # Keep the SSH port index in sync with mappings made by other workers/replicas
+    background_tasks = [
+        asyncio.create_task(run_periodically(
+            "ssh_index", tcp_proxy_manager.refresh_ssh_index, settings.ssh_index_refresh_seconds
+        )),
+        # Reloads the quota tables only when their version stamp changed
+        asyncio.create_task(run_periodically(
+            "quotas", quotas.refresh, settings.quota_refresh_interval_seconds
+        ))
+    ]
+    background_tasks.append(asyncio.create_task(elector.run()))
+    if cold_start:
+        background_tasks.append(asyncio.create_task(cold_start.run()))
+    pod_manager = PodManager(k8s_manager, ingress_manager, redis_client, registry)
+    # Pre-provisioned PVCs for first-time users; claimed by any worker, refilled by the leader
+    if settings.pvc_pool_enabled:
+        pvc_pool = PVCPool(
+            k8s_manager,
+            elector,
+            parse_pool_sizes(settings.pvc_pool_sizes),
+            interval=settings.pvc_pool_refill_interval_seconds
+        )
+        background_tasks.append(asyncio.create_task(pvc_pool.run()))
+    provisioner = ProvisioningSaga(
+        k8s_manager,
+        ingress_manager,
+        tcp_proxy_manager,
+        redis_client,
+        max_attempts=settings.provision_max_attempts,
+        state_ttl=settings.provision_state_ttl_seconds,
+        pvc_pool=pvc_pool
+    )
+    if settings.idle_hibernation_enabled:
+        hibernator = IdleHibernator(
+            pod_manager,
+            elector,
+            ActivityProbe(k8s_manager),
+            idle_timeout=settings.idle_timeout_seconds,
+            cpu_threshold_millicores=settings.idle_cpu_threshold_millicores,
+            interval=settings.idle_check_interval_seconds,
+            concurrency=settings.idle_check_concurrency
+        )
+        background_tasks.append(asyncio.create_task(hibernator.run()))
+    # Usage samples from metrics-server -> per-user request/limit recommendations (leader samples)
+    if settings.rightsizing_enabled:
+        rightsizer = RightSizer(
+            k8s_manager,
+            redis_client,
+            elector,
+            quotas,
+            interval=settings.rightsizing_sample_interval_seconds,
+            window_samples=settings.rightsizing_window_samples,
+            min_samples=settings.rightsizing_min_samples,
+            headroom=settings.rightsizing_headroom,
+            recompute_interval=settings.rightsizing_recompute_interval_seconds,
+            oom_cooldown_hours=settings.rightsizing_oom_cooldown_hours
+        )
+        pod_informer.add_handler(rightsizer.on_pod)
+        background_tasks.append(asyncio.create_task(rightsizer.run()))
+    if settings.cleanup_enabled:
+        reconciler = StaleEnvironmentReconciler(
+            pod_manager,
+            elector,
+            interval=settings.cleanup_interval_seconds,
+            max_age_hours=settings.cleanup_max_age_hours,
+            concurrency=settings.cleanup_concurrency,
+            rate_per_second=settings.cleanup_rate_per_second
+        )
+        background_tasks.append(asyncio.create_task(reconciler.run()))
+    # Always constructed so /monitor/gc can report orphans before GC is enabled
+    collector = OrphanCollector(
+        k8s_manager,
+        tcp_proxy_manager,
+        registry,
+        pod_informer,
+        elector,
+        interval=settings.gc_interval_seconds,
+        min_age_seconds=settings.gc_min_age_seconds,
+        reclaim_pvcs=settings.gc_reclaim_pvcs,
+        concurrency=settings.gc_concurrency,
+        rate_per_second=settings.gc_rate_per_second
+    )
+    if settings.gc_enabled:
+        background_tasks.append(asyncio.create_task(collector.run()))
+    # Always constructed so /monitor/images can resolve the tag before pre-pull is enabled
+    prepuller = ImagePrepuller(
+        k8s_manager,
+        redis_client,
+        elector,
+        RegistryClient(
+            settings.k8s_image_registry,
+            scheme=settings.image_registry_scheme,
+            username=settings.image_registry_username,
+            password=settings.image_registry_password
+        ),
+        settings.k8s_image_registry,
+        settings.k8s_vnc_image,
+        interval=settings.image_prepull_interval_seconds,
+        max_unavailable=settings.image_prepull_max_unavailable,
+        pin_fraction=settings.image_prepull_pin_fraction
+    )
+    if settings.image_prepull_enabled:
+        k8s_manager.image_pinning = prepuller
+        background_tasks.append(asyncio.create_task(prepuller.run()))
+    
+    logger.info("VNC Pod Manager API started, warm-up running in background")
     
     yield
     
     # Shutdown
     logger.info("Shutting down VNC Pod Manager API")
+    await warmup.stop()
+    # Controllers first (the elector releases its lease), then the writers they feed
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    pod_informer.stop()
+    for informer in capacity_informers:
+        informer.stop()
+    events.stop()
+    set_event_pipeline(None)
+    if store:
+        store.close()
     if redis_client:
         redis_client.close()
 
@@ -138,8 +427,11 @@ async def get_current_user(authorization: str = Header(None)):
     if token_manager.is_blacklisted(token):
         raise HTTPException(status_code=401, detail="Token has been revoked")
     
-    # Validate token
-    user_info = token_manager.validate_token(token)
+    # Validate token (cached per worker; revocation above is still checked on every request)
+    user_info = await token_cache.get_or_load(
+        token_manager.hash_token(token),
+        lambda: asyncio.to_thread(token_manager.validate_token, token)
+    )
     if not user_info:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
@@ -169,38 +461,165 @@ async def health_check():
 
 @app.get("/ready")
 async def readiness_check():
-    """Readiness check endpoint"""
+    """Readiness check endpoint, including background warm-up progress"""
+    progress = warmup.progress() if warmup else {}
+    if not warmup or not warmup.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "warmup": progress}
+        )
+    
     try:
         # Check Redis connection
         redis_client.ping()
         # Check K8s API access
         k8s_manager.v1.list_namespace(limit=1)
-        return {"status": "ready"}
+        return {"status": "ready", "warmup": progress}
     except Exception as e:
         logger.error(f"Readiness check failed: {e}")
         raise HTTPException(status_code=503, detail="Service not ready")
 
+async def _run_mutation(response: Response, operation: str, user_id: str, idempotency_key: Optional[str],
+                        payload: Any, fn) -> Dict[str, Any]:
+    """
+    Run a blocking lifecycle mutation in the threadpool, once per
+    (operation, user, Idempotency-Key); duplicates receive the same result
+    """
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+    
+    async def run():
+        try:
+            return 200, await asyncio.to_thread(fn)
+        except HTTPException as e:
+            body = {"detail": e.detail}
+            if e.headers:
+                body["headers"] = e.headers
+            return e.status_code, body
+    
+    try:
+        result = await coalescer.execute(
+            operation,
+            user_id,
+            run,
+            idempotency_key=idempotency_key,
+            fingerprint=request_fingerprint(payload)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # Reads cached in this worker must not outlive the mutation; other workers expire within the TTL
+    read_caches["pod_status"].invalidate_where(lambda key: key[0] == user_id)
+    read_caches["pod_list"].invalidate(user_id)
+    
+    if result.status >= 400:
+        raise HTTPException(status_code=result.status, detail=result.body.get("detail"),
+                            headers=result.body.get("headers"))
+    if result.replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    if result.redacted:
+        # Stored results carry no credentials; the current ones are in the user's Secret
+        return await asyncio.to_thread(_restore_credentials, user_id, result.body, result.redacted)
+    return result.body
+
+def _restore_credentials(user_id: str, body: Dict[str, Any], redacted) -> Dict[str, Any]:
+    """Fill in credentials removed from a shared result from the vnc-cred Secret (blocking)"""
+    body = dict(body)
+    if "vnc_password" in redacted:
+        credentials = k8s_manager.get_credentials(user_id) or {}
+        if credentials.get("vnc-password"):
+            body["vnc_password"] = credentials["vnc-password"]
+    return body
+
 @app.post("/api/v1/pods")
 async def create_pod(
-    background_tasks: BackgroundTasks,
+    response: Response,
     authorization: str = Header(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     user_info: dict = Depends(get_current_user),
     resource_quota: Optional[Dict[str, str]] = None
 ):
     """
     Create a VNC Pod for the authenticated user
     
+    Concurrent identical requests (and retries with the same Idempotency-Key)
+    are executed once and share the result.
+    
     - **Authorization**: Required (Bearer token or direct token)
+    - **Idempotency-Key**: Optional; retries with the same key replay the first response
     - **resource_quota**: Optional resource limits override
     """
+    return await _run_mutation(
+        response, "create", user_info["user_id"], idempotency_key, resource_quota,
+        lambda: _create_pod(user_info, authorization, resource_quota)
+    )
+
+def _resolve_quota(user_id: str, resource_quota: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """The user's plan lowered by the request's override; 403 above the plan, 422 if invalid"""
+    try:
+        quota = None
+        if not resource_quota and rightsizer and settings.rightsizing_auto_apply:
+            # Usage-based values below the plan; an explicit override still wins
+            quota = rightsizer.recommended_quota(user_id)
+        quota = quota or quotas.resolve(user_id, resource_quota)
+        # Admission must see the requests the pod will be created with
+        return placement.apply_qos(user_id, quota) if placement else quota
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except InvalidQuota as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _admit(user_id: str, resource_quota: Dict[str, str], replaces=None):
+    """
+    Capacity admission for a new pod; raises 503 with an ETA when the cluster is full
+    
+    Args:
+        user_id: User identifier
+        resource_quota: Resolved quota of the new pod
+        replaces: Existing V1Pod the new pod replaces (its requests are credited back)
+    """
+    if not settings.capacity_admission_enabled or not capacity:
+        return
+    if not all(informer.has_synced for informer in capacity_informers):
+        return  # fail open until the model is loaded
+    # Only nodes the pod's required affinity allows: the policy node selector and the pinned image digest
+    required = placement.required_affinity(user_id) if placement else None
+    if k8s_manager.image_pinning:
+        try:
+            pinned = k8s_manager.image_pinning.placement()
+        except Exception as e:
+            logger.warning(f"Image pinning unavailable during admission: {e}")
+        else:
+            required = merge_affinity(pinned["affinity"] if pinned else None, required)
+    try:
+        capacity.admit(
+            user_id,
+            resource_quota["cpu_request"],
+            resource_quota["memory_request"],
+            node_terms=required_node_terms(required),
+            replaces=project_pod(k8s_manager.v1.api_client.sanitize_for_serialization(replaces)) if replaces else None
+        )
+    except AdmissionRejected as e:
+        retry_after = int(min(max(e.eta_seconds or 60, 5), 600))
+        raise HTTPException(
+            status_code=503,
+            detail={"message": str(e), "eta_seconds": e.eta_seconds, "retry_after_seconds": retry_after},
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def _create_pod(user_info: dict, authorization: Optional[str], resource_quota: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    """Create or resume the user's environment (blocking)"""
     user_id = user_info["user_id"]
     # Generate a VNC password for this pod
     vnc_password = token_manager.generate_pod_specific_token(user_id)
+    # The reservation taken by _admit is kept only once this call has created or resumed a pod
+    admitted = created = False
     
     try:
-        # Check if pod already exists
-        existing_pod = k8s_manager.get_pod(f"vnc-{user_id}")
-        if existing_pod and existing_pod.status.phase in ["Running", "Pending"]:
+        # Check if pod already exists (registry is kept in sync by the pod informer);
+        # an interrupted provisioning saga has a pod too but must still be resumed
+        phase = registry.get_field(user_id, "phase")
+        if phase in ["Running", "Pending"] and not provisioner.is_pending(user_id):
             # Get access info
             access_info = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
             return {
@@ -210,13 +629,25 @@ async def create_pod(
                 "access_info": access_info
             }
         
+        # Enforce the user's plan from memory (no MySQL round trip); the override is
+        # recorded so a recreate keeps it
+        quota_override = resource_quota or None
+        resource_quota = _resolve_quota(user_id, resource_quota)
+        
+        # Reject before taking the lock, a port or an Ingress when no node can fit the pod
+        # (a resumed saga whose pod already exists is not admitted again)
+        if phase not in ["Running", "Pending"]:
+            _admit(user_id, resource_quota)
+            admitted = True
+        
         # Use distributed lock to prevent concurrent creation
         lock = RedisLock(redis_client, f"create_pod_{user_id}", timeout=30)
         
         with lock.acquire_context():
             # Double-check after acquiring lock
             existing_pod = k8s_manager.get_pod(f"vnc-{user_id}")
-            if existing_pod and existing_pod.status.phase in ["Running", "Pending"]:
+            if (existing_pod and existing_pod.status.phase in ["Running", "Pending"]
+                    and not provisioner.is_pending(user_id)):
                 access_info = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
                 return {
                     "status": "exists",
@@ -225,85 +656,105 @@ async def create_pod(
                     "access_info": access_info
                 }
             
-            # Extract resource quota from token or use provided
-            if not resource_quota:
-                resource_quota = user_info.get("resource_quota", {})
-            
-            # Create PVC for user data
-            pvc = k8s_manager.create_pvc(
-                user_id=user_id,
-                size=resource_quota.get("storage", settings.default_storage_size)
-            )
-            
             # Extract the API token to pass to void
             api_token = authorization
             if authorization and authorization.startswith("Bearer "):
                 api_token = authorization[7:]
             
-            # Create the VNC Pod with VNC password and API token
-            pod = k8s_manager.create_vnc_pod(
-                user_id=user_id,
-                token=vnc_password,  # Use generated VNC password
-                api_token=api_token,  # Pass API token for void
-                resource_quota=resource_quota
-            )
-            
-            # Create ClusterIP Service
-            service = ingress_manager.create_pod_service(user_id)
+            # Fast path: a hibernated environment still has its PVC, Service, Ingress and SSH port
+            if registry.get_field(user_id, "phase") == "Hibernated":
+                pod = pod_manager.resume_environment(
+                    user_id,
+                    token=vnc_password,
+                    api_token=api_token,
+                    resource_quota=resource_quota
+                )
+                created = True
+                registry.update(user_id, quota_override=quota_override)
+                events.emit(user_id, "resumed", pod_uid=pod.metadata.uid, phase="Pending")
+                access_info = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
+                logger.info(f"Resumed hibernated pod for user {user_id}")
+                return {
+                    "status": "resumed",
+                    "message": "Hibernated pod resumed",
+                    "pod_name": pod.metadata.name,
+                    "access_info": access_info,
+                    "vnc_password": vnc_password
+                }
             
-            # Create Ingress for web access
-            ingress = ingress_manager.create_pod_ingress(
-                user_id=user_id,
-                domain=settings.vnc_domain
+            # PVC -> pod -> service -> ingress -> SSH; resumes an interrupted attempt
+            result = provisioner.provision(
+                user_id,
+                vnc_password=vnc_password,
+                api_token=api_token,
+                resource_quota=resource_quota
             )
-            
-            # Add SSH proxy configuration
-            ssh_info = tcp_proxy_manager.add_ssh_proxy(user_id)
+            created = True
+            vnc_password = result["vnc_password"]
             
             # Get access information
             access_info = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
             # Add SSH info to access_info
-            access_info["ssh"] = ssh_info
-            
-            # Store pod info in Redis
-            pod_info = {
-                "pod_name": pod.metadata.name,
-                "user_id": user_id,
-                "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-                "service_name": service.metadata.name,
-                "ingress_name": ingress.metadata.name,
-                "access_info": access_info,
-                "vnc_password": vnc_password  # Include VNC password in cache
-            }
-            redis_client.setex(
-                f"pod:{user_id}",
-                86400,  # Cache for 24 hours
-                json.dumps(pod_info)
+            access_info["ssh"] = result["ssh_info"]
+            
+            # Record the environment; phase and pod status are filled in by the informer
+            registry.update(
+                user_id,
+                pod_name=result["pod_name"],
+                namespace=result["namespace"],
+                service_name=result["service_name"],
+                ingress_name=result["ingress_name"],
+                pvc_name=result["pvc_name"],
+                ssh_port=result["ssh_port"],
+                created_at=result["created_at"],
+                quota_override=quota_override
             )
             
+            if store:
+                store.upsert_environment(
+                    result["pod_uid"],
+                    user_id=user_id,
+                    pod_name=result["pod_name"],
+                    pvc_name=result["pvc_name"],
+                    created_at=datetime.fromisoformat(result["created_at"]) if result["created_at"] else None
+                )
+            
             logger.info(f"Successfully created pod for user {user_id}")
             
             return {
                 "status": "created",
                 "message": "Pod created successfully",
-                "pod_name": pod.metadata.name,
+                "pod_name": result["pod_name"],
                 "access_info": access_info,
                 "vnc_password": vnc_password  # Return VNC password to user
             }
             
+    except HTTPException:
+        raise
+    except ProvisioningError as e:
+        # Already recorded by the saga; transient failures resume on the next request
+        raise HTTPException(status_code=500 if e.permanent else 503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to create pod for user {user_id}: {e}")
+        events.emit(user_id, "create_failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # "exists" after the lock, a lock timeout or a failed create: no pod will use the room
+        if admitted and not created and capacity:
+            capacity.release(user_id)
 
 @app.delete("/api/v1/pods/{pod_name}")
 async def delete_pod(
     pod_name: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     user_info: dict = Depends(get_current_user)
 ):
     """
     Delete a VNC Pod
     
     - **pod_name**: Name of the pod to delete
+    - **Idempotency-Key**: Optional; retries with the same key replay the first response
     - **Authorization**: Required
     """
     user_id = user_info["user_id"]
@@ -312,6 +763,13 @@ async def delete_pod(
     if not pod_name.endswith(f"-{user_id}"):
         raise HTTPException(status_code=403, detail="Not authorized to delete this pod")
     
+    return await _run_mutation(
+        response, "delete", user_id, idempotency_key, {"pod_name": pod_name},
+        lambda: _delete_pod(user_id, pod_name)
+    )
+
+def _delete_pod(user_id: str, pod_name: str) -> Dict[str, Any]:
+    """Delete the user's pod, routes and SSH mapping, keeping the PVC (blocking)"""
     try:
         # Use distributed lock (90 seconds to account for pod termination wait)
         lock = RedisLock(redis_client, f"delete_pod_{user_id}", timeout=90)
@@ -345,14 +803,19 @@ async def delete_pod(
             else:
                 logger.warning(f"Pod {pod_name} still terminating after {max_wait} seconds, proceeding anyway")
             
+            # Credentials are only needed by a pod
+            k8s_manager.delete_credentials(user_id)
+            
             # Note: SSH proxy removal is already handled in ingress_manager.delete_pod_ingress()
             # which was called above, so we don't need to call it again here
             
             # Optionally keep PVC for data persistence
             # k8s_manager.delete_pvc(f"pvc-{user_id}")
             
-            # Clear Redis cache
-            redis_client.delete(f"pod:{user_id}")
+            # Keep the record for the retained PVC; routes and SSH port are released
+            registry.mark_pod_deleted(user_id, ssh_port=None, service_name=None, ingress_name=None, hibernated_at=None)
+            provisioner.discard(user_id)
+            events.emit(user_id, "environment_deleted", pod_name=pod_name)
             
             logger.info(f"Successfully deleted pod {pod_name}")
             
@@ -383,15 +846,19 @@ async def get_pod_status(
     if not pod_name.endswith(f"-{user_id}"):
         raise HTTPException(status_code=403, detail="Not authorized to access this pod")
     
+    async def load():
+        record = registry.get(user_id)
+        status = status_from_record(record) if record and record.get("pod_name") == pod_name else None
+        if status:
+            # Add access info
+            status["access_info"] = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
+        return status
+    
     try:
-        status = k8s_manager.get_pod_status(pod_name)
+        status = await read_caches["pod_status"].get_or_load((user_id, pod_name), load)
         if not status:
             raise HTTPException(status_code=404, detail="Pod not found")
         
-        # Add access info
-        access_info = ingress_manager.get_pod_access_info(user_id, settings.vnc_domain)
-        status["access_info"] = access_info
-        
         return status
         
     except HTTPException:
@@ -403,12 +870,18 @@ async def get_pod_status(
 @app.post("/api/v1/pods/{pod_name}/restart")
 async def restart_pod(
     pod_name: str,
+    response: Response,
+    mode: str = Query("auto", pattern="^(auto|soft|recreate)$"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     user_info: dict = Depends(get_current_user)
 ):
     """
     Restart a VNC Pod
     
     - **pod_name**: Name of the pod to restart
+    - **mode**: soft restarts the VNC session in the running container, recreate
+      deletes and recreates the pod, auto (default) tries soft and falls back to recreate
+    - **Idempotency-Key**: Optional; retries with the same key replay the first response
     - **Authorization**: Required
     """
     user_id = user_info["user_id"]
@@ -417,40 +890,96 @@ async def restart_pod(
     if not pod_name.endswith(f"-{user_id}"):
         raise HTTPException(status_code=403, detail="Not authorized to restart this pod")
     
+    return await _run_mutation(
+        response, "restart", user_id, idempotency_key, {"pod_name": pod_name, "mode": mode},
+        lambda: _restart_pod(user_info, pod_name, mode)
+    )
+
+def _restart_pod(user_info: dict, pod_name: str, mode: str = "auto") -> Dict[str, Any]:
+    """Restart the user's VNC session in place, or recreate the pod with the same credentials (blocking)"""
+    user_id = user_info["user_id"]
     try:
-        # Use distributed lock
-        lock = RedisLock(redis_client, f"restart_pod_{user_id}", timeout=30)
+        # Use distributed lock (held across a full pod termination when recreating)
+        lock = RedisLock(redis_client, f"restart_pod_{user_id}", timeout=90)
         
         with lock.acquire_context():
+            started = time.monotonic()
+            
             # Get current pod info
             pod = k8s_manager.get_pod(pod_name)
             if not pod:
                 raise HTTPException(status_code=404, detail="Pod not found")
             
-            # Delete the pod (it will be recreated by deployment/replicaset if configured)
-            k8s_manager.delete_pod(pod_name)
+            if mode != "recreate":
+                if pod.status.phase == "Running" and k8s_manager.soft_restart_pod(
+                    pod_name, timeout=settings.soft_restart_timeout_seconds
+                ):
+                    restart_seconds = round(time.monotonic() - started, 2)
+                    events.emit(user_id, "pod_restarted", pod_uid=pod.metadata.uid, pod_name=pod_name,
+                                mode="soft", restart_seconds=restart_seconds)
+                    logger.info(f"Soft restarted pod {pod_name} in {restart_seconds}s")
+                    return {
+                        "status": "restarted",
+                        "message": "VNC session restarted in place",
+                        "mode": "soft",
+                        "old_pod_name": pod_name,
+                        "new_pod_name": pod_name,
+                        "restart_seconds": restart_seconds
+                    }
+                if mode == "soft":
+                    raise HTTPException(status_code=409, detail="VNC session could not be restarted in place")
+                logger.info(f"Falling back to recreating pod {pod_name}")
             
-            # Wait a moment
-            import time
-            time.sleep(2)
+            # Same quota as a create: the create-time override (or the right-sized quota)
+            # within the current plan; an override above a since-lowered plan falls back to the plan
+            override = registry.get_field(user_id, "quota_override")
+            try:
+                resource_quota = _resolve_quota(user_id, override)
+            except HTTPException as e:
+                if not override:
+                    raise
+                logger.warning(f"Dropping quota override of user {user_id} on recreate: {e.detail}")
+                resource_quota = _resolve_quota(user_id, None)
             
-            # Generate new VNC password
-            new_vnc_password = token_manager.generate_pod_specific_token(user_id)
+            # Admitted while the old pod still runs, with its requests credited back, so a
+            # rejection leaves the environment untouched
+            _admit(user_id, resource_quota, replaces=pod)
             
-            # Recreate the pod
-            new_pod = k8s_manager.create_vnc_pod(
-                user_id=user_id,
-                token=new_vnc_password,
-                resource_quota=user_info.get("resource_quota", {})
-            )
+            try:
+                # Delete the pod and wait until it is gone, so the create does not hit 409
+                k8s_manager.delete_pod(pod_name)
+                if not k8s_manager.wait_for_pod_deletion(pod_name, timeout=settings.pod_termination_timeout_seconds):
+                    raise HTTPException(status_code=504, detail="Pod is still terminating, retry later")
+                
+                # Keep the VNC password and void token from the credentials Secret
+                credentials = k8s_manager.get_credentials(user_id) or {}
+                vnc_password = credentials.get("vnc-password") or token_manager.generate_pod_specific_token(user_id)
+                
+                # Recreate the pod
+                new_pod = k8s_manager.create_vnc_pod(
+                    user_id=user_id,
+                    token=vnc_password,
+                    resource_quota=resource_quota,
+                    pvc_name=k8s_manager.pod_claim_name(pod)
+                )
+            except Exception:
+                if capacity:
+                    capacity.release(user_id)
+                raise
+            
+            restart_seconds = round(time.monotonic() - started, 2)
+            events.emit(user_id, "pod_restarted", pod_uid=new_pod.metadata.uid, pod_name=new_pod.metadata.name,
+                        mode="recreate", restart_seconds=restart_seconds)
             
             logger.info(f"Successfully restarted pod {pod_name}")
             
             return {
                 "status": "restarted",
                 "message": "Pod restarted successfully",
+                "mode": "recreate",
                 "old_pod_name": pod_name,
-                "new_pod_name": new_pod.metadata.name
+                "new_pod_name": new_pod.metadata.name,
+                "restart_seconds": restart_seconds
             }
             
     except HTTPException:
@@ -459,10 +988,71 @@ async def restart_pod(
         logger.error(f"Failed to restart pod {pod_name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/pods/{pod_name}/rotate-password")
+async def rotate_pod_password(
+    pod_name: str,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user_info: dict = Depends(get_current_user)
+):
+    """
+    Rotate the VNC password of a running pod without recreating it
+    
+    Only the user's credentials Secret is patched; the pod picks the new
+    password up when the kubelet refreshes the mounted Secret (usually
+    within a minute). Existing VNC connections stay open.
+    
+    - **pod_name**: Name of the pod
+    - **Idempotency-Key**: Optional; retries with the same key replay the first response
+    - **Authorization**: Required
+    """
+    user_id = user_info["user_id"]
+    
+    # Verify pod ownership
+    if not pod_name.endswith(f"-{user_id}"):
+        raise HTTPException(status_code=403, detail="Not authorized to rotate this pod's password")
+    
+    return await _run_mutation(
+        response, "rotate_password", user_id, idempotency_key, {"pod_name": pod_name},
+        lambda: _rotate_pod_password(user_id, pod_name)
+    )
+
+def _rotate_pod_password(user_id: str, pod_name: str) -> Dict[str, Any]:
+    """Patch a new VNC password into the user's credentials Secret (blocking)"""
+    try:
+        with RedisLock(redis_client, f"restart_pod_{user_id}", timeout=30).acquire_context():
+            if not k8s_manager.get_pod(pod_name):
+                raise HTTPException(status_code=404, detail="Pod not found")
+            
+            vnc_password = token_manager.generate_pod_specific_token(user_id)
+            k8s_manager.apply_credentials(user_id, vnc_password=vnc_password)
+            events.emit(user_id, "password_rotated", pod_name=pod_name)
+            
+            logger.info(f"Rotated VNC password for pod {pod_name}")
+            
+            return {
+                "status": "rotated",
+                "message": "New VNC password applies to new connections once the pod picks it up",
+                "pod_name": pod_name,
+                "vnc_password": vnc_password
+            }
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to rotate password for pod {pod_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/v1/pods/{pod_name}/logs")
 async def get_pod_logs(
     pod_name: str,
-    tail_lines: int = 100,
+    request: Request,
+    tail_lines: Optional[int] = Query(100, ge=0),
+    follow: bool = False,
+    since_seconds: Optional[int] = Query(None, ge=1),
+    limit_bytes: Optional[int] = Query(None, ge=1),
+    timestamps: bool = False,
+    format: str = Query("json", pattern="^(json|text|ndjson)$"),
     user_info: dict = Depends(get_current_user)
 ):
     """
@@ -470,6 +1060,11 @@ async def get_pod_logs(
     
     - **pod_name**: Name of the pod
     - **tail_lines**: Number of lines to return from the end
+    - **follow**: Keep streaming new log lines (implies ndjson unless format=text)
+    - **since_seconds**: Only return logs newer than this many seconds
+    - **limit_bytes**: Maximum number of log bytes to return
+    - **timestamps**: Prefix every line with its RFC3339 timestamp
+    - **format**: `json` (single document), `text` (chunked plain text) or `ndjson` (one record per line)
     - **Authorization**: Required
     """
     user_id = user_info["user_id"]
@@ -478,17 +1073,72 @@ async def get_pod_logs(
     if not pod_name.endswith(f"-{user_id}"):
         raise HTTPException(status_code=403, detail="Not authorized to access this pod")
     
+    # A follow stream never completes, so it cannot be wrapped in one JSON document
+    if follow and format == "json":
+        format = "ndjson"
+    
+    def open_stream(reopen_since: Optional[int] = None, remaining_bytes: Optional[int] = None):
+        if reopen_since is not None:
+            return k8s_manager.stream_pod_logs(
+                pod_name, follow=True, since_seconds=reopen_since, limit_bytes=remaining_bytes, timestamps=True,
+                read_timeout=settings.log_follow_idle_timeout_seconds
+            )
+        return k8s_manager.stream_pod_logs(
+            pod_name,
+            tail_lines=tail_lines,
+            follow=follow,
+            since_seconds=since_seconds,
+            limit_bytes=limit_bytes,
+            # Follow mode needs timestamps to resume after an idle timeout
+            timestamps=timestamps or follow,
+            read_timeout=settings.log_follow_idle_timeout_seconds if follow else None
+        )
+    
     try:
-        logs = k8s_manager.get_pod_logs(pod_name, tail_lines=tail_lines)
+        response = open_stream()
+    except ApiException as e:
+        if e.status == 404:
+            raise HTTPException(status_code=404, detail="Pod not found")
+        logger.error(f"Failed to get pod logs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to get pod logs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if follow:
+        # Reopened on idle timeouts, so a disconnected client frees its thread within the timeout
+        opened = iter([response])
+        chunks = iter_follow_chunks(
+            lambda reopen_since, remaining_bytes: next(opened, None) or open_stream(reopen_since, remaining_bytes),
+            settings.log_stream_chunk_size,
+            timestamps=timestamps,
+            limit_bytes=limit_bytes
+        )
+    else:
+        chunks = iter_response_chunks(response, settings.log_stream_chunk_size)
+    
+    if format == "json":
+        # Bounded by tail_lines/limit_bytes; kept for existing clients
+        logs = b"".join(chunks).decode("utf-8", errors="replace")
         return {
             "pod_name": pod_name,
             "logs": logs,
             "tail_lines": tail_lines
         }
-        
-    except Exception as e:
-        logger.error(f"Failed to get pod logs: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    if format == "ndjson":
+        body = iter_ndjson_lines(chunks, pod_name, timestamps=timestamps)
+        media_type = "application/x-ndjson"
+    else:
+        body = chunks
+        media_type = "text/plain; charset=utf-8"
+    
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 @app.get("/api/v1/pods")
 async def list_user_pods(user_info: dict = Depends(get_current_user)):
@@ -499,50 +1149,212 @@ async def list_user_pods(user_info: dict = Depends(get_current_user)):
     """
     user_id = user_info["user_id"]
     
-    try:
-        # Get pods with user label
-        pods = k8s_manager.v1.list_namespaced_pod(
-            namespace=settings.k8s_namespace_pods,
-            label_selector=f"user={user_id}"
-        )
-        
+    async def load():
+        # Read from the registry instead of listing pods on the apiserver
         pod_list = []
-        for pod in pods.items:
-            pod_info = {
-                "name": pod.metadata.name,
-                "status": pod.status.phase,
-                "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-                "pod_ip": pod.status.pod_ip,
-                "host_ip": pod.status.host_ip
-            }
-            pod_list.append(pod_info)
+        record = registry.get(user_id)
+        if status_from_record(record):
+            pod_list.append({
+                "name": record["pod_name"],
+                "status": record.get("phase"),
+                "created_at": record.get("created_at"),
+                "pod_ip": record.get("pod_ip"),
+                "host_ip": record.get("host_ip")
+            })
         
         return {
             "user_id": user_id,
             "pods": pod_list,
             "count": len(pod_list)
         }
+    
+    try:
+        return await read_caches["pod_list"].get_or_load(user_id, load)
         
     except Exception as e:
         logger.error(f"Failed to list pods: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/monitor/cluster")
+async def get_cluster_metrics():
+    """Cluster-wide VNC pod counts; dashboard bursts share one cached apiserver list"""
+    try:
+        return await read_caches["cluster"].get_or_load(
+            "cluster", lambda: asyncio.to_thread(monitor.collect_cluster_metrics, k8s_manager)
+        )
+    except Exception as e:
+        logger.error(f"Failed to get cluster metrics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/cache")
+async def get_cache_stats():
+    """Per-worker read cache entries and hit/miss/stale counts"""
+    return {name: cache.stats() for name, cache in {"token": token_cache, **read_caches}.items()}
+
+@app.get("/monitor/workers")
+async def get_worker_memory():
+    """Per-worker RSS/USS report for sizing replica memory limits"""
+    return worker_memory_report()
+
+@app.get("/monitor/leader")
+async def get_leader_status():
+    """Leader election, idle hibernation and stale-environment reconciler status"""
+    result = {"election": await asyncio.to_thread(elector.status)}
+    if hibernator:
+        result["idle_hibernation"] = hibernator.status()
+    if reconciler:
+        result["cleanup"] = await asyncio.to_thread(reconciler.status)
+    return result
+
+@app.get("/monitor/gc")
+async def get_orphan_report():
+    """Dry-run garbage collection report: orphaned resources per kind, nothing is deleted"""
+    try:
+        report = await collector.collect_once(dry_run=True)
+    except Exception as e:
+        logger.error(f"Failed to scan for orphaned resources: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    report["enabled"] = settings.gc_enabled
+    report["status"] = collector.status()
+    return report
+
+@app.get("/monitor/images")
+async def get_image_status():
+    """VNC image tag, resolved and pinned digests, and per-node pre-pull status"""
+    try:
+        result = await asyncio.to_thread(prepuller.status)
+        if not settings.image_prepull_enabled:
+            # Nothing is stored yet; resolve the tag on demand
+            result["digest"] = await asyncio.to_thread(
+                prepuller.registry_client.resolve_digest, prepuller.repository, prepuller.reference
+            )
+    except Exception as e:
+        logger.error(f"Failed to get image status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    result["enabled"] = settings.image_prepull_enabled
+    return result
+
+@app.get("/monitor/capacity")
+async def get_capacity():
+    """Free capacity per schedulable node and how many default-size VNC pods still fit"""
+    if not capacity:
+        raise HTTPException(status_code=503, detail="Capacity admission is not enabled (CAPACITY_ADMISSION_ENABLED=false)")
+    result = capacity.status(settings.default_cpu_request, settings.default_memory_request)
+    result["synced"] = all(informer.has_synced for informer in capacity_informers)
+    return result
+
+@app.get("/monitor/quotas")
+async def get_quotas():
+    """Quota plans loaded by this worker, their version and number of assigned users"""
+    return quotas.status()
+
+@app.get("/monitor/placement")
+async def get_placement():
+    """Placement policies, per-node utilization and fragmentation of the free capacity"""
+    if not capacity:
+        raise HTTPException(status_code=503, detail="Placement policies are not configured (PLACEMENT_POLICIES is empty)")
+    result = capacity.utilization(settings.default_cpu_request, settings.default_memory_request)
+    result["synced"] = all(informer.has_synced for informer in capacity_informers)
+    result.update(placement.status() if placement else {"policies": {}})
+    return result
+
+@app.get("/monitor/rightsizing")
+async def get_rightsizing(user_id: Optional[str] = Query(None, description="Only this user's recommendation in detail")):
+    """Usage-based request/limit recommendations compared with the users' plans"""
+    if not rightsizer:
+        raise HTTPException(status_code=503, detail="Right-sizing is not enabled (RIGHTSIZING_ENABLED=false)")
+    try:
+        return await asyncio.to_thread(rightsizer.status, [user_id] if user_id else None)
+    except Exception as e:
+        logger.error(f"Failed to get right-sizing status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/pvc-pool")
+async def get_pvc_pool_status():
+    """Bound and pending pool PVCs per size class and, from the leader, the last refill pass"""
+    if not pvc_pool:
+        raise HTTPException(status_code=503, detail="PVC pool is not enabled (PVC_POOL_ENABLED=false)")
+    try:
+        return await asyncio.to_thread(pvc_pool.status)
+    except Exception as e:
+        logger.error(f"Failed to get PVC pool status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/cold-start")
+async def get_cold_start_phases():
+    """p50/p95/p99 of each cold-start phase over the last start of every environment in the registry"""
+    if not cold_start:
+        raise HTTPException(status_code=503, detail="Cold-start tracking is not enabled (COLD_START_TRACKING_ENABLED=false)")
+    try:
+        phases = await asyncio.to_thread(lambda: phase_percentiles(registry.iter_records()))
+    except Exception as e:
+        logger.error(f"Failed to summarize cold-start phases: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"phases": phases, "tracker": cold_start.status()}
+
+@app.get("/monitor/events")
+async def get_event_pipeline_stats():
+    """Lifecycle event pipeline counters, including events dropped under backpressure"""
+    return events.stats()
+
+def _require_store() -> EnvironmentStore:
+    if not store:
+        raise HTTPException(status_code=503, detail="History store is not enabled (DB_ENABLED=false)")
+    return store
+
+@app.get("/monitor/stats/pods-per-day")
+async def get_pods_per_day(days: int = Query(30, ge=1, le=366), user_id: Optional[str] = None):
+    """Environments created per day, from the PostgreSQL history store"""
+    history = _require_store()
+    try:
+        return {"days": days, "pods_per_day": await asyncio.to_thread(history.pods_per_day, days, user_id)}
+    except Exception as e:
+        logger.error(f"Failed to query pods per day: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/stats/cold-start")
+async def get_cold_start_stats(days: int = Query(7, ge=1, le=366)):
+    """Average and percentile cold-start time (creation -> Ready)"""
+    history = _require_store()
+    try:
+        return await asyncio.to_thread(history.cold_start_stats, days)
+    except Exception as e:
+        logger.error(f"Failed to query cold-start stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/monitor/stats/phases")
+async def get_phase_stats():
+    """Live environments per phase, from the registry and (if enabled) the history store"""
+    try:
+        result = {"registry": registry.count_by_phase()}
+        if store:
+            result["store"] = await asyncio.to_thread(store.environments_by_phase)
+            result["store_writer"] = store.writer.stats()
+        return result
+    except Exception as e:
+        logger.error(f"Failed to query phase stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Import additional modules
 import json
 import prometheus_client
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import Counter, Histogram, Gauge, multiprocess
 import time
 
 # Metrics
 pod_creation_counter = Counter('vnc_pod_creations_total', 'Total number of pod creation attempts')
 pod_deletion_counter = Counter('vnc_pod_deletions_total', 'Total number of pod deletion attempts')
-active_pods_gauge = Gauge('vnc_active_pods', 'Number of active VNC pods')
+active_pods_gauge = Gauge('vnc_active_pods', 'Number of active VNC pods', multiprocess_mode='livemostrecent')
 api_request_duration = Histogram('vnc_api_request_duration_seconds', 'API request duration')
 
 @app.get("/metrics")
 async def get_metrics():
-    """Prometheus metrics endpoint"""
-    return prometheus_client.generate_latest()
+    """Prometheus metrics endpoint (all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set)"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(prometheus_client.generate_latest(registry), media_type=prometheus_client.CONTENT_TYPE_LATEST)
+    return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     uvicorn.run(
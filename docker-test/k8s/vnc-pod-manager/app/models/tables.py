@@ -0,0 +1,71 @@
+"""SQLAlchemy tables for the PostgreSQL environment history store"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import BigInteger, DateTime, Float, Index, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+class Base(DeclarativeBase):
+    pass
+
+class Environment(Base):
+    """One row per created VNC pod (environment instance)"""
+
+    __tablename__ = "environments"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    pod_uid: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    pod_name: Mapped[str] = mapped_column(String(253), nullable=False)
+    pvc_name: Mapped[Optional[str]] = mapped_column(String(253))
+    node_name: Mapped[Optional[str]] = mapped_column(String(253))
+    phase: Mapped[Optional[str]] = mapped_column(String(32))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    ready_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    cold_start_seconds: Mapped[Optional[float]] = mapped_column(Float)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_environments_user_id_created_at", "user_id", "created_at"),
+        Index("ix_environments_created_at", "created_at"),
+        Index("ix_environments_phase", "phase"),
+    )
+
+class LifecycleEvent(Base):
+    """Append-only log of environment lifecycle events"""
+
+    __tablename__ = "lifecycle_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    pod_uid: Mapped[Optional[str]] = mapped_column(String(64))
+    event_type: Mapped[str] = mapped_column(String(64), nullable=False)
+    phase: Mapped[Optional[str]] = mapped_column(String(32))
+    occurred_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    details: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB)
+
+    __table_args__ = (
+        Index("ix_lifecycle_events_user_id_occurred_at", "user_id", "occurred_at"),
+        Index("ix_lifecycle_events_event_type_occurred_at", "event_type", "occurred_at"),
+    )
+
+class Session(Base):
+    """Period during which a user's environment was up and usable"""
+
+    __tablename__ = "sessions"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    pod_uid: Mapped[str] = mapped_column(String(64), nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    ended_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_sessions_user_id_started_at", "user_id", "started_at"),
+        Index("ix_sessions_pod_uid", "pod_uid", unique=True),
+    )
@@ -0,0 +1,161 @@
+"""
+In-process single-flight cache with stale-while-revalidate
+
+Concurrent misses for one key share a single load. A value is fresh for
+ttl seconds (with jitter, so keys filled together do not expire
+together) and may then be served stale for stale_ttl more seconds while
+one background refresh runs. Refreshes also start probabilistically before
+expiry (XFetch: the closer to expiry and the slower the load, the likelier
+an early refresh), so a hot key is refreshed by one request instead of
+being stampeded by all of them at the moment it expires.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+cache_requests_counter = Counter(
+    'vnc_read_cache_requests_total', 'Read cache lookups by outcome', ['cache', 'outcome']
+)
+
+class _Entry:
+    __slots__ = ("value", "delta", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, delta: float, expires_at: float, stale_until: float):
+        self.value = value
+        self.delta = delta  # seconds the load took
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+class SWRCache:
+    """Single-flight, stale-while-revalidate cache of async loads"""
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0, beta: float = 1.0,
+                 jitter: float = 0.1, max_entries: int = 10000):
+        """
+        Initialize cache
+
+        Args:
+            name: Cache name (metrics label)
+            ttl: Seconds a value is fresh
+            stale_ttl: Seconds after expiry a value is still served while refreshing
+            beta: XFetch early-refresh aggressiveness (0 disables early refresh)
+            jitter: Relative random spread applied to ttl
+            max_entries: Oldest entries are evicted beyond this
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.jitter = jitter
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._loads: Dict[Hashable, asyncio.Future] = {}
+        self._refreshes = set()  # strong references to running background refreshes
+        self._counts = {outcome: 0 for outcome in ("hit", "miss", "stale", "early_refresh", "coalesced")}
+
+    def _count(self, outcome: str):
+        self._counts[outcome] += 1
+        cache_requests_counter.labels(cache=self.name, outcome=outcome).inc()
+
+    def _should_refresh_early(self, entry: _Entry, now: float) -> bool:
+        if self.beta <= 0 or entry.delta <= 0:
+            return False
+        # -log(U) is exponentially distributed: usually small, occasionally large
+        return now - entry.delta * self.beta * math.log(1.0 - random.random()) >= entry.expires_at
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run the loader once per key; concurrent callers await the same future"""
+        future = self._loads.get(key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loads[key] = future
+        started = time.monotonic()
+        try:
+            value = await loader()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # retrieved; callers without a waiter must not warn
+            raise
+        finally:
+            self._loads.pop(key, None)
+
+        now = time.monotonic()
+        if value is not None:
+            # None (e.g. not found / invalid) is never cached
+            ttl = self.ttl * (1 + random.uniform(-self.jitter, self.jitter))
+            self._entries.pop(key, None)
+            self._entries[key] = _Entry(value, now - started, now + ttl, now + ttl + self.stale_ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        future.set_result(value)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        if key in self._loads:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.name} cache failed: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached value for key, loading it with loader() when missing or expired
+
+        Args:
+            key: Cache key, e.g. (user_id, pod_name)
+            loader: Coroutine factory producing the value
+
+        Returns:
+            Fresh, stale (refresh started) or newly loaded value
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.expires_at:
+                if self._should_refresh_early(entry, now):
+                    self._count("early_refresh")
+                    self._refresh_in_background(key, loader)
+                else:
+                    self._count("hit")
+                return entry.value
+            if now < entry.stale_until:
+                self._count("stale")
+                self._refresh_in_background(key, loader)
+                return entry.value
+
+        self._count("miss")
+        return await self._load(key, loader)
+
+    def invalidate(self, key: Hashable):
+        """Drop one key (e.g. after a mutation in this worker)"""
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every key matching predicate"""
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and lookup outcomes for monitoring"""
+        return {"entries": len(self._entries), "ttl": self.ttl, "stale_ttl": self.stale_ttl, **self._counts}
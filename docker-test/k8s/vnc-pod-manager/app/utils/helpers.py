@@ -57,51 +57,57 @@ def format_bytes(bytes_value: Union[int, float], precision: int = 2) -> str:
     
     return f"{bytes_value:.{precision}f} PB"
 
+# Kubernetes quantity suffixes (resource.Quantity): binary, decimal SI and the
+# legacy "K" accepted by earlier versions of this helper
+_QUANTITY_SUFFIXES = {
+    'Ki': 1024,
+    'Mi': 1024 ** 2,
+    'Gi': 1024 ** 3,
+    'Ti': 1024 ** 4,
+    'Pi': 1024 ** 5,
+    'Ei': 1024 ** 6,
+    'n': 1e-9,
+    'u': 1e-6,
+    'm': 1e-3,
+    '': 1,
+    'k': 1e3,
+    'K': 1e3,
+    'M': 1e6,
+    'G': 1e9,
+    'T': 1e12,
+    'P': 1e15,
+    'E': 1e18,
+}
+
+_QUANTITY_RE = re.compile(
+    r'^([+-]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+))'
+    r'(?:([eE][+-]?[0-9]+)|(Ki|Mi|Gi|Ti|Pi|Ei|[numkKMGTPE])?)$'
+)
+
 def parse_resource_string(resource: str) -> Optional[float]:
     """
     Parse Kubernetes resource string to float value
     
+    Accepts every quantity format: binary suffixes (Ki..Ei), decimal SI
+    suffixes (n, u, m, k, M..E) and decimal exponents ("1e3", "5E-1").
+    
     Args:
-        resource: Resource string (e.g., "100m", "1Gi", "2")
+        resource: Resource string (e.g., "100m", "1Gi", "2", "250000n")
         
     Returns:
-        Float value or None if invalid
+        Float value (cores for CPU, bytes for memory/storage) or None if invalid
     """
     if not resource:
         return None
     
-    # Handle CPU resources
-    if resource.endswith('m'):
-        # Millicores
-        try:
-            return float(resource[:-1]) / 1000
-        except ValueError:
-            return None
-    
-    # Handle memory resources
-    multipliers = {
-        'Ki': 1024,
-        'Mi': 1024 ** 2,
-        'Gi': 1024 ** 3,
-        'Ti': 1024 ** 4,
-        'K': 1000,
-        'M': 1000 ** 2,
-        'G': 1000 ** 3,
-        'T': 1000 ** 4,
-    }
-    
-    for suffix, multiplier in multipliers.items():
-        if resource.endswith(suffix):
-            try:
-                return float(resource[:-len(suffix)]) * multiplier
-            except ValueError:
-                return None
-    
-    # Plain number
-    try:
-        return float(resource)
-    except ValueError:
+    match = _QUANTITY_RE.match(str(resource).strip())
+    if not match:
         return None
+    
+    number, exponent, suffix = match.groups()
+    if exponent:
+        return float(number + exponent)
+    return float(number) * _QUANTITY_SUFFIXES[suffix or '']
 
 def sanitize_label(label: str) -> str:
     """
@@ -0,0 +1,32 @@
+"""Async token-bucket rate limiter for calls toward the apiserver"""
+
+import asyncio
+import time
+
+class AsyncRateLimiter:
+    """
+    Token bucket: allows `rate` operations per second with bursts up to `burst`
+
+    Waiters are served in order; acquire() sleeps until a token is available.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for one token"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,197 @@
+"""Helpers for streaming apiserver responses to API clients"""
+
+import json
+import math
+import time
+import zlib
+import logging
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from urllib3.exceptions import ReadTimeoutError
+
+logger = logging.getLogger(__name__)
+
+def iter_response_chunks(response, chunk_size: int = 8192) -> Iterator[bytes]:
+    """
+    Iterate over a non-preloaded urllib3 response without buffering it
+
+    Chunked responses (e.g. follow-mode logs) are yielded as soon as each
+    chunk arrives. The upstream connection is always closed and released,
+    including when the consumer stops iterating early.
+
+    Args:
+        response: urllib3 response opened with _preload_content=False
+        chunk_size: Maximum bytes read per iteration
+
+    Returns:
+        Iterator of raw byte chunks
+    """
+    try:
+        for chunk in response.stream(chunk_size, decode_content=True):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+def _parse_log_timestamp(ts: bytes) -> Optional[datetime]:
+    """Parse an RFC3339Nano log timestamp (fraction cut to microseconds)"""
+    text = ts.decode("ascii", errors="replace").replace("Z", "+00:00")
+    head, dot, rest = text.partition(".")
+    if dot:
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        text = f"{head}.{rest[:min(digits, 6)].ljust(6, '0')}{rest[digits:]}"
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+def _timestamp_key(ts: bytes) -> bytes:
+    """Sortable form of a UTC RFC3339Nano timestamp (fraction padded to nanoseconds)"""
+    head, _, fraction = ts.rstrip(b"Z").partition(b".")
+    return head + b"." + fraction.ljust(9, b"0")
+
+def iter_follow_chunks(open_stream: Callable[[Optional[int], Optional[int]], Any], chunk_size: int = 8192,
+                       timestamps: bool = False, limit_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Follow a pod log without pinning a thread while the pod is quiet
+
+    open_stream(since_seconds, limit_bytes) must open the log endpoint with
+    follow and timestamps enabled and a read timeout (since_seconds is None
+    for the first call, which applies the caller's own tail/since options).
+    When no line arrives within the timeout an empty chunk is yielded, which
+    hands control back to the server so a client disconnect can end the
+    response, and the stream is reopened from the last line seen; lines at
+    or before that line's timestamp are skipped. A reopened stream is only
+    given the part of limit_bytes not yet returned (counted as the
+    apiserver does, with timestamps), and the stream ends once it is used.
+
+    Args:
+        open_stream: Opens a non-preloaded follow-mode log response
+        chunk_size: Maximum bytes read per iteration
+        timestamps: Keep the leading timestamp in the yielded lines
+        limit_bytes: Byte budget of the whole stream (None: unlimited)
+
+    Returns:
+        Iterator of complete log lines (and empty chunks while idle)
+    """
+    last_key = None
+    last_time = None
+    opened_at = time.time()
+    since_seconds = None
+    remaining = limit_bytes
+    while True:
+        response = open_stream(since_seconds, remaining)
+        pending = b""
+        try:
+            for chunk in response.stream(chunk_size, decode_content=True):
+                pending += chunk
+                lines = pending.split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    ts, _, text = line.partition(b" ")
+                    key = _timestamp_key(ts)
+                    if last_key is not None and key <= last_key:
+                        continue  # replayed after reopening
+                    last_key, last_time = key, _parse_log_timestamp(ts) or last_time
+                    if remaining is not None:
+                        remaining -= len(line) + 1
+                    yield (line if timestamps else text) + b"\n"
+            if pending:
+                yield (pending if timestamps else pending.partition(b" ")[2]) + b"\n"
+            return  # the container exited
+        except ReadTimeoutError:
+            yield b""
+        finally:
+            response.close()
+            response.release_conn()
+        if remaining is not None and remaining <= 0:
+            return  # limit_bytes already returned
+        # Reopen slightly before the last line; clock skew is covered by the timestamp check
+        start = last_time.timestamp() if last_time else opened_at
+        since_seconds = max(1, math.ceil(time.time() - start) + 2)
+
+def iter_ndjson_lines(chunks: Iterable[bytes], pod_name: str, timestamps: bool = False) -> Iterator[bytes]:
+    """
+    Convert a raw log byte stream into NDJSON records, one per log line
+
+    Args:
+        chunks: Raw log byte chunks
+        pod_name: Pod name included in every record
+        timestamps: Whether lines carry a leading RFC3339 timestamp
+
+    Returns:
+        Iterator of encoded NDJSON lines
+    """
+    pending = b""
+    for chunk in chunks:
+        if not chunk:
+            yield b""  # idle heartbeat from iter_follow_chunks
+            continue
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield _encode_log_record(line, pod_name, timestamps)
+
+    # Flush a trailing line without newline (e.g. cut by limit_bytes)
+    if pending:
+        yield _encode_log_record(pending, pod_name, timestamps)
+
+def _encode_log_record(line: bytes, pod_name: str, timestamps: bool) -> bytes:
+    """Encode a single log line as an NDJSON record"""
+    text = line.decode("utf-8", errors="replace").rstrip("\r")
+    record = {"pod_name": pod_name}
+    if timestamps:
+        ts, sep, message = text.partition(" ")
+        if sep:
+            record["timestamp"] = ts
+            text = message
+    record["line"] = text
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip-compress a byte stream incrementally
+
+    Each chunk is sync-flushed so follow-mode clients receive data as soon
+    as it is produced instead of waiting for the compressor buffer to fill.
+
+    Args:
+        chunks: Uncompressed byte chunks
+        level: zlib compression level
+
+    Returns:
+        Iterator of gzip-encoded byte chunks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        if not chunk:
+            yield b""  # idle heartbeat from iter_follow_chunks
+            continue
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Check whether an Accept-Encoding header allows gzip
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        True if gzip is acceptable
+    """
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        return True
+    return False
@@ -0,0 +1,184 @@
+"""
+Benchmark: kubernetes model deserialization vs raw-JSON projection
+
+Builds a synthetic PodList / ServiceList body shaped like the VNC pods the
+manager creates and times both list paths offline (no cluster needed):
+
+- model:      ApiClient.deserialize(...) into V1PodList, then read fields
+- projection: orjson.loads + PodRecord.from_item (app.core.k8s_projection)
+
+Usage:
+    python benchmarks/bench_list_projection.py [--pods 500] [--services 2000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from kubernetes import client  # noqa: E402
+
+from app.core.k8s_projection import PodRecord, ServiceRecord, load_list_body, project_items  # noqa: E402
+
+class _FakeResponse:
+    """Minimal stand-in for the urllib3 response the client returns"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def release_conn(self):
+        pass
+
+def _pod_item(i: int) -> dict:
+    user_id = f"user{i}"
+    return {
+        "metadata": {
+            "name": f"vnc-{user_id}",
+            "namespace": "vnc-pods",
+            "uid": f"00000000-0000-0000-0000-{i:012d}",
+            "resourceVersion": str(100000 + i),
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": {"app": "vnc", "user": user_id, "managed-by": "vnc-manager"},
+            "annotations": {"vnc-manager/token": "abcdefgh", "vnc-manager/created-at": "now"},
+            "managedFields": [{
+                "manager": "python", "operation": "Update", "apiVersion": "v1",
+                "time": "2024-01-01T00:00:00Z", "fieldsType": "FieldsV1",
+                "fieldsV1": {"f:metadata": {"f:labels": {".": {}, "f:app": {}, "f:user": {}}}}
+            }]
+        },
+        "spec": {
+            "nodeName": f"node-{i % 8}",
+            "restartPolicy": "Always",
+            "dnsPolicy": "ClusterFirst",
+            "terminationGracePeriodSeconds": 30,
+            "containers": [{
+                "name": "vnc",
+                "image": "192.168.10.252:31832/vnc/void-desktop:latest",
+                "ports": [
+                    {"containerPort": 5901, "name": "vnc", "protocol": "TCP"},
+                    {"containerPort": 6080, "name": "novnc", "protocol": "TCP"},
+                    {"containerPort": 22, "name": "ssh", "protocol": "TCP"}
+                ],
+                "env": [
+                    {"name": "USER_ID", "value": user_id},
+                    {"name": "DISPLAY", "value": ":1"},
+                    {"name": "VNC_RESOLUTION", "value": "1920x1080"},
+                    {"name": "VNC_DEPTH", "value": "24"}
+                ],
+                "resources": {
+                    "requests": {"cpu": "500m", "memory": "1Gi"},
+                    "limits": {"cpu": "2", "memory": "4Gi"}
+                },
+                "volumeMounts": [
+                    {"name": "user-data", "mountPath": "/home/void/workspace"},
+                    {"name": "shm", "mountPath": "/dev/shm"}
+                ],
+                "livenessProbe": {"tcpSocket": {"port": 5901}, "initialDelaySeconds": 30, "periodSeconds": 10},
+                "readinessProbe": {"tcpSocket": {"port": 5901}, "initialDelaySeconds": 10, "periodSeconds": 5}
+            }],
+            "volumes": [
+                {"name": "user-data", "persistentVolumeClaim": {"claimName": f"pvc-{user_id}"}},
+                {"name": "shm", "emptyDir": {"medium": "Memory", "sizeLimit": "2Gi"}}
+            ]
+        },
+        "status": {
+            "phase": "Running",
+            "hostIP": f"192.168.10.{i % 8 + 10}",
+            "podIP": f"10.244.{i // 250}.{i % 250}",
+            "startTime": "2024-01-01T00:00:05Z",
+            "conditions": [
+                {"type": t, "status": "True", "lastTransitionTime": "2024-01-01T00:00:30Z"}
+                for t in ("Initialized", "Ready", "ContainersReady", "PodScheduled")
+            ],
+            "containerStatuses": [{
+                "name": "vnc", "ready": True, "restartCount": 0,
+                "image": "192.168.10.252:31832/vnc/void-desktop:latest",
+                "imageID": "docker-pullable://vnc/void-desktop@sha256:" + "0" * 64,
+                "state": {"running": {"startedAt": "2024-01-01T00:00:10Z"}}
+            }]
+        }
+    }
+
+def _service_item(i: int) -> dict:
+    return {
+        "metadata": {
+            "name": f"svc-{i}",
+            "namespace": f"ns-{i % 20}",
+            "creationTimestamp": "2024-01-01T00:00:00Z",
+            "labels": {"app": f"app-{i}"}
+        },
+        "spec": {
+            "type": "NodePort" if i % 3 == 0 else "ClusterIP",
+            "clusterIP": f"10.96.{i // 250}.{i % 250}",
+            "selector": {"app": f"app-{i}"},
+            "ports": [
+                {"name": "http", "port": 80, "targetPort": 8080, "protocol": "TCP",
+                 "nodePort": 30000 + i % 2000 if i % 3 == 0 else None}
+            ]
+        },
+        "status": {"loadBalancer": {}}
+    }
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pods", type=int, default=500)
+    parser.add_argument("--services", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    api_client = client.ApiClient()
+    pod_body = json.dumps({"kind": "PodList", "apiVersion": "v1", "metadata": {},
+                           "items": [_pod_item(i) for i in range(args.pods)]}).encode()
+    svc_body = json.dumps({"kind": "ServiceList", "apiVersion": "v1", "metadata": {},
+                           "items": [_service_item(i) for i in range(args.services)]}).encode()
+
+    def pods_model():
+        pods = api_client.deserialize(_FakeResponse(pod_body), "V1PodList")
+        return [
+            (p.metadata.name, p.status.phase, p.metadata.creation_timestamp,
+             p.status.pod_ip, p.status.host_ip, p.metadata.labels.get("user"))
+            for p in pods.items
+        ]
+
+    def pods_projection():
+        return project_items(load_list_body(_FakeResponse(pod_body)), PodRecord)
+
+    def services_model():
+        services = api_client.deserialize(_FakeResponse(svc_body), "V1ServiceList")
+        ports = set()
+        for svc in services.items:
+            if svc.spec.type == "NodePort" and svc.spec.ports:
+                ports.update(p.node_port for p in svc.spec.ports if p.node_port)
+        return ports
+
+    def services_projection():
+        ports = set()
+        for svc in project_items(load_list_body(_FakeResponse(svc_body)), ServiceRecord):
+            if svc.type == "NodePort":
+                ports.update(svc.node_ports)
+        return ports
+
+    assert services_model() == services_projection()
+
+    print(f"{'case':<32}{'model (ms)':>12}{'projection (ms)':>18}{'speedup':>10}")
+    for label, model_fn, proj_fn in (
+        (f"list pods ({args.pods}, {len(pod_body) // 1024} KiB)", pods_model, pods_projection),
+        (f"list services ({args.services}, {len(svc_body) // 1024} KiB)", services_model, services_projection),
+    ):
+        model_s = _time(model_fn, args.repeat)
+        proj_s = _time(proj_fn, args.repeat)
+        print(f"{label:<32}{model_s * 1000:>12.2f}{proj_s * 1000:>18.2f}{model_s / proj_s:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark: per-create manifest building, V1* models vs precompiled templates
+
+Times building the pod, Service and Ingress request bodies of one create
+request and turning them into the JSON the client sends, offline (no
+cluster needed):
+
+- model:    client.V1Pod/V1Service/V1Ingress trees (the previous code path),
+            then ApiClient.sanitize_for_serialization + json.dumps
+- template: app.core.manifests.render, then the same serialization
+
+Both paths are checked to produce identical bodies first.
+
+Usage:
+    python benchmarks/bench_manifests.py [--creates 2000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from kubernetes import client  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.core import manifests  # noqa: E402
+
+QUOTA = {"cpu_request": "500m", "cpu_limit": "2", "memory_request": "1Gi", "memory_limit": "4Gi"}
+DOMAIN = "vnc.service.thinkgs.cn"
+IMAGE = f"{settings.k8s_image_registry}/{settings.k8s_vnc_image}"
+
+def _labels(user_id: str) -> dict:
+    return {"app": "vnc", "user": user_id, "managed-by": "vnc-manager"}
+
+def _secret_env(name: str, secret: str, key: str) -> client.V1EnvVar:
+    return client.V1EnvVar(
+        name=name,
+        value_from=client.V1EnvVarSource(
+            secret_key_ref=client.V1SecretKeySelector(name=secret, key=key, optional=True)
+        )
+    )
+
+def model_pod(user_id: str) -> client.V1Pod:
+    """The V1Pod create_vnc_pod used to build"""
+    secret = f"vnc-cred-{user_id}"
+    probe = dict(tcp_socket=client.V1TCPSocketAction(port=5901))
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(
+            name=f"vnc-{user_id}",
+            namespace=settings.k8s_namespace_pods,
+            labels=_labels(user_id),
+            annotations={"vnc-manager/credentials": secret, "vnc-manager/created-at": "now"}
+        ),
+        spec=client.V1PodSpec(
+            containers=[client.V1Container(
+                name="vnc",
+                image=IMAGE,
+                ports=[
+                    client.V1ContainerPort(container_port=5901, name="vnc", protocol="TCP"),
+                    client.V1ContainerPort(container_port=6080, name="novnc", protocol="TCP"),
+                    client.V1ContainerPort(container_port=22, name="ssh", protocol="TCP")
+                ],
+                env=[
+                    client.V1EnvVar(name="USER_ID", value=user_id),
+                    _secret_env("VNC_PASSWORD", secret, "vnc-password"),
+                    _secret_env("VOID_SK_TOKEN", secret, "void-sk-token"),
+                    client.V1EnvVar(name="VNC_CREDENTIALS_DIR", value=settings.vnc_credentials_mount_path),
+                    client.V1EnvVar(name="DISPLAY", value=":1"),
+                    client.V1EnvVar(name="VNC_RESOLUTION", value="1920x1080"),
+                    client.V1EnvVar(name="VNC_DEPTH", value="24")
+                ],
+                resources=client.V1ResourceRequirements(
+                    requests={"cpu": QUOTA["cpu_request"], "memory": QUOTA["memory_request"]},
+                    limits={"cpu": QUOTA["cpu_limit"], "memory": QUOTA["memory_limit"]}
+                ),
+                volume_mounts=[
+                    client.V1VolumeMount(name="user-data", mount_path="/home/void/workspace"),
+                    client.V1VolumeMount(name="shm", mount_path="/dev/shm"),
+                    client.V1VolumeMount(name="credentials", mount_path=settings.vnc_credentials_mount_path,
+                                         read_only=True)
+                ],
+                security_context=client.V1SecurityContext(
+                    capabilities=client.V1Capabilities(add=["SYS_ADMIN"]),
+                    run_as_user=0, run_as_group=0, allow_privilege_escalation=True
+                ),
+                liveness_probe=client.V1Probe(**probe, initial_delay_seconds=30, period_seconds=10,
+                                              timeout_seconds=5, failure_threshold=3),
+                readiness_probe=client.V1Probe(**probe, initial_delay_seconds=10, period_seconds=5,
+                                               timeout_seconds=3, failure_threshold=3)
+            )],
+            volumes=[
+                client.V1Volume(
+                    name="user-data",
+                    persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=f"pvc-{user_id}")
+                ),
+                client.V1Volume(name="shm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory", size_limit="2Gi")),
+                client.V1Volume(
+                    name="credentials",
+                    projected=client.V1ProjectedVolumeSource(
+                        sources=[client.V1VolumeProjection(secret=client.V1SecretProjection(name=secret))],
+                        default_mode=0o400
+                    )
+                )
+            ],
+            restart_policy="Always",
+            dns_policy="ClusterFirst",
+            termination_grace_period_seconds=30
+        )
+    )
+
+def model_service(user_id: str) -> client.V1Service:
+    """The V1Service create_pod_service used to build"""
+    return client.V1Service(
+        metadata=client.V1ObjectMeta(
+            name=f"vnc-service-{user_id}", namespace=settings.k8s_namespace_pods, labels=_labels(user_id)
+        ),
+        spec=client.V1ServiceSpec(
+            type="ClusterIP",
+            selector={"app": "vnc", "user": user_id},
+            ports=[
+                client.V1ServicePort(name=name, port=port, target_port=port, protocol="TCP")
+                for name, port in (("vnc", 5901), ("novnc", 6080), ("ssh", 22))
+            ]
+        )
+    )
+
+def model_ingress(user_id: str) -> client.V1Ingress:
+    """The V1Ingress create_pod_ingress used to build"""
+    service_name = f"vnc-service-{user_id}"
+
+    def path(suffix: str, port: int) -> client.V1HTTPIngressPath:
+        return client.V1HTTPIngressPath(
+            path=f"/user/{user_id}{suffix}(/|$)(.*)",
+            path_type="ImplementationSpecific",
+            backend=client.V1IngressBackend(
+                service=client.V1IngressServiceBackend(
+                    name=service_name, port=client.V1ServiceBackendPort(number=port)
+                )
+            )
+        )
+
+    return client.V1Ingress(
+        metadata=client.V1ObjectMeta(
+            name=f"vnc-ingress-{user_id}",
+            namespace=settings.k8s_namespace_pods,
+            labels=_labels(user_id),
+            annotations={
+                "nginx.ingress.kubernetes.io/proxy-body-size": "0",
+                "nginx.ingress.kubernetes.io/proxy-read-timeout": "3600",
+                "nginx.ingress.kubernetes.io/proxy-send-timeout": "3600",
+                "nginx.ingress.kubernetes.io/proxy-connect-timeout": "3600",
+                "nginx.ingress.kubernetes.io/rewrite-target": "/$2",
+                "nginx.ingress.kubernetes.io/websocket-services": service_name,
+                "nginx.ingress.kubernetes.io/upstream-hash-by": "$remote_addr",
+                "nginx.ingress.kubernetes.io/ssl-redirect": "false",
+                "nginx.ingress.kubernetes.io/enable-cors": "true",
+                "nginx.ingress.kubernetes.io/cors-allow-origin": "*",
+                "nginx.ingress.kubernetes.io/cors-allow-methods": "GET, POST, OPTIONS",
+                "nginx.ingress.kubernetes.io/cors-allow-headers": "DNT,X-CustomHeader,Keep-Alive,User-Agent,X-Requested-With,If-Modified-Since,Cache-Control,Content-Type,Authorization",
+                "nginx.ingress.kubernetes.io/use-regex": "true",
+                "nginx.ingress.kubernetes.io/affinity": "cookie",
+                "nginx.ingress.kubernetes.io/affinity-mode": "persistent",
+                "nginx.ingress.kubernetes.io/session-cookie-name": f"vnc-session-{user_id}",
+                "nginx.ingress.kubernetes.io/session-cookie-max-age": "86400"
+            }
+        ),
+        spec=client.V1IngressSpec(
+            ingress_class_name="nginx",
+            rules=[client.V1IngressRule(
+                host=DOMAIN,
+                http=client.V1HTTPIngressRuleValue(paths=[
+                    path("/novnc", 6080), path("/websockify", 6080), path("/vnc", 5901), path("", 6080)
+                ])
+            )]
+        )
+    )
+
+def model_bodies(user_id: str):
+    return model_pod(user_id), model_service(user_id), model_ingress(user_id)
+
+def template_bodies(user_id: str):
+    return (
+        manifests.render("pod", user_id=user_id, credentials_secret=f"vnc-cred-{user_id}", image=IMAGE,
+                         pvc_name=f"pvc-{user_id}", **QUOTA),
+        manifests.render("service", user_id=user_id),
+        manifests.render("ingress", user_id=user_id, domain=DOMAIN)
+    )
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creates", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    api_client = client.ApiClient()
+    sanitize = api_client.sanitize_for_serialization
+    users = [f"user{i}" for i in range(args.creates)]
+
+    manifests.compile_templates()
+    for model, body in zip(model_bodies(users[0]), template_bodies(users[0])):
+        # Models leave apiVersion/kind to the client; the templates carry them
+        rendered = {k: v for k, v in sanitize(body).items() if k not in ("apiVersion", "kind")}
+        assert sanitize(model) == rendered, f"template differs from {type(model).__name__}"
+
+    def build_models():
+        for user_id in users:
+            model_bodies(user_id)
+
+    def build_templates():
+        for user_id in users:
+            template_bodies(user_id)
+
+    def send_models():
+        for user_id in users:
+            for body in model_bodies(user_id):
+                json.dumps(sanitize(body))
+
+    def send_templates():
+        for user_id in users:
+            for body in template_bodies(user_id):
+                json.dumps(sanitize(body))
+
+    print(f"{'case (per create: pod + service + ingress)':<46}{'model (us)':>12}{'template (us)':>15}{'speedup':>10}")
+    for label, model_fn, template_fn in (
+        ("build bodies", build_models, build_templates),
+        ("build + serialize request JSON", send_models, send_templates),
+    ):
+        model_s = _time(model_fn, args.repeat) / args.creates
+        template_s = _time(template_fn, args.repeat) / args.creates
+        print(f"{label:<46}{model_s * 1e6:>12.1f}{template_s * 1e6:>15.1f}{model_s / template_s:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
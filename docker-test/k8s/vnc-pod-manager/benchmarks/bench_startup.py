@@ -0,0 +1,156 @@
+"""
+Benchmark: API import time and time to first served request
+
+Measures, in fresh subprocesses:
+
+- import:        wall time of `import app.main` plus the slowest modules
+                 reported by `python -X importtime`
+- first request: time from spawning uvicorn until GET /health returns 200,
+                 and until /ready reports warm-up completion (if it does)
+
+No cluster is required: a throwaway kubeconfig pointing at an unroutable
+apiserver is generated, so the numbers show how long the critical startup
+path takes while dependencies are unavailable or slow.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--port 18000] [--ready-timeout 5]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+KUBECONFIG = """apiVersion: v1
+kind: Config
+clusters:
+- name: bench
+  cluster:
+    server: https://127.0.0.1:1
+contexts:
+- name: bench
+  context:
+    cluster: bench
+    user: bench
+current-context: bench
+users:
+- name: bench
+  user:
+    token: bench
+"""
+
+def _env(kubeconfig_path: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "KUBECONFIG": kubeconfig_path,
+        "K8S_IN_CLUSTER": "false",
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": "1",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+def measure_import(env: dict):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=ROOT, env=env, check=True)
+    wall = time.perf_counter() - start
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules.append((int(cumulative), name.strip()))
+        except ValueError:
+            continue
+    top_level = [m for m in modules if not m[1].startswith(" ") and "." not in m[1]]
+    top_level.sort(reverse=True)
+    return wall, top_level[:8]
+
+def _get(url: str, timeout: float = 0.5) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return 0
+
+def measure_first_request(env: dict, port: int, ready_timeout: float):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_request = ready = None
+    try:
+        deadline = start + 60
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            if _get(f"http://127.0.0.1:{port}/health") == 200:
+                first_request = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+
+        ready_deadline = time.perf_counter() + ready_timeout
+        while first_request is not None and time.perf_counter() < ready_deadline:
+            if _get(f"http://127.0.0.1:{port}/ready", timeout=2) == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return first_request, ready
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--ready-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".kubeconfig", delete=False) as f:
+        f.write(KUBECONFIG)
+        kubeconfig_path = f.name
+
+    try:
+        env = _env(kubeconfig_path)
+
+        import_times = []
+        top_modules = []
+        for _ in range(args.runs):
+            wall, top_modules = measure_import(env)
+            import_times.append(wall)
+        print(f"import app.main (wall, incl. interpreter): best {min(import_times) * 1000:.0f} ms "
+              f"over {args.runs} run(s)")
+        print("slowest top-level imports (cumulative):")
+        for micros, name in top_modules:
+            print(f"  {name:<24}{micros / 1000:>8.1f} ms")
+
+        for run in range(args.runs):
+            first_request, ready = measure_first_request(env, args.port, args.ready_timeout)
+            ready_str = f"{ready * 1000:.0f} ms" if ready else f"not ready after {args.ready_timeout:.0f}s (dependencies unreachable)"
+            print(f"run {run + 1}: first /health 200 after {first_request * 1000:.0f} ms; /ready: {ready_str}")
+    finally:
+        os.unlink(kubeconfig_path)
+
+if __name__ == "__main__":
+    main()
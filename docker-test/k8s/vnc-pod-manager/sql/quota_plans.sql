@@ -0,0 +1,59 @@
+-- Per-user resource quotas (MySQL, same database as im_user)
+--
+-- A plan's values are both the defaults of a new pod and the ceiling a
+-- create request may override downwards to. Users without a row in
+-- vnc_user_quota get the plan named by QUOTA_DEFAULT_PLAN.
+--
+-- Every change bumps vnc_quota_meta.version (triggers below); each API
+-- worker polls that row and reloads both tables only when it changed.
+-- Bulk edits made with the triggers disabled must bump it by hand:
+--   UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+
+CREATE TABLE IF NOT EXISTS vnc_quota_plan (
+    name            VARCHAR(64)  NOT NULL PRIMARY KEY,
+    cpu_request     VARCHAR(32)  NOT NULL,
+    cpu_limit       VARCHAR(32)  NOT NULL,
+    memory_request  VARCHAR(32)  NOT NULL,
+    memory_limit    VARCHAR(32)  NOT NULL,
+    storage         VARCHAR(32)  NOT NULL,
+    updated_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS vnc_user_quota (
+    user_id     BIGINT       NOT NULL PRIMARY KEY,  -- im_user.id
+    plan        VARCHAR(64)  NOT NULL,
+    updated_at  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT fk_vnc_user_quota_plan FOREIGN KEY (plan) REFERENCES vnc_quota_plan (name) ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS vnc_quota_meta (
+    id       TINYINT  NOT NULL PRIMARY KEY,
+    version  BIGINT   NOT NULL
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO vnc_quota_meta (id, version) VALUES (1, 1);
+
+INSERT IGNORE INTO vnc_quota_plan (name, cpu_request, cpu_limit, memory_request, memory_limit, storage) VALUES
+    ('default', '500m', '2', '1Gi', '4Gi', '10Gi'),
+    ('pro',     '1',    '4', '2Gi', '8Gi', '20Gi'),
+    ('team',    '2',    '8', '4Gi', '16Gi', '50Gi');
+
+DROP TRIGGER IF EXISTS vnc_quota_plan_ai;
+DROP TRIGGER IF EXISTS vnc_quota_plan_au;
+DROP TRIGGER IF EXISTS vnc_quota_plan_ad;
+DROP TRIGGER IF EXISTS vnc_user_quota_ai;
+DROP TRIGGER IF EXISTS vnc_user_quota_au;
+DROP TRIGGER IF EXISTS vnc_user_quota_ad;
+
+CREATE TRIGGER vnc_quota_plan_ai AFTER INSERT ON vnc_quota_plan FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER vnc_quota_plan_au AFTER UPDATE ON vnc_quota_plan FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER vnc_quota_plan_ad AFTER DELETE ON vnc_quota_plan FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER vnc_user_quota_ai AFTER INSERT ON vnc_user_quota FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER vnc_user_quota_au AFTER UPDATE ON vnc_user_quota FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
+CREATE TRIGGER vnc_user_quota_ad AFTER DELETE ON vnc_user_quota FOR EACH ROW
+    UPDATE vnc_quota_meta SET version = version + 1 WHERE id = 1;
@@ -0,0 +1,9 @@
+"""Shared fixtures"""
+
+import pytest
+
+@pytest.fixture
+def redis_client():
+    """In-memory Redis (fakeredis, with Lua scripting for the registered scripts)"""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(decode_responses=True)
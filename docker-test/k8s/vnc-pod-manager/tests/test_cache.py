@@ -0,0 +1,118 @@
+import asyncio
+import types
+
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import SWRCache
+
+class _Loader:
+    def __init__(self, values, delay=0.01):
+        self.values = list(values)
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.values.pop(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the cache module"""
+    now = [1000.0]
+    # Replace the module's time only; the event loop keeps the real clock
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def test_concurrent_misses_share_one_load():
+    cache = SWRCache("test", ttl=60, beta=0)
+    loader = _Loader(["value"])
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert loader.calls == 1
+    assert cache.stats()["miss"] == 5
+    assert cache.stats()["coalesced"] == 4
+
+def test_fresh_hits_and_invalidation():
+    cache = SWRCache("test", ttl=60, beta=0)
+    loader = _Loader(["a", "b", "c"], delay=0)
+
+    async def main():
+        first = await cache.get_or_load(("1", "x"), loader)
+        hit = await cache.get_or_load(("1", "x"), loader)
+        cache.invalidate(("1", "x"))
+        reloaded = await cache.get_or_load(("1", "x"), loader)
+        cache.invalidate_where(lambda key: key[0] == "1")
+        return first, hit, reloaded, await cache.get_or_load(("1", "x"), loader)
+
+    assert asyncio.run(main()) == ("a", "a", "b", "c")
+    assert cache.stats()["hit"] == 1
+
+def test_none_is_not_cached():
+    cache = SWRCache("test", ttl=60, beta=0)
+    loader = _Loader([None, "found"], delay=0)
+
+    async def main():
+        return await cache.get_or_load("k", loader), await cache.get_or_load("k", loader)
+
+    assert asyncio.run(main()) == (None, "found")
+    assert loader.calls == 2
+
+def test_expired_entry_is_served_stale_while_one_refresh_runs(clock):
+    cache = SWRCache("test", ttl=10, stale_ttl=30, beta=0, jitter=0)
+    loader = _Loader(["old", "new"])
+
+    async def main():
+        await cache.get_or_load("k", loader)
+        clock[0] += 20
+        stale = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(3)))
+        await asyncio.sleep(0.05)
+        return stale, await cache.get_or_load("k", loader)
+
+    stale, refreshed = asyncio.run(main())
+    assert stale == ["old"] * 3
+    assert refreshed == "new"
+    assert loader.calls == 2
+    assert cache.stats()["stale"] == 3
+
+def test_entry_past_the_stale_window_is_reloaded(clock):
+    cache = SWRCache("test", ttl=10, stale_ttl=5, beta=0, jitter=0)
+    loader = _Loader(["old", "new"], delay=0)
+
+    async def main():
+        await cache.get_or_load("k", loader)
+        clock[0] += 20
+        return await cache.get_or_load("k", loader)
+
+    assert asyncio.run(main()) == "new"
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = SWRCache("test", ttl=60, beta=0)
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("apiserver down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+    assert len(calls) == 1
+    assert cache.stats()["entries"] == 0
+
+def test_max_entries_evicts_the_oldest():
+    cache = SWRCache("test", ttl=60, beta=0, max_entries=2)
+
+    async def main():
+        for key in "abc":
+            await cache.get_or_load(key, _Loader([key], delay=0))
+
+    asyncio.run(main())
+    assert cache.stats()["entries"] == 2
+    assert "a" not in cache._entries
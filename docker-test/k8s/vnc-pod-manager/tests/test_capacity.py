@@ -0,0 +1,153 @@
+import pytest
+
+from app.core.capacity import (
+    RESERVATIONS_KEY, AdmissionRejected, CapacityModel, node_matches, pod_requests, project_node, project_pod
+)
+
+GI = 1024 ** 3
+
+def raw_node(name, cpu="4", memory="8Gi", labels=None, ready=True, unschedulable=False, taints=None):
+    return {
+        "metadata": {"name": name, "resourceVersion": "1", "labels": labels or {}},
+        "spec": {"unschedulable": unschedulable, "taints": taints or []},
+        "status": {
+            "conditions": [{"type": "Ready", "status": "True" if ready else "False"}],
+            "allocatable": {"cpu": cpu, "memory": memory, "pods": "110"}
+        }
+    }
+
+def raw_pod(name, node=None, cpu="1", memory="1Gi", namespace="vnc", user=None, phase="Running"):
+    return {
+        "metadata": {"name": name, "namespace": namespace, "resourceVersion": "1",
+                     "labels": {"user": user} if user else {}},
+        "spec": {"nodeName": node, "containers": [{"resources": {"requests": {"cpu": cpu, "memory": memory}}}]},
+        "status": {"phase": phase}
+    }
+
+def selector(key, operator, *values):
+    return [{"matchExpressions": [{"key": key, "operator": operator, "values": list(values)}]}]
+
+@pytest.fixture
+def model(redis_client):
+    return CapacityModel("vnc", redis_client)
+
+def add_node(model, *args, **kwargs):
+    model.on_node("ADDED", project_node(raw_node(*args, **kwargs)), None)
+
+def add_pod(model, *args, **kwargs):
+    pod = project_pod(raw_pod(*args, **kwargs))
+    model.on_pod("ADDED", pod, None)
+    return pod
+
+def test_pod_requests_takes_larger_of_containers_and_init_plus_overhead():
+    pod = {"spec": {
+        "containers": [{"resources": {"requests": {"cpu": "250m", "memory": "256Mi"}}},
+                       {"resources": {"requests": {"cpu": "250m"}}}],
+        "initContainers": [{"resources": {"requests": {"cpu": "1", "memory": "128Mi"}}}],
+        "overhead": {"cpu": "100m"}
+    }}
+    cpu, memory, pods = pod_requests(pod)
+    assert cpu == pytest.approx(1.1)
+    assert memory == 256 * 1024 ** 2
+    assert pods == 1
+
+def test_project_node_drops_unschedulable_nodes():
+    assert project_node(raw_node("a"))["allocatable"] == (4.0, 8 * GI, 110)
+    assert project_node(raw_node("a", ready=False))["allocatable"] is None
+    assert project_node(raw_node("a", unschedulable=True))["allocatable"] is None
+    assert project_node(raw_node("a", taints=[{"effect": "NoSchedule"}]))["allocatable"] is None
+    assert project_node(raw_node("a", taints=[{"effect": "PreferNoSchedule"}]))["allocatable"] is not None
+
+@pytest.mark.parametrize("terms, expected", [
+    (None, True),
+    ([], True),
+    (selector("pool", "In", "a", "b"), True),
+    (selector("pool", "In", "c"), False),
+    (selector("pool", "NotIn", "c"), True),
+    (selector("pool", "Exists"), True),
+    (selector("gpu", "Exists"), False),
+    (selector("gpu", "DoesNotExist"), True),
+    (selector("cores", "Gt", "8"), True),
+    (selector("cores", "Lt", "8"), False),
+    (selector("pool", "Gt", "1"), False),
+    (selector("pool", "Unknown", "a"), False),
+    # expressions of a term are ANDed
+    ([{"matchExpressions": [{"key": "pool", "operator": "In", "values": ["a"]},
+                            {"key": "gpu", "operator": "Exists"}]}], False),
+    # terms are ORed
+    (selector("pool", "In", "c") + selector("cores", "In", "16"), True),
+])
+def test_node_matches(terms, expected):
+    assert node_matches({"pool": "a", "cores": "16"}, terms) is expected
+
+def test_admit_reserves_until_the_pod_is_seen(model, redis_client):
+    add_node(model, "a", cpu="2")
+    model.admit("1", "1", "1Gi")
+    model.admit("2", "1", "1Gi")
+    with pytest.raises(AdmissionRejected):
+        model.admit("3", "1", "1Gi")
+
+    # The informer delivering user 1's pod replaces its reservation
+    add_pod(model, "vnc-1", user="1", phase="Pending")
+    assert set(redis_client.hgetall(RESERVATIONS_KEY)) == {"2"}
+    with pytest.raises(AdmissionRejected):
+        model.admit("3", "1", "1Gi")
+
+    model.release("2")
+    model.admit("3", "1", "1Gi")
+
+def test_reservations_are_shared_between_models(redis_client):
+    first = CapacityModel("vnc", redis_client)
+    second = CapacityModel("vnc", redis_client)
+    for model in (first, second):
+        add_node(model, "a", cpu="2")
+    first.admit("1", "2", "1Gi")
+    with pytest.raises(AdmissionRejected):
+        second.admit("2", "1", "1Gi")
+
+def test_admit_counts_pending_and_scheduled_pods(model):
+    add_node(model, "a", cpu="4")
+    add_pod(model, "other", node="a", cpu="2", namespace="kube-system")
+    add_pod(model, "vnc-9", cpu="1", user="9", phase="Pending")
+    # Pending pods outside the VNC namespace are not counted
+    add_pod(model, "elsewhere", cpu="4", namespace="batch", phase="Pending")
+    model.admit("1", "1", "1Gi")
+    with pytest.raises(AdmissionRejected):
+        model.admit("2", "1", "1Gi")
+
+def test_admit_only_uses_nodes_matching_required_terms(model):
+    add_node(model, "dedicated", cpu="2", labels={"pool": "dedicated"})
+    add_node(model, "shared", cpu="2", labels={"pool": "shared"})
+    terms = selector("pool", "In", "dedicated")
+    model.admit("1", "2", "1Gi", node_terms=terms)
+    with pytest.raises(AdmissionRejected):
+        model.admit("2", "2", "1Gi", node_terms=terms)
+    # Without the selector the shared node still fits
+    model.admit("3", "2", "1Gi")
+
+def test_admit_credits_the_replaced_pod(model):
+    add_node(model, "a", cpu="2")
+    old = add_pod(model, "vnc-1", node="a", cpu="2", user="1")
+    with pytest.raises(AdmissionRejected):
+        model.admit("1", "2", "1Gi")
+    model.admit("1", "2", "1Gi", replaces=old)
+
+def test_deleted_pod_frees_its_node(model):
+    add_node(model, "a", cpu="1")
+    pod = add_pod(model, "x", node="a", cpu="1", namespace="default")
+    with pytest.raises(AdmissionRejected):
+        model.admit("1", "1", "1Gi")
+    model.on_pod("DELETED", pod, pod)
+    model.admit("1", "1", "1Gi")
+
+def test_most_allocated_ranks_fitting_eligible_nodes(model):
+    add_node(model, "empty", cpu="4", labels={"pool": "a"})
+    add_node(model, "busy", cpu="4", labels={"pool": "a"})
+    add_node(model, "full", cpu="4", labels={"pool": "a"})
+    add_node(model, "other", cpu="4", labels={"pool": "b"})
+    add_pod(model, "p1", node="busy", cpu="2", namespace="default")
+    add_pod(model, "p2", node="full", cpu="4", namespace="default")
+    add_pod(model, "p3", node="other", cpu="3", namespace="default")
+    assert model.most_allocated("1", "1Gi") == ["other", "busy", "empty"]
+    assert model.most_allocated("1", "1Gi", node_terms=selector("pool", "In", "a")) == ["busy", "empty"]
+    assert model.most_allocated("1", "1Gi", limit=1) == ["other"]
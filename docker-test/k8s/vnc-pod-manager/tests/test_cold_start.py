@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.cold_start import phase_durations, phase_percentiles
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+def test_phase_durations_full_sequence():
+    durations = phase_durations({
+        "created": at(0), "pvc_bound": at(2), "scheduled": at(3), "pulling": at(4),
+        "pulled": at(10), "started": at(11), "ready": at(14)
+    })
+    assert durations == {
+        "pvc_bind": 2, "schedule": 1, "kubelet_setup": 1, "image_pull": 6,
+        "container_start": 1, "readiness": 3, "total": 14
+    }
+
+def test_phase_durations_cached_image_and_prebound_pvc():
+    durations = phase_durations({
+        "created": at(5), "pvc_bound": at(0), "scheduled": at(6),
+        "pulled": at(8), "started": at(9), "ready": at(10)
+    })
+    assert durations["pvc_bind"] == 0
+    assert durations["schedule"] == 1  # from creation, not from the earlier PVC bind
+    assert durations["kubelet_setup"] == 2  # ends at Pulled when there is no Pulling event
+    assert durations["image_pull"] == 0
+    assert durations["total"] == 5
+
+def test_phase_durations_skips_unfinished_phases():
+    durations = phase_durations({"created": at(0), "scheduled": at(1)})
+    assert durations == {"schedule": 1}
+
+def test_phase_percentiles():
+    records = [{"cold_start": {"phases": {"total": float(seconds)}}} for seconds in range(1, 101)]
+    records.append({"pod_name": "no cold start"})
+    result = phase_percentiles(records)
+    assert result == {"total": {"count": 100, "p50": 50.0, "p95": 95.0, "p99": 99.0}}
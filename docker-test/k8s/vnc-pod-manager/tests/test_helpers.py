@@ -0,0 +1,33 @@
+import pytest
+
+from app.utils.helpers import parse_resource_string
+
+@pytest.mark.parametrize("quantity, expected", [
+    ("2", 2.0),
+    ("0.5", 0.5),
+    ("500m", 0.5),
+    ("250000n", 0.00025),
+    ("100u", 0.0001),
+    ("1k", 1e3),
+    ("1M", 1e6),
+    ("1G", 1e9),
+    ("1T", 1e12),
+    ("1P", 1e15),
+    ("1E", 1e18),
+    ("1Ki", 1024.0),
+    ("512Mi", 512 * 1024 ** 2),
+    ("1.5Gi", 1.5 * 1024 ** 3),
+    ("1Ti", 1024.0 ** 4),
+    ("1Pi", 1024.0 ** 5),
+    ("1Ei", 1024.0 ** 6),
+    ("1e3", 1000.0),
+    ("5E-1", 0.5),
+    (" 2Gi ", 2 * 1024.0 ** 3),
+    (2, 2.0),
+])
+def test_parse_resource_string(quantity, expected):
+    assert parse_resource_string(quantity) == pytest.approx(expected)
+
+@pytest.mark.parametrize("quantity", [None, "", "abc", "500mm", "1Gb", "Gi", "1 Gi", "--1"])
+def test_parse_resource_string_invalid(quantity):
+    assert parse_resource_string(quantity) is None
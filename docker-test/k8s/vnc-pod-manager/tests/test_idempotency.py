@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.core.idempotency import IdempotencyCoalescer, IdempotencyConflict, request_fingerprint
+
+@pytest.fixture
+def coalescer(redis_client):
+    return IdempotencyCoalescer(redis_client, poll_interval=0.01, max_poll_interval=0.02)
+
+class _Operation:
+    def __init__(self, body=None, delay=0.05):
+        self.calls = 0
+        self.body = body or {"pod_name": "vnc-1", "vnc_password": "secret"}
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return 201, dict(self.body, call=self.calls)
+
+def test_request_fingerprint_ignores_key_order():
+    assert request_fingerprint({"a": 1, "b": 2}) == request_fingerprint({"b": 2, "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+def test_identical_concurrent_requests_execute_once(coalescer):
+    run = _Operation()
+    fingerprint = request_fingerprint({"user_id": "1"})
+
+    async def main():
+        return await asyncio.gather(*(coalescer.execute("create", "1", run, fingerprint=fingerprint) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert run.calls == 1
+    assert [result.replayed for result in results].count(False) == 1
+    assert {result.body["call"] for result in results} == {1}
+
+def test_requests_with_different_bodies_run_separately(coalescer):
+    run = _Operation()
+
+    async def main():
+        return await asyncio.gather(
+            coalescer.execute("create", "1", run, fingerprint=request_fingerprint({"cpu_limit": "1"})),
+            coalescer.execute("create", "1", run, fingerprint=request_fingerprint({"cpu_limit": "2"}))
+        )
+
+    results = asyncio.run(main())
+    assert run.calls == 2
+    assert not any(result.replayed for result in results)
+
+def test_remote_duplicate_waits_for_the_owner(coalescer, redis_client):
+    """A second worker (its own coalescer) shares the Redis result instead of executing"""
+    other = IdempotencyCoalescer(redis_client, poll_interval=0.01, max_poll_interval=0.02)
+    run = _Operation()
+    fingerprint = request_fingerprint({})
+
+    async def main():
+        first = asyncio.create_task(coalescer.execute("create", "1", run, fingerprint=fingerprint))
+        await asyncio.sleep(0.01)
+        second = await other.execute("create", "1", run, fingerprint=fingerprint)
+        return await first, second
+
+    first, second = asyncio.run(main())
+    assert run.calls == 1
+    assert second.replayed
+    assert second.redacted == ("vnc_password",)
+    assert "vnc_password" not in second.body
+    assert first.body["vnc_password"] == "secret"
+
+def test_keyless_request_after_completion_runs_again(coalescer):
+    run = _Operation(delay=0)
+    fingerprint = request_fingerprint({})
+    asyncio.run(coalescer.execute("create", "1", run, fingerprint=fingerprint))
+    result = asyncio.run(coalescer.execute("create", "1", run, fingerprint=fingerprint))
+    assert run.calls == 2
+    assert not result.replayed
+
+def test_idempotency_key_replays_and_rejects_a_different_body(coalescer, redis_client):
+    run = _Operation(delay=0)
+    fingerprint = request_fingerprint({"cpu_limit": "1"})
+    first = asyncio.run(coalescer.execute("create", "1", run, idempotency_key="k", fingerprint=fingerprint))
+    replay = asyncio.run(coalescer.execute("create", "1", run, idempotency_key="k", fingerprint=fingerprint))
+    assert run.calls == 1
+    assert replay.replayed and replay.body["call"] == first.body["call"]
+    assert "secret" not in "".join(redis_client.mget(redis_client.keys("idem:*")))
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(coalescer.execute(
+            "create", "1", run, idempotency_key="k", fingerprint=request_fingerprint({"cpu_limit": "2"})
+        ))
+
+def test_server_errors_are_not_replayed(coalescer, redis_client):
+    async def fail():
+        return 500, {"detail": "boom"}
+
+    asyncio.run(coalescer.execute("create", "1", fail, idempotency_key="k"))
+    (key,) = redis_client.keys("idem:*:result")
+    assert redis_client.ttl(key) <= coalescer.coalesce_ttl
@@ -0,0 +1,47 @@
+import pytest
+from kubernetes import client
+
+from app.core import manifests
+from app.core.manifests import Fmt, ManifestTemplate, Opt, Var, _compile
+
+def test_compile_substitutes_placeholders_and_shares_constant_subtrees():
+    constant = {"a": [1, 2]}
+    template = {"name": Fmt("vnc-{user_id}"), "image": Var("image"), "opt": Opt("opt"), "fixed": constant,
+                "items": [Var("image"), "x"]}
+    render = _compile(template)
+    rendered = render({"user_id": "7", "image": "img", "opt": None})
+    assert rendered == {"name": "vnc-7", "image": "img", "fixed": {"a": [1, 2]}, "items": ["img", "x"]}
+    assert rendered["fixed"] is constant
+    assert render({"user_id": "7", "image": "img", "opt": 0})["opt"] == 0
+    with pytest.raises(KeyError):
+        render({"user_id": "7"})
+
+def test_compile_static_manifest_is_returned_as_is():
+    manifest = {"a": {"b": [1]}}
+    assert _compile(manifest) is None
+    assert ManifestTemplate("static", manifest).render() is manifest
+
+POD_VALUES = dict(
+    user_id="42", credentials_secret="vnc-cred-42", pvc_name="pvc-42", image="registry/vnc:1",
+    affinity=None, topology_spread=None, cpu_request="500m", cpu_limit="2",
+    memory_request="1Gi", memory_limit="4Gi"
+)
+
+@pytest.mark.parametrize("kind, model, values", [
+    ("pod", "V1Pod", POD_VALUES),
+    ("pod", "V1Pod", dict(POD_VALUES, topology_spread=[{
+        "maxSkew": 1, "topologyKey": "kubernetes.io/hostname", "whenUnsatisfiable": "ScheduleAnyway",
+        "labelSelector": {"matchLabels": {"app": "vnc"}}
+    }], affinity={"nodeAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": {"nodeSelectorTerms": [
+        {"matchExpressions": [{"key": "pool", "operator": "In", "values": ["a"]}]}
+    ]}}})),
+    ("service", "V1Service", {"user_id": "42"}),
+    ("ingress", "V1Ingress", {"user_id": "42", "domain": "example.com"}),
+])
+def test_rendered_manifest_matches_the_sanitized_model(kind, model, values):
+    """A rendered manifest is exactly what the client would send for the equivalent model"""
+    rendered = manifests.render(kind, **values)
+    api_client = client.ApiClient()
+    obj = api_client._ApiClient__deserialize(rendered, model)
+    assert api_client.sanitize_for_serialization(obj) == rendered
+    assert rendered["metadata"]["name"].endswith("42")
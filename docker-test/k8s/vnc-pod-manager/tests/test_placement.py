@@ -0,0 +1,103 @@
+import pytest
+
+from app.core.placement import PlacementPolicies, merge_affinity, parse_policies, required_node_terms
+
+def required(*expressions):
+    return {"nodeAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": {
+        "nodeSelectorTerms": [{"matchExpressions": list(expressions)} ]
+    }}}
+
+def expression(key, value):
+    return {"key": key, "operator": "In", "values": [value]}
+
+def test_merge_affinity_returns_the_non_empty_side():
+    affinity = required(expression("a", "1"))
+    assert merge_affinity(None, affinity) is affinity
+    assert merge_affinity(affinity, None) is affinity
+    assert merge_affinity(None, None) is None
+
+def test_merge_affinity_ands_required_node_terms():
+    base = {"nodeAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": {"nodeSelectorTerms": [
+        {"matchExpressions": [expression("a", "1")]},
+        {"matchExpressions": [expression("a", "2")]}
+    ]}}}
+    merged = merge_affinity(base, required(expression("b", "1")))
+    assert required_node_terms(merged) == [
+        {"matchExpressions": [expression("a", "1"), expression("b", "1")]},
+        {"matchExpressions": [expression("a", "2"), expression("b", "1")]}
+    ]
+
+def test_merge_affinity_concatenates_preferred_terms_and_keeps_inputs():
+    preferred = {"weight": 10, "preference": {"matchExpressions": [expression("c", "1")]}}
+    pod_affinity = {"weight": 50, "podAffinityTerm": {"topologyKey": "kubernetes.io/hostname"}}
+    base = required(expression("a", "1"))
+    extra = {
+        "nodeAffinity": {"preferredDuringSchedulingIgnoredDuringExecution": [preferred]},
+        "podAffinity": {"preferredDuringSchedulingIgnoredDuringExecution": [pod_affinity]}
+    }
+    merged = merge_affinity(base, extra)
+    assert merged["nodeAffinity"]["requiredDuringSchedulingIgnoredDuringExecution"] == \
+        base["nodeAffinity"]["requiredDuringSchedulingIgnoredDuringExecution"]
+    assert merged["nodeAffinity"]["preferredDuringSchedulingIgnoredDuringExecution"] == [preferred]
+    assert merged["podAffinity"]["preferredDuringSchedulingIgnoredDuringExecution"] == [pod_affinity]
+    assert "preferredDuringSchedulingIgnoredDuringExecution" not in base["nodeAffinity"]
+
+def test_required_node_terms():
+    assert required_node_terms(None) is None
+    assert required_node_terms({"podAffinity": {}}) is None
+    assert required_node_terms(required(expression("a", "1"))) == [{"matchExpressions": [expression("a", "1")]}]
+
+def test_parse_policies_validates():
+    policies = parse_policies('{"*": {"strategy": "pack"}, "team": {"qos": "guaranteed", "node_selector": {"pool": "x"}}}')
+    assert policies["*"]["strategy"] == "pack"
+    assert policies["team"]["qos"] == "guaranteed"
+    assert policies["team"]["node_selector"] == {"pool": "x"}
+    assert parse_policies("") == {}
+    with pytest.raises(ValueError):
+        parse_policies('{"*": {"strategy": "random"}}')
+    with pytest.raises(ValueError):
+        parse_policies('{"*": {"qos": "besteffort"}}')
+
+class _Quotas:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def plan_for(self, user_id):
+        return self.plan, {}
+
+class _Capacity:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.node_terms = None
+
+    def most_allocated(self, cpu, memory, limit=3, node_terms=None):
+        self.node_terms = node_terms
+        return self.nodes[:limit]
+
+def test_guaranteed_qos_raises_requests_to_limits():
+    policies = PlacementPolicies(parse_policies('{"team": {"qos": "guaranteed"}}'), _Quotas("team"))
+    quota = {"cpu_request": "500m", "cpu_limit": "2", "memory_request": "1Gi", "memory_limit": "4Gi"}
+    assert policies.apply_qos("1", quota) == {
+        "cpu_request": "2", "cpu_limit": "2", "memory_request": "4Gi", "memory_limit": "4Gi"
+    }
+    assert quota["cpu_request"] == "500m"
+
+def test_pack_ranks_only_nodes_the_pod_may_use():
+    capacity = _Capacity(["n1", "n2"])
+    policies = PlacementPolicies(
+        parse_policies('{"*": {"strategy": "pack", "node_selector": {"pool": "dedicated"}}}'), _Quotas("pro"), capacity
+    )
+    pin = required(expression("image-digest", "true"))
+    hints = policies.placement("1", {"cpu_request": "1", "memory_request": "1Gi"}, required=pin)
+    assert capacity.node_terms == [{"matchExpressions": [expression("image-digest", "true"), expression("pool", "dedicated")]}]
+    node_affinity = hints["affinity"]["nodeAffinity"]
+    assert required_node_terms(hints["affinity"]) == [{"matchExpressions": [expression("pool", "dedicated")]}]
+    assert [term["weight"] for term in node_affinity["preferredDuringSchedulingIgnoredDuringExecution"]] == [100, 60]
+    assert hints["topology_spread"] is None
+
+def test_spread_adds_a_topology_spread_constraint():
+    policies = PlacementPolicies(parse_policies('{"*": {"strategy": "spread", "max_skew": 2}}'), _Quotas("pro"))
+    hints = policies.placement("1", {})
+    assert hints["affinity"] is None
+    assert hints["topology_spread"][0]["maxSkew"] == 2
+    assert hints["topology_spread"][0]["whenUnsatisfiable"] == "ScheduleAnyway"
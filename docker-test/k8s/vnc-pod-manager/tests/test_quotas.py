@@ -0,0 +1,79 @@
+import pytest
+
+from app.core.quotas import InvalidQuota, QuotaCache, QuotaExceeded, quota_error
+
+VALID = {"cpu_request": "500m", "cpu_limit": "2", "memory_request": "1Gi", "memory_limit": "4Gi", "storage": "10Gi"}
+
+def test_quota_error_accepts_a_valid_quota():
+    assert quota_error(VALID) is None
+    assert quota_error({**VALID, "cpu_request": "2"}) is None
+
+@pytest.mark.parametrize("field, value, message", [
+    ("cpu_limit", "abc", "invalid quantity for cpu_limit"),
+    ("storage", "0", "invalid quantity for storage"),
+    ("memory_request", "-1Gi", "invalid quantity for memory_request"),
+    ("memory_request", None, "invalid quantity for memory_request"),
+    ("cpu_request", "3", "cpu_request=3 is above cpu_limit=2"),
+    ("memory_request", "5Gi", "memory_request=5Gi is above memory_limit=4Gi"),
+])
+def test_quota_error(field, value, message):
+    assert message in quota_error({**VALID, field: value})
+
+class _Database:
+    def __init__(self, version, plans, assignments):
+        self.version = version
+        self.plans = plans
+        self.assignments = assignments
+        self.loads = 0
+
+    def get_quota_version(self):
+        return self.version
+
+    def load_quotas(self):
+        self.loads += 1
+        return {name: dict(plan) for name, plan in self.plans.items()}, dict(self.assignments)
+
+@pytest.fixture
+def cache():
+    db = _Database(1, {
+        "default": {"cpu_limit": "2", "memory_limit": "4Gi"},
+        "pro": {"cpu_request": "1", "cpu_limit": "4", "memory_request": "2Gi", "memory_limit": "8Gi"},
+        "broken": {"cpu_request": "8", "cpu_limit": "4"}
+    }, {"1": "pro", "2": "broken"})
+    cache = QuotaCache(db)
+    assert cache.refresh()
+    return cache
+
+def test_refresh_only_reloads_on_a_new_version(cache):
+    assert not cache.refresh()
+    assert cache.db.loads == 1
+    cache.db.version = 2
+    assert cache.refresh()
+    assert cache.db.loads == 2
+
+def test_refresh_skips_invalid_plans(cache):
+    assert "broken" not in cache.status()["plans"]
+    name, quota = cache.plan_for("2")
+    assert name == "default"
+    assert quota["cpu_limit"] == "2"
+
+def test_resolve_lowers_the_plan(cache):
+    quota = cache.resolve("1", {"cpu_limit": "3"})
+    assert quota["cpu_limit"] == "3"
+    assert quota["memory_limit"] == "8Gi"
+
+@pytest.mark.parametrize("override, error", [
+    ({"cpu_limit": "5"}, QuotaExceeded),
+    ({"gpu": "1"}, InvalidQuota),
+    ({"memory_limit": "lots"}, InvalidQuota),
+    ({"cpu_limit": "500m"}, InvalidQuota),  # below the plan's cpu_request
+])
+def test_resolve_rejects(cache, override, error):
+    with pytest.raises(error):
+        cache.resolve("1", override)
+
+def test_missing_tables_fall_back_to_settings():
+    cache = QuotaCache(_Database(None, {}, {}))
+    assert not cache.refresh()
+    assert cache.plan_for("1")[0] == "default"
+    assert quota_error(cache.resolve("1")) is None
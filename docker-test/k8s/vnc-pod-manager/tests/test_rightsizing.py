@@ -0,0 +1,34 @@
+from app.core.rightsizing import RingBuffer, percentiles
+
+def test_ring_buffer_keeps_the_latest_samples_oldest_first():
+    buffer = RingBuffer(3)
+    for value in (1, 2, 3, 4, 5):
+        buffer.append(value)
+    assert len(buffer) == 3
+    assert list(RingBuffer(3, buffer.to_bytes()).values) == [3, 4, 5]
+
+def test_ring_buffer_round_trip_continues_in_order():
+    buffer = RingBuffer(4)
+    for value in (10, 20, 30, 40, 50):
+        buffer.append(value)
+    restored = RingBuffer(4, buffer.to_bytes())
+    restored.append(60)
+    assert list(RingBuffer(4, restored.to_bytes()).values) == [30, 40, 50, 60]
+
+def test_ring_buffer_clamps_to_16_bits_and_truncates_oversized_data():
+    buffer = RingBuffer(2)
+    buffer.append(-5)
+    buffer.append(70000.4)
+    assert list(buffer.values) == [0, 0xFFFF]
+    assert list(RingBuffer(2, RingBuffer(2, b"").to_bytes()).values) == []
+    large = RingBuffer(5)
+    for value in range(5):
+        large.append(value)
+    assert list(RingBuffer(2, large.to_bytes()).values) == [3, 4]
+
+def test_percentiles():
+    assert percentiles([]) == {}
+    result = percentiles(range(1, 101))
+    assert result["max"] == 100
+    assert result["p50"] == 50
+    assert result["p95"] == 95